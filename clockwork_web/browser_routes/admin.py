@@ -34,6 +34,7 @@ from flask import Blueprint
 
 from clockwork_web.core.utils import to_boolean, get_custom_array_from_request_args
 from clockwork_web.core.users_helper import render_template_with_user_settings
+from clockwork_web.db import get_pool_stats
 
 flask_api = Blueprint("admin", __name__)
 
@@ -75,3 +76,18 @@ def panel():
         mila_email_username=current_user.mila_email_username,
         previous_request_args=previous_request_args,
     )
+
+
+@flask_api.route("/db_pool_stats")
+@login_required
+@admin_access_required
+def db_pool_stats():
+    """
+    Return the statistics of the connection pool to the database of the
+    process handling the request, as JSON.
+    """
+    logging.info(
+        f"clockwork browser route: /admin/db_pool_stats - current_user={current_user.mila_email_username}"
+    )
+
+    return jsonify(get_pool_stats())
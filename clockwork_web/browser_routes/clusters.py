@@ -8,7 +8,7 @@ from flask_login import current_user, login_required
 from flask_babel import gettext
 
 from clockwork_web.core.clusters_helper import get_all_clusters
-from clockwork_web.core.jobs_helper import get_jobs
+from clockwork_web.core.cluster_stats_helper import get_clusters_jobs_stats
 from clockwork_web.core.users_helper import render_template_with_user_settings
 
 flask_api = Blueprint("clusters", __name__)
@@ -84,19 +84,11 @@ def route_one():
             # We add it here instead of above because we don't want to spend time
             # generating those info for all clusters, as we just want to display one.
 
-            # get job slurm updates.
-            jobs, _ = get_jobs(cluster_names=[cluster_name])
-            job_dates = [
-                job["cw"]["last_slurm_update"]
-                for job in jobs
-                if "last_slurm_update" in job["cw"]
-            ]
+            # get job slurm updates, from the summary maintained by the ingestion.
+            D_jobs_stats = get_clusters_jobs_stats([cluster_name])[cluster_name]
             # Save min and max dates for jobs.
-            if job_dates:
-                D_clusters[cluster_name]["job_dates"] = {
-                    "min": min(job_dates),
-                    "max": max(job_dates),
-                }
+            if D_jobs_stats["job_dates"]:
+                D_clusters[cluster_name]["job_dates"] = D_jobs_stats["job_dates"]
 
             # Return a HTML page presenting the requested cluster's information
             return render_template_with_user_settings(
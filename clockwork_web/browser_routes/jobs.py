@@ -47,6 +47,7 @@ from clockwork_web.core.jobs_helper import (
     get_inferred_job_states,
 )
 from clockwork_web.core.pagination_helper import get_pagination_values
+from clockwork_web.core.continuation_token_helper import InvalidContinuationTokenError
 
 
 @flask_api.route("/")
@@ -88,6 +89,11 @@ def route_search():
       presenting the number of the current page
     - "nbr_items_per_page" is optional and used for the pagination: it is a
       positive integer presenting the number of items to display per page
+    - "continuation_token" is optional and used for the pagination: it is the token
+      sent back with the previous page (in the "Clockwork-Continuation-Token" header
+      for a JSON response). If provided, the page following the previous one is
+      retrieved without skipping the items of the previous pages, and "page_num" is
+      only used for display
     - "want_json" is set to True if the expected returned entity is a JSON list of the jobs
     - "want_count" is useful when want_json is True. If want_count is True, the returned JSON
       has the following format:
@@ -124,16 +130,29 @@ def route_search():
     # Retrieve the jobs and display or return them #
     ################################################
 
-    (query, LD_jobs, nbr_total_jobs) = search_request(
-        current_user,
-        request.args,
-        # The default pagination parameters are different whether or not a JSON response is requested.
-        # This is because we are using `want_json=True` along with no pagination arguments for a special
-        # case when we want to retrieve all the jobs in the dashboard for a given user.
-        # There is a certain notion with `want_json` that we are retrieving the data for the purposes
-        # of listing them exhaustively, and not just for displaying them with scroll bars in some HTML page.
-        force_pagination=not want_json,
-    )
+    try:
+        (query, LD_jobs, nbr_total_jobs) = search_request(
+            current_user,
+            request.args,
+            # The default pagination parameters are different whether or not a JSON response is requested.
+            # This is because we are using `want_json=True` along with no pagination arguments for a special
+            # case when we want to retrieve all the jobs in the dashboard for a given user.
+            # There is a certain notion with `want_json` that we are retrieving the data for the purposes
+            # of listing them exhaustively, and not just for displaying them with scroll bars in some HTML page.
+            force_pagination=not want_json,
+        )
+    except InvalidContinuationTokenError:
+        if want_json:
+            return jsonify("Invalid continuation_token."), 400
+        return (
+            render_template_with_user_settings(
+                "error.html",
+                error_msg=gettext("Invalid continuation_token."),
+                previous_request_args={},
+                error_code=400,
+            ),
+            400,
+        )  # bad request
 
     LD_jobs = [strip_artificial_fields_from_job(D_job) for D_job in LD_jobs]
 
@@ -142,11 +161,19 @@ def route_search():
         if query.want_count:
             # If the number of all the jobs is requested, return the jobs list
             # and the number of jobs
-            return {"jobs": LD_jobs, "nbr_total_jobs": nbr_total_jobs}
+            response = jsonify({"jobs": LD_jobs, "nbr_total_jobs": nbr_total_jobs})
 
         else:
             # Otherwise, only the jobs list is returned
-            return jsonify(LD_jobs)
+            response = jsonify(LD_jobs)
+
+        # The token of the next page (if any) is sent in a header,
+        # in order to keep the format of the response
+        if query.next_continuation_token:
+            response.headers[
+                "Clockwork-Continuation-Token"
+            ] = query.next_continuation_token
+        return response
     else:
         # Display the HTML page
         return render_template_with_user_settings(
@@ -155,6 +182,7 @@ def route_search():
             mila_email_username=current_user.mila_email_username,
             page_num=query.pagination_page_num,
             nbr_total_jobs=nbr_total_jobs,
+            next_continuation_token=query.next_continuation_token,
             previous_request_args={
                 "username": query.username,
                 "cluster_name": query.cluster_name,
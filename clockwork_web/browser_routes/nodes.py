@@ -37,9 +37,11 @@ from clockwork_web.core.nodes_helper import get_nodes
 from clockwork_web.core.jobs_helper import combine_all_mongodb_filters
 from clockwork_web.core.nodes_helper import (
     get_filter_node_name,
+    get_nodes_continuation_token,
     strip_artificial_fields_from_node,
 )
 from clockwork_web.core.pagination_helper import get_pagination_values
+from clockwork_web.core.continuation_token_helper import InvalidContinuationTokenError
 from clockwork_web.core.users_helper import render_template_with_user_settings
 from clockwork_web.core.utils import get_custom_array_from_request_args
 
@@ -56,6 +58,9 @@ def route_list():
     presenting the number of the current page
     "nbr_items_per_page" is optional and used for the pagination: it is a
     positive integer presenting the number of items to display per page
+    "continuation_token" is optional and used for the pagination: it is the token
+    of the previous page. If provided, the page following the previous one is
+    retrieved without skipping the nodes of the previous pages
 
     .. :quickref: list all Slurm nodes as formatted html
     """
@@ -67,8 +72,9 @@ def route_list():
     previous_request_args = {}
 
     # Retrieve the pagination parameters
-    pagination_page_num = request.args.get("page_num", type=int, default="1")
+    pagination_page_num = request.args.get("page_num", type=int, default=1)
     pagination_nbr_items_per_page = request.args.get("nbr_items_per_page", type=int)
+    continuation_token = request.args.get("continuation_token", None) or None
     previous_request_args["page_num"] = pagination_page_num
     if pagination_nbr_items_per_page:
         previous_request_args["nbr_items_per_page"] = pagination_nbr_items_per_page
@@ -114,11 +120,27 @@ def route_list():
 
     # Retrieve the nodes, by applying the filters and the pagination,
     # and the number of nodes corresponding to the filter without the pagination
-    (LD_nodes, nbr_total_nodes) = get_nodes(
-        filter,
-        nbr_skipped_items=nbr_skipped_items,
-        nbr_items_to_display=nbr_items_to_display,
-        want_count=True,  # We want the result as a tuple (nodes_list, nodes_count)
+    try:
+        (LD_nodes, nbr_total_nodes) = get_nodes(
+            filter,
+            nbr_skipped_items=nbr_skipped_items,
+            nbr_items_to_display=nbr_items_to_display,
+            want_count=True,  # We want the result as a tuple (nodes_list, nodes_count)
+            continuation_token=continuation_token,
+        )
+    except InvalidContinuationTokenError:
+        return (
+            render_template_with_user_settings(
+                "error.html",
+                error_msg=gettext("Invalid continuation_token."),
+                previous_request_args=previous_request_args,
+                error_code=400,
+            ),
+            400,
+        )  # bad request
+    # Token used to retrieve the next page, if any
+    next_continuation_token = get_nodes_continuation_token(
+        LD_nodes, nbr_items_to_display
     )
 
     # Format the nodes (by withdrawing the "_id" element of each node)
@@ -131,6 +153,7 @@ def route_list():
         mila_email_username=current_user.mila_email_username,
         page_num=pagination_page_num,
         nbr_total_nodes=nbr_total_nodes,
+        next_continuation_token=next_continuation_token,
         previous_request_args=previous_request_args,
     )
 
@@ -0,0 +1,173 @@
+"""
+Process-level cache of the REST authentications, so that the calls sent in
+bursts by the scripts using clockwork_tools do not read the users collection
+each time.
+
+The authentications are keyed by (email, SHA-256 digest of the API key): the
+keys themselves are never stored. The failed authentications are cached as
+well, for a shorter time, to absorb the bursts of bad credentials.
+
+Only the enabled users are authenticated, and the status of the cached users
+is checked again on each hit. The entries of a user are removed when its API
+key is rotated by this process (see User.new_api_key), which is the only change
+of the users affecting the authentications made by the web server. The cache
+is not shared between processes: when the server runs several workers (for
+instance with gunicorn), a rotated key is still accepted by the other workers
+until their entries expire, as are the changes made by other processes (for
+instance a user disabled by the scripts importing the users). This delay is
+bounded by the TTL of the successful authentications, which is kept very short
+and can not exceed MAX_AUTH_CACHE_TTL.
+"""
+
+import hashlib
+import threading
+import time
+
+from clockwork_web.config import get_config, register_config, integer
+
+# Number of seconds during which a successful authentication is reused. This is
+# also how long a rotated API key (or a disabled user) may still be accepted by
+# the other workers of the server, as the cache is local to each process: keep
+# it short. Greater values are reduced to MAX_AUTH_CACHE_TTL.
+register_config("rest.auth_cache_ttl", 5, validator=integer)
+MAX_AUTH_CACHE_TTL = 60
+# Number of seconds during which a failed authentication is reused
+register_config("rest.auth_cache_negative_ttl", 5, validator=integer)
+# Maximum number of cached authentications
+register_config("rest.auth_cache_max_entries", 10000, validator=integer)
+
+
+def get_api_key_digest(api_key):
+    """
+    Return the SHA-256 digest of an API key, as an hexadecimal string.
+    """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class ApiKeyCache:
+    """
+    Cache of the REST authentications, stored with an expiration time. It can be
+    shared by the threads of the process.
+    """
+
+    def __init__(self, ttl, negative_ttl, max_entries, clock=time.monotonic):
+        """
+        Parameters:
+            ttl             Number of seconds during which a successful authentication is valid
+            negative_ttl    Number of seconds during which a failed authentication is valid
+            max_entries     Maximum number of cached authentications
+            clock           Function returning the current time, in seconds
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Format: {(mila_email_username, API key digest or None): (D_user or None, expiration time)}
+        # The digest None is used for the emails of unknown users, whatever the key.
+        self._entries = {}
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, mila_email_username, api_key):
+        """
+        Retrieve a cached authentication.
+
+        Returns:
+            A 2-tuple containing a boolean indicating whether the authentication
+            is cached, and the authenticated user (or None if the authentication failed)
+        """
+        now = self.clock()
+        with self._lock:
+            for key in [
+                (mila_email_username, get_api_key_digest(api_key)),
+                (mila_email_username, None),
+            ]:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self.hits += 1
+                    # The user is copied, so that the requests can not alter the cache
+                    return (True, None if entry[0] is None else dict(entry[0]))
+            self.misses += 1
+            return (False, None)
+
+    def set_authenticated(self, mila_email_username, api_key, D_user):
+        """
+        Cache a successful authentication. The API key of the user is not stored.
+        """
+        D_user = {k: v for (k, v) in D_user.items() if k != "clockwork_api_key"}
+        self._set((mila_email_username, get_api_key_digest(api_key)), D_user, self.ttl)
+
+    def set_rejected(self, mila_email_username, api_key=None):
+        """
+        Cache a failed authentication. If api_key is None, all the keys
+        are rejected for this email (the user is unknown).
+        """
+        self._set(
+            (
+                mila_email_username,
+                None if api_key is None else get_api_key_digest(api_key),
+            ),
+            None,
+            self.negative_ttl,
+        )
+
+    def _set(self, key, D_user, ttl):
+        now = self.clock()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for (k, v) in self._entries.items() if v[1] > now}
+                # Too many valid entries (for instance during a burst of bad
+                # credentials): they are all dropped
+                if len(self._entries) >= self.max_entries:
+                    self._entries = {}
+            self._entries[key] = (D_user, now + ttl)
+
+    def invalidate(self, mila_email_username):
+        """
+        Remove the cached authentications of a user, for instance after the
+        rotation of its API key. Only the cache of this process is cleared.
+        """
+        with self._lock:
+            self._entries = {
+                k: v for (k, v) in self._entries.items() if k[0] != mila_email_username
+            }
+
+    def get_stats(self):
+        """
+        Return the metrics of the cache, as a dictionary.
+        """
+        with self._lock:
+            nb_lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / nb_lookups if nb_lookups else None,
+                "size": len(self._entries),
+            }
+
+    def clear(self):
+        """
+        Remove all the cached authentications.
+        """
+        with self._lock:
+            self._entries = {}
+
+
+# Cache shared by all the requests of the process, created when first used
+_api_key_cache = None
+
+
+def get_api_key_cache():
+    """
+    Return the REST authentications cache shared by the whole process.
+    """
+    global _api_key_cache
+    if _api_key_cache is None:
+        _api_key_cache = ApiKeyCache(
+            ttl=min(get_config("rest.auth_cache_ttl"), MAX_AUTH_CACHE_TTL),
+            negative_ttl=get_config("rest.auth_cache_negative_ttl"),
+            max_entries=get_config("rest.auth_cache_max_entries"),
+        )
+    return _api_key_cache
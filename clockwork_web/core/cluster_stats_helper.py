@@ -0,0 +1,238 @@
+"""
+Helper functions to read the summary of the jobs and nodes of the clusters.
+
+This summary is stored in the "cluster_stats" collection by the ingestion
+(see slurm_state/helpers/cluster_stats_helper.py), one document per cluster:
+    {
+        "cluster_name": "mila",
+        "jobs": {
+            "nb_jobs": 5000,
+            "nb_jobs_by_state": {"RUNNING": 120, "COMPLETED": 4800, ...},
+            "job_dates": {"min": 1700000000.0, "max": 1700003600.0},
+            "last_update": 1700003600.0
+        },
+        "nodes": {
+            "nb_nodes": 300,
+            "nb_nodes_by_state": {"idle": 20, "mixed": 250, ...},
+            "gpu_total": 1200,
+            "gpu_used": 1100,
+            "gpu_free": 100,
+            "last_update": 1700003600.0
+        }
+    }
+"""
+
+import threading
+import time
+
+from clockwork_web.config import get_config, register_config, integer
+from clockwork_web.db import get_db
+
+# Number of seconds during which the latest job updates of the clusters,
+# displayed on every page, are reused before being read again
+register_config("clusters_status.freshness_cache_ttl", 10, validator=integer)
+
+
+def _compute_jobs_stats_from_jobs(cluster_names):
+    """
+    Compute the summary of the jobs of the clusters, through a single aggregation
+    run by the database: no job document is sent back. This is only used when
+    the ingestion has not stored the summary of the clusters yet.
+
+    Parameters:
+        cluster_names   List of the names of the clusters
+
+    Returns:
+        A dictionary associating the name of each cluster to the summary of
+        its jobs, presenting the fields "nb_jobs", "nb_jobs_by_state" and "job_dates"
+    """
+    D_jobs_stats = {
+        cluster_name: {"nb_jobs": 0, "nb_jobs_by_state": {}, "job_dates": None}
+        for cluster_name in cluster_names
+    }
+    LD_groups = get_db()["jobs"].aggregate(
+        [
+            {"$match": {"slurm.cluster_name": {"$in": list(cluster_names)}}},
+            {
+                "$group": {
+                    "_id": {
+                        "cluster_name": "$slurm.cluster_name",
+                        "job_state": "$slurm.job_state",
+                    },
+                    "count": {"$sum": 1},
+                    "min_update": {"$min": "$cw.last_slurm_update"},
+                    "max_update": {"$max": "$cw.last_slurm_update"},
+                }
+            },
+        ]
+    )
+    for D_group in LD_groups:
+        D_cluster_jobs_stats = D_jobs_stats[D_group["_id"]["cluster_name"]]
+        D_cluster_jobs_stats["nb_jobs"] += D_group["count"]
+        D_cluster_jobs_stats["nb_jobs_by_state"][
+            str(D_group["_id"].get("job_state"))
+        ] = D_group["count"]
+        if D_group["min_update"] is not None:
+            D_job_dates = D_cluster_jobs_stats["job_dates"]
+            if D_job_dates is None:
+                D_cluster_jobs_stats["job_dates"] = {
+                    "min": D_group["min_update"],
+                    "max": D_group["max_update"],
+                }
+            else:
+                D_job_dates["min"] = min(D_job_dates["min"], D_group["min_update"])
+                D_job_dates["max"] = max(D_job_dates["max"], D_group["max_update"])
+    return D_jobs_stats
+
+
+def get_clusters_jobs_stats(cluster_names):
+    """
+    Retrieve the summary of the jobs of the clusters.
+
+    Parameters:
+        cluster_names   List of the names of the clusters
+
+    Returns:
+        A dictionary associating the name of each cluster to the summary of
+        its jobs, presenting at least the fields "nb_jobs" and "job_dates"
+        (None if the cluster has no job)
+    """
+    # A single read retrieves the summaries of all the clusters
+    D_jobs_stats = {
+        D_cluster_stats["cluster_name"]: D_cluster_stats["jobs"]
+        for D_cluster_stats in get_db()["cluster_stats"].find(
+            {"cluster_name": {"$in": list(cluster_names)}, "jobs": {"$exists": True}},
+            {"_id": 0, "cluster_name": 1, "jobs": 1},
+        )
+    }
+
+    # The summaries not stored yet are computed from the jobs
+    L_missing_cluster_names = [
+        cluster_name
+        for cluster_name in cluster_names
+        if cluster_name not in D_jobs_stats
+    ]
+    if L_missing_cluster_names:
+        D_jobs_stats.update(_compute_jobs_stats_from_jobs(L_missing_cluster_names))
+
+    return D_jobs_stats
+
+
+def _read_last_job_updates(cluster_names):
+    """
+    Read the latest "cw.last_slurm_update" of the jobs of each cluster, from
+    the summaries stored by the ingestion. The clusters without summary are
+    handled by a single aggregation on the jobs.
+
+    Returns:
+        A dictionary associating the name of each cluster to its latest job update,
+        or to None if the cluster has no job
+    """
+    mc = get_db()
+    D_last_job_updates = {}
+    for D_cluster_stats in mc["cluster_stats"].find(
+        {"cluster_name": {"$in": list(cluster_names)}, "jobs": {"$exists": True}},
+        {"_id": 0, "cluster_name": 1, "jobs.job_dates": 1},
+    ):
+        D_job_dates = D_cluster_stats["jobs"].get("job_dates")
+        D_last_job_updates[D_cluster_stats["cluster_name"]] = (
+            D_job_dates["max"] if D_job_dates else None
+        )
+
+    L_missing_cluster_names = [
+        cluster_name
+        for cluster_name in cluster_names
+        if cluster_name not in D_last_job_updates
+    ]
+    if L_missing_cluster_names:
+        for D_group in mc["jobs"].aggregate(
+            [
+                {"$match": {"slurm.cluster_name": {"$in": L_missing_cluster_names}}},
+                {
+                    "$group": {
+                        "_id": "$slurm.cluster_name",
+                        "last_update": {"$max": "$cw.last_slurm_update"},
+                    }
+                },
+            ]
+        ):
+            D_last_job_updates[D_group["_id"]] = D_group["last_update"]
+        for cluster_name in L_missing_cluster_names:
+            D_last_job_updates.setdefault(cluster_name, None)
+
+    return D_last_job_updates
+
+
+class ClusterFreshnessCache:
+    """
+    Process-level cache of the latest job update of each cluster, used to
+    display the status of the clusters on every page. The values are read
+    again at most once every ttl seconds, by a single thread.
+    """
+
+    def __init__(self, ttl, clock=time.monotonic):
+        """
+        Parameters:
+            ttl     Number of seconds during which the values are reused
+            clock   Function returning the current time, in seconds
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Format: {cluster_name: latest job update, or None}
+        self._last_job_updates = {}
+        self._expiration = None
+        # Number of times the values have been read from the database
+        self.refreshes = 0
+
+    def get_last_job_updates(self, cluster_names):
+        """
+        Retrieve the latest job update of each cluster.
+
+        Parameters:
+            cluster_names   List of the names of the clusters
+
+        Returns:
+            A dictionary associating the name of each cluster to its latest job update,
+            or to None if the cluster has no job
+        """
+        with self._lock:
+            now = self.clock()
+            if (
+                self._expiration is None
+                or now >= self._expiration
+                or any(
+                    cluster_name not in self._last_job_updates
+                    for cluster_name in cluster_names
+                )
+            ):
+                self._last_job_updates = _read_last_job_updates(cluster_names)
+                self._expiration = now + self.ttl
+                self.refreshes += 1
+            return {
+                cluster_name: self._last_job_updates[cluster_name]
+                for cluster_name in cluster_names
+            }
+
+    def invalidate(self):
+        """
+        Force the values to be read again at the next call.
+        """
+        with self._lock:
+            self._expiration = None
+
+
+# Cache shared by all the requests of the process, created when first used
+_cluster_freshness_cache = None
+
+
+def get_cluster_freshness_cache():
+    """
+    Return the cluster freshness cache shared by the whole process.
+    """
+    global _cluster_freshness_cache
+    if _cluster_freshness_cache is None:
+        _cluster_freshness_cache = ClusterFreshnessCache(
+            ttl=get_config("clusters_status.freshness_cache_ttl")
+        )
+    return _cluster_freshness_cache
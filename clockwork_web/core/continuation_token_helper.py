@@ -0,0 +1,170 @@
+"""
+Helper functions to paginate the jobs and the nodes with continuation tokens.
+
+A continuation token is an opaque string, sent back with a page of jobs or
+nodes, which identifies the last item of this page by its values for the
+sorting fields. The next page is then retrieved by filtering the items
+placed after these values ("keyset pagination"), instead of skipping all the
+items of the previous pages: retrieving a deep page costs the same as
+retrieving the first one, and the pages do not shift when items are added by
+the ingestion between two requests.
+
+The sorting used with a token must end with fields identifying each item
+uniquely (such as "slurm.job_id" and "slurm.cluster_name" for the jobs), so
+that there is no ambiguity on the position of the last item.
+"""
+
+import base64
+import binascii
+import json
+
+
+class InvalidContinuationTokenError(ValueError):
+    """
+    Raised when a continuation token can not be decoded, or has been
+    created for another sorting.
+    """
+
+    pass
+
+
+def get_sorting_values(D_item, sorting):
+    """
+    Retrieve the values of an item for the sorting fields.
+
+    Parameters:
+        D_item      Dictionary presenting the item (a job or a node)
+        sorting     List of [field, direction] pairs, the fields being
+                    dotted paths such as "slurm.submit_time"
+
+    Returns:
+        The list of the values of the item for the sorting fields. The missing
+        fields are considered as None, as MongoDB does when sorting.
+    """
+    L_values = []
+    for (field, _) in sorting:
+        value = D_item
+        for key in field.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        L_values.append(value)
+    return L_values
+
+
+def encode_continuation_token(D_item, sorting):
+    """
+    Create the continuation token designating the items placed after an item.
+
+    Parameters:
+        D_item      Last item of the current page
+        sorting     List of [field, direction] pairs used to sort the items
+
+    Returns:
+        The continuation token, as an URL-safe string
+    """
+    D_token = {
+        "sort": [[field, direction] for (field, direction) in sorting],
+        "after": get_sorting_values(D_item, sorting),
+    }
+    return base64.urlsafe_b64encode(
+        json.dumps(D_token, separators=(",", ":")).encode("utf-8")
+    ).decode("ascii")
+
+
+def decode_continuation_token(continuation_token, sorting):
+    """
+    Retrieve the sorting values stored in a continuation token.
+
+    Parameters:
+        continuation_token  Token sent back with the previous page
+        sorting             List of [field, direction] pairs used to sort the items
+
+    Returns:
+        The list of the values of the last item of the previous page for the sorting fields
+
+    Raises:
+        InvalidContinuationTokenError if the token is malformed, or has been
+        created for another sorting
+    """
+    try:
+        D_token = json.loads(
+            base64.urlsafe_b64decode(continuation_token.encode("ascii")).decode("utf-8")
+        )
+        L_values = D_token["after"]
+        L_token_sorting = D_token["sort"]
+    except (
+        binascii.Error,
+        UnicodeError,
+        ValueError,
+        TypeError,
+        KeyError,
+        AttributeError,
+    ) as e:
+        raise InvalidContinuationTokenError("Malformed continuation token.") from e
+
+    if L_token_sorting != [[field, direction] for (field, direction) in sorting]:
+        raise InvalidContinuationTokenError(
+            "The continuation token has been created for another sorting."
+        )
+    if not isinstance(L_values, list) or len(L_values) != len(sorting):
+        raise InvalidContinuationTokenError("Malformed continuation token.")
+    return L_values
+
+
+def get_keyset_filter(sorting, L_values):
+    """
+    Set up the MongoDB filter selecting the items placed after the given
+    sorting values.
+
+    MongoDB places None (or missing) values before all the other values. Thus,
+    a None value is followed by all the non-None values in ascending order,
+    and a non-None value is followed by the None values in descending order.
+
+    Parameters:
+        sorting     List of [field, direction] pairs used to sort the items
+        L_values    Values of the last retrieved item for the sorting fields
+
+    Returns:
+        A dictionary containing the conditions to be applied on the search
+    """
+    L_conditions = []
+    for (i, (field, direction)) in enumerate(sorting):
+        value = L_values[i]
+        if value is None:
+            if direction == -1:
+                # Nothing is placed after None in descending order
+                continue
+            D_after = {field: {"$ne": None}}
+        elif direction == 1:
+            D_after = {field: {"$gt": value}}
+        else:
+            D_after = {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+        # The previous sorting fields must be equal to the values of the last item
+        L_equalities = [
+            {previous_field: L_values[j]}
+            for (j, (previous_field, _)) in enumerate(sorting[:i])
+        ]
+        L_conditions.append({"$and": L_equalities + [D_after]})
+
+    if not L_conditions:
+        # No item can be placed after the given values
+        return {"_id": {"$exists": False}}
+    return {"$or": L_conditions}
+
+
+def get_continuation_token(LD_items, sorting, nbr_items_to_display):
+    """
+    Create the continuation token of the page following a page of items.
+
+    Parameters:
+        LD_items                Items of the current page
+        sorting                 List of [field, direction] pairs used to sort the items
+        nbr_items_to_display    Number of items requested for the current page
+
+    Returns:
+        The continuation token, or None if the current page is the last one
+        (or if the items have not been paginated)
+    """
+    if not nbr_items_to_display or len(LD_items) < nbr_items_to_display:
+        return None
+    return encode_continuation_token(LD_items[-1], sorting)
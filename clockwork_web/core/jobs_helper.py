@@ -9,6 +9,11 @@ import time
 from flask.globals import current_app
 from flask_login import current_user
 from ..db import get_db
+from clockwork_web.core.continuation_token_helper import (
+    decode_continuation_token,
+    get_continuation_token,
+    get_keyset_filter,
+)
 
 
 def get_filter_cluster_name(cluster_name):
@@ -73,6 +78,67 @@ def combine_all_mongodb_filters(*mongodb_filters):
         return {"$and": non_empty_mongodb_filters}
 
 
+def get_jobs_sorting(sort_by="submit_time", sort_asc=-1):
+    """
+    Set up the sorting of the paginated jobs. It ends with the job ID and the
+    cluster name, which identify each job, so that the jobs are always
+    listed in the same order.
+
+    Parameters:
+        sort_by     Field to sort jobs
+        sort_asc    Whether or not to sort in ascending order (1)
+                    or descending order (-1).
+
+    Returns:
+        A list of [field, direction] pairs
+    """
+    # Check sorting parameters
+    assert sort_by in {
+        "cluster_name",
+        "user",
+        "job_id",
+        "name",  # job name
+        "job_state",
+        "submit_time",
+        "start_time",
+        "end_time",
+    }
+    assert sort_asc in (-1, 1)
+    # Set sorting
+    if sort_by == "user":
+        sorting = [["cw.mila_email_username", sort_asc]]
+    else:
+        sorting = [[f"slurm.{sort_by}", sort_asc]]
+    # Is sorting is not by job_id, add supplementary sorting
+    if sort_by != "job_id":
+        sorting.append(["slurm.job_id", 1])
+    if sort_by != "cluster_name":
+        sorting.append(["slurm.cluster_name", 1])
+    return sorting
+
+
+def get_jobs_continuation_token(
+    LD_jobs, nbr_items_to_display, sort_by="submit_time", sort_asc=-1
+):
+    """
+    Create the continuation token used to retrieve the page of jobs following
+    the given one, with get_filtered_and_paginated_jobs or get_jobs.
+
+    Parameters:
+        LD_jobs                 Jobs of the current page, as retrieved from the database
+        nbr_items_to_display    Number of jobs requested for the current page
+        sort_by                 Field used to sort jobs
+        sort_asc                Whether the jobs have been sorted in ascending order (1)
+                                or descending order (-1).
+
+    Returns:
+        The continuation token, or None if there is no following page
+    """
+    return get_continuation_token(
+        LD_jobs, get_jobs_sorting(sort_by, sort_asc), nbr_items_to_display
+    )
+
+
 def get_filtered_and_paginated_jobs(
     mongodb_filter: dict = {},
     nbr_skipped_items=None,
@@ -80,6 +146,7 @@ def get_filtered_and_paginated_jobs(
     want_count=False,
     sort_by="submit_time",
     sort_asc=-1,
+    continuation_token=None,
 ):
     """
     Talk to the database and get the information.
@@ -96,6 +163,10 @@ def get_filtered_and_paginated_jobs(
                                 defined.
         sort_asc                Whether or not to sort in ascending order (1)
                                 or descending order (-1).
+        continuation_token      Token sent back with the previous page (see
+                                get_jobs_continuation_token). If it is provided,
+                                the jobs following this page are retrieved and
+                                nbr_skipped_items is ignored.
 
     Returns:
         Returns a tuple (jobs_list, jobs_count or None).
@@ -120,29 +191,21 @@ def get_filtered_and_paginated_jobs(
     mc = get_db()
     # Get the jobs from it
     if nbr_skipped_items != None and nbr_items_to_display:
-        # Check sorting parameters
-        assert sort_by in {
-            "cluster_name",
-            "user",
-            "job_id",
-            "name",  # job name
-            "job_state",
-            "submit_time",
-            "start_time",
-            "end_time",
-        }
-        assert sort_asc in (-1, 1)
-        # Set sorting
-        if sort_by == "user":
-            sorting = [["cw.mila_email_username", sort_asc]]
-        else:
-            sorting = [[f"slurm.{sort_by}", sort_asc]]
-        # Is sorting is not by job_id, add supplementary sorting
-        if sort_by != "job_id":
-            sorting.append(["slurm.job_id", 1])
+        sorting = get_jobs_sorting(sort_by, sort_asc)
+        paginated_mongodb_filter = mongodb_filter
+        if continuation_token:
+            # Retrieve the jobs placed after the last job of the previous page,
+            # instead of skipping the jobs of the previous pages
+            paginated_mongodb_filter = combine_all_mongodb_filters(
+                mongodb_filter,
+                get_keyset_filter(
+                    sorting, decode_continuation_token(continuation_token, sorting)
+                ),
+            )
+            nbr_skipped_items = 0
         LD_jobs = list(
             mc["jobs"]
-            .find(mongodb_filter)
+            .find(paginated_mongodb_filter)
             .sort(sorting)
             .skip(nbr_skipped_items)
             .limit(nbr_items_to_display)
@@ -274,6 +337,7 @@ def get_jobs(
     job_array=None,
     user_prop_name=None,
     user_prop_content=None,
+    continuation_token=None,
 ):
     """
     Set up the filters according to the parameters and retrieve the requested jobs from the database.
@@ -293,6 +357,8 @@ def get_jobs(
         job_array               ID of job array in which we look for jobs.
         user_prop_name          name of user prop (string) we must find in jobs to look for.
         user_prop_content       content of user prop (string) we must find in jobs to look for.
+        continuation_token      Token sent back with the previous page of jobs, used
+                                instead of nbr_skipped_items to retrieve the next page.
 
     Returns:
         A tuple containing:
@@ -336,6 +402,7 @@ def get_jobs(
         want_count=want_count,
         sort_by=sort_by,
         sort_asc=sort_asc,
+        continuation_token=continuation_token,
     )
 
 
@@ -6,6 +6,15 @@ and rest_routes, which are just fronts for these functions here.
 
 from flask.globals import current_app
 from clockwork_web.db import get_db
+from clockwork_web.core.continuation_token_helper import (
+    decode_continuation_token,
+    get_continuation_token,
+    get_keyset_filter,
+)
+
+# Sorting of the nodes. The node name and the cluster name identify each node,
+# so the nodes are always listed in the same order.
+NODES_SORTING = [["slurm.name", 1], ["slurm.cluster_name", 1]]
 
 
 def get_filter_node_name(node_name):
@@ -28,6 +37,7 @@ def get_nodes(
     nbr_skipped_items=None,
     nbr_items_to_display=None,
     want_count=False,
+    continuation_token=None,
 ) -> list:
     """
     Talk to the database and get the information.
@@ -40,6 +50,10 @@ def get_nodes(
         nbr_items_to_display    Number of nodes to display
         want_count              Whether or not we are interested by the number of
                                 unpaginated nodes.
+        continuation_token      Token sent back with the previous page (see
+                                get_nodes_continuation_token). If it is provided,
+                                the nodes following this page are retrieved and
+                                nbr_skipped_items is ignored.
 
     Returns:
         Returns a tuple (nodes_list, nodes_count or None).
@@ -65,19 +79,29 @@ def get_nodes(
 
     # Get the filtered and paginated nodes from it
     if nbr_skipped_items != None and nbr_items_to_display:
+        paginated_mongodb_filter = mongodb_filter
+        if continuation_token:
+            # Retrieve the nodes placed after the last node of the previous page,
+            # instead of skipping the nodes of the previous pages
+            keyset_filter = get_keyset_filter(
+                NODES_SORTING,
+                decode_continuation_token(continuation_token, NODES_SORTING),
+            )
+            paginated_mongodb_filter = (
+                {"$and": [mongodb_filter, keyset_filter]}
+                if mongodb_filter
+                else keyset_filter
+            )
+            nbr_skipped_items = 0
         LD_nodes = list(
             mc["nodes"]
-            .find(mongodb_filter)
-            .sort([["slurm.name", 1], ["slurm.cluster_name", 1]])
+            .find(paginated_mongodb_filter)
+            .sort(NODES_SORTING)
             .skip(nbr_skipped_items)
             .limit(nbr_items_to_display)
         )
     else:
-        LD_nodes = list(
-            mc["nodes"]
-            .find(mongodb_filter)
-            .sort([["slurm.name", 1], ["slurm.cluster_name", 1]])
-        )
+        LD_nodes = list(mc["nodes"].find(mongodb_filter).sort(NODES_SORTING))
 
     if want_count:
         # Get the number of filtered nodes (not paginated)
@@ -90,6 +114,21 @@ def get_nodes(
     return (LD_nodes, nbr_total_nodes)
 
 
+def get_nodes_continuation_token(LD_nodes, nbr_items_to_display):
+    """
+    Create the continuation token used to retrieve the page of nodes following
+    the given one, with get_nodes.
+
+    Parameters:
+        LD_nodes                Nodes of the current page, as retrieved from the database
+        nbr_items_to_display    Number of nodes requested for the current page
+
+    Returns:
+        The continuation token, or None if there is no following page
+    """
+    return get_continuation_token(LD_nodes, NODES_SORTING, nbr_items_to_display)
+
+
 def strip_artificial_fields_from_node(D_node):
     # Returns a copy. Does not mutate the original.
     # Useful because mongodb puts a non-json-serializable "_id" field.
@@ -1,7 +1,11 @@
 from types import SimpleNamespace
 
 from clockwork_web.core.clusters_helper import get_all_clusters
-from clockwork_web.core.jobs_helper import get_inferred_job_states, get_jobs
+from clockwork_web.core.jobs_helper import (
+    get_inferred_job_states,
+    get_jobs,
+    get_jobs_continuation_token,
+)
 from clockwork_web.core.utils import (
     get_custom_array_from_request_args,
     to_boolean,
@@ -69,6 +73,8 @@ def parse_search_request(user, args, force_pagination=True):
         job_ids=job_ids,
         pagination_page_num=args.get("page_num", type=int, default=default_page_number),
         pagination_nbr_items_per_page=args.get("nbr_items_per_page", type=int),
+        continuation_token=args.get("continuation_token", type=str, default=None)
+        or None,
         sort_by=sort_by,
         sort_asc=sort_asc,
         want_count=want_count,
@@ -85,6 +91,7 @@ def parse_search_request(user, args, force_pagination=True):
         not force_pagination
         and not query.pagination_page_num
         and not query.pagination_nbr_items_per_page
+        and not query.continuation_token
     ):
         # In this particular case, we set the default pagination arguments to be `None`,
         # which will effectively disable pagination.
@@ -121,5 +128,10 @@ def search_request(user, args, force_pagination=True):
         job_array=query.job_array,
         user_prop_name=query.user_prop_name,
         user_prop_content=query.user_prop_content,
+        continuation_token=query.continuation_token,
+    )
+    # Token used to retrieve the next page, if any
+    query.next_continuation_token = get_jobs_continuation_token(
+        jobs, query.nbr_items_to_display, sort_by=query.sort_by, sort_asc=query.sort_asc
     )
     return (query, jobs, nbr_total_jobs)
@@ -19,6 +19,7 @@ from clockwork_web.config import (
     string as valid_string,
 )
 from clockwork_web.core.clusters_helper import get_all_clusters, get_account_fields
+from clockwork_web.core.cluster_stats_helper import get_cluster_freshness_cache
 from clockwork_web.core.jobs_helper import get_jobs_properties_list_per_page, get_jobs
 
 from clockwork_web.core.utils import (
@@ -315,6 +316,56 @@ def get_users():
     return list(users)
 
 
+def get_users_counts():
+    """
+    Count the users of the database, through a single aggregation run
+    by the database: no user document is sent back.
+
+    Returns:
+        A dictionary presenting the number of users ("nb_users"), of enabled
+        users ("nb_enabled_users") and of users having a DRAC account ("nb_drac_users")
+    """
+    LD_counts = list(
+        get_db()["users"].aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": None,
+                        "nb_users": {"$sum": 1},
+                        "nb_enabled_users": {
+                            "$sum": {"$cond": [{"$eq": ["$status", "enabled"]}, 1, 0]}
+                        },
+                        # A user has a DRAC account if the field "cc_account_username"
+                        # contains a valid value
+                        "nb_drac_users": {
+                            "$sum": {
+                                "$cond": [
+                                    {
+                                        "$in": [
+                                            {"$ifNull": ["$cc_account_username", None]},
+                                            [None, ""],
+                                        ]
+                                    },
+                                    0,
+                                    1,
+                                ]
+                            }
+                        },
+                    }
+                }
+            ]
+        )
+    )
+    if not LD_counts:
+        return {"nb_users": 0, "nb_enabled_users": 0, "nb_drac_users": 0}
+    (D_counts,) = LD_counts
+    return {
+        "nb_users": D_counts["nb_users"],
+        "nb_enabled_users": D_counts["nb_enabled_users"],
+        "nb_drac_users": D_counts["nb_drac_users"],
+    }
+
+
 def get_available_clusters_from_user_dict(D_user):
     """
     Retrieve the clusters a user can access.
@@ -591,38 +642,38 @@ def render_template_with_user_settings(template_name_or_list, **context):
     )
 
     # Get cluster status (if jobs are old and cluster has error).
+    # The latest job updates are shared by all the pages rendered by this process,
+    # and read again at most every few seconds.
+    D_last_job_updates = get_cluster_freshness_cache().get_last_job_updates(
+        list(context["clusters"])
+    )
     for cluster_name in context["clusters"]:
         # Cluster error cannot yet be checked, so
         # cluster_has_error is always False for now.
         cluster_has_error = False
         context["clusters"][cluster_name]["status"] = {
-            "jobs_are_old": _jobs_are_old(cluster_name),
+            "jobs_are_old": _jobs_are_old(D_last_job_updates[cluster_name]),
             "cluster_has_error": cluster_has_error,
         }
 
     return render_template(template_name_or_list, **context)
 
 
-def _jobs_are_old(cluster_name):
-    """Return True if last slurm update in given cluster is older than 2 days."""
-    jobs_are_old = False
+def _jobs_are_old(most_recent_job_edition):
+    """
+    Return True if the last slurm update of a cluster is older than 2 days.
 
-    mongodb_filter = {"slurm.cluster_name": cluster_name}
-    mc = get_db()
-    job_with_max_cw_last_slurm_update = list(
-        mc["jobs"].find(mongodb_filter).sort([("cw.last_slurm_update", -1)]).limit(1)
-    )
+    Parameters:
+        most_recent_job_edition     Latest "cw.last_slurm_update" of the jobs of the cluster,
+                                    or None if it has no job
+    """
+    jobs_are_old = False
 
-    if job_with_max_cw_last_slurm_update:
-        (job,) = job_with_max_cw_last_slurm_update
-        if "last_slurm_update" in job["cw"]:
-            most_recent_job_edition = job["cw"]["last_slurm_update"]
-            current_timestamp = datetime.now().timestamp()
-            elapsed_time = timedelta(
-                seconds=current_timestamp - most_recent_job_edition
-            )
-            # Let's say the latest jobs edition must not be older than max_delay.
-            max_delay = timedelta(days=2)
-            jobs_are_old = elapsed_time > max_delay
+    if most_recent_job_edition is not None:
+        current_timestamp = datetime.now().timestamp()
+        elapsed_time = timedelta(seconds=current_timestamp - most_recent_job_edition)
+        # Let's say the latest jobs edition must not be older than max_delay.
+        max_delay = timedelta(days=2)
+        jobs_are_old = elapsed_time > max_delay
 
     return jobs_are_old
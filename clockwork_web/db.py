@@ -1,44 +1,163 @@
-from pymongo import MongoClient
+import os
+import threading
+import time
+
+from pymongo import MongoClient, monitoring
 
 from flask import current_app
-from flask import g
 from flask.cli import with_appcontext
 
-from clockwork_web.config import get_config, register_config, string
+from clockwork_web.config import get_config, register_config, integer, string
 
 register_config("mongo.connection_string", validator=string)
 register_config("mongo.database_name", "clockwork", validator=string)
+# Maximum number of connections opened by the client of each process
+register_config("mongo.max_pool_size", 100, validator=integer)
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Collect statistics on the connection pool of the MongoClient: the connections
+    opened and checked out, and the time spent waiting for a connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Time at which the current thread started to wait for a connection
+        self._local = threading.local()
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.wait_start = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait = self._get_wait()
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def connection_check_out_failed(self, event):
+        wait = self._get_wait()
+        with self._lock:
+            self.checkout_failures += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def _get_wait(self):
+        wait_start = getattr(self._local, "wait_start", None)
+        self._local.wait_start = None
+        return 0.0 if wait_start is None else time.perf_counter() - wait_start
+
+    def get_stats(self):
+        """
+        Return the statistics as a dictionary.
+        """
+        with self._lock:
+            return {
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "connections_open": self.connections_created - self.connections_closed,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "total_wait_seconds": self.total_wait_seconds,
+                "max_wait_seconds": self.max_wait_seconds,
+                "mean_wait_seconds": (
+                    self.total_wait_seconds / self.checkouts if self.checkouts else 0.0
+                ),
+            }
+
+
+# The MongoClient shared by all the requests of the process, with the statistics of
+# its pool and the process which created it. A MongoClient can not be used across
+# a fork (as gunicorn does when starting its workers), thus each process creates its own.
+_client = None
+_client_pool_stats = None
+_client_pid = None
+_client_lock = threading.Lock()
 
 
 def _get_db():
     """Connect to the application's configured database.
 
-    The connection is unique for each request and will be reused
-    if this is called again in the same request context.
+    The client is created lazily, once per process, and is shared by all the
+    requests handled by this process: its pool keeps the connections open, so
+    that the requests do not pay the connection setup, server discovery,
+    authentication and TLS handshake.
 
     Returns:
         MongoClient: a client to the mongodb server (but not a specific collection)
     """
-    if "db" not in g:
-        g.db = MongoClient(get_config("mongo.connection_string"))
+    global _client, _client_pool_stats, _client_pid
+
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                # The client inherited from the parent process (if any) is not closed,
+                # as its sockets are shared with the parent
+                _client_pool_stats = PoolStatsListener()
+                _client = MongoClient(
+                    get_config("mongo.connection_string"),
+                    maxPoolSize=get_config("mongo.max_pool_size"),
+                    event_listeners=[_client_pool_stats],
+                )
+                _client_pid = pid
 
-    return g.db
+    return _client
 
 
 def get_db():
     return _get_db()[get_config("mongo.database_name")]
 
 
-def close_db(e=None):
-    """If this request connected to the database, close the connection.
-
-    Disclaimer: The `e=None` code is cargo code. Not sure why it's there.
-    Not really worth investigating too deeply now, but maybe later.
+def get_pool_stats():
     """
-    db = g.pop("db", None)
-
-    if db is not None:
-        db.close()
+    Return the statistics of the connection pool of the client of this process,
+    or None if no client has been created yet.
+    """
+    if _client_pool_stats is None or _client_pid != os.getpid():
+        return None
+    return {
+        "pid": _client_pid,
+        "max_pool_size": get_config("mongo.max_pool_size"),
+        **_client_pool_stats.get_stats(),
+    }
 
 
 # Note that all the `init_db` and `init_app` code were
@@ -87,5 +206,4 @@ def init_app(app):
     """Register database functions with the Flask app. This is called by
     the application factory.
     """
-    app.teardown_appcontext(close_db)
     app.cli.add_command(init_db_command)
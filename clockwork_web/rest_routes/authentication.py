@@ -20,6 +20,7 @@ from flask import request
 from flask.json import jsonify
 
 from ..db import get_db
+from ..core.api_key_cache_helper import get_api_key_cache
 
 
 def authentication_required(f):
@@ -32,6 +33,23 @@ def authentication_required(f):
             logging.warning("REST authentication error : no authorization in request")
             return jsonify("Authorization error."), 401
 
+        # The authentications are cached for a short time (see api_key_cache_helper)
+        api_key_cache = get_api_key_cache()
+        (is_cached, D_user) = api_key_cache.get(auth["username"], auth["password"])
+        if is_cached:
+            if D_user is None:
+                logging.warning(
+                    f"REST authentication error : cached failure (user {auth['username']})"
+                )
+                return jsonify("Authorization error."), 401
+            if D_user.get("status") != "enabled":
+                logging.warning(
+                    f"REST authentication error : user {auth['username']} is disabled"
+                )
+                return jsonify("Authorization error."), 401
+            g.current_user_with_rest_auth = D_user
+            return f(*args, **kwargs)
+
         mc = get_db()
         L = list(mc["users"].find({"mila_email_username": auth["username"]}))
 
@@ -39,6 +57,7 @@ def authentication_required(f):
             logging.warning(
                 f"REST authentication error : user {auth['username']} not in database"
             )
+            api_key_cache.set_rejected(auth["username"])
             return jsonify("Authorization error."), 401
         elif len(L) > 1:
             logging.warning(
@@ -50,6 +69,13 @@ def authentication_required(f):
         if D_user["clockwork_api_key"] is not None and secrets.compare_digest(
             D_user["clockwork_api_key"], auth["password"]
         ):
+            if D_user.get("status") != "enabled":
+                logging.warning(
+                    f"REST authentication error : user {auth['username']} is disabled"
+                )
+                api_key_cache.set_rejected(auth["username"], auth["password"])
+                return jsonify("Authorization error."), 401
+            api_key_cache.set_authenticated(auth["username"], auth["password"], D_user)
             g.current_user_with_rest_auth = D_user
             return f(*args, **kwargs)
             # no need to manually clear `g.current_user_with_rest_auth` because
@@ -58,6 +84,7 @@ def authentication_required(f):
             logging.warning(
                 f"REST authentication error : bad key (user {auth['username']})"
             )
+            api_key_cache.set_rejected(auth["username"], auth["password"])
             return jsonify("Authorization error."), 401
 
     return decorated
@@ -8,6 +8,7 @@ from flask.json import jsonify
 from flask.globals import current_app
 
 from clockwork_web.core.search_helper import search_request
+from clockwork_web.core.continuation_token_helper import InvalidContinuationTokenError
 from .authentication import authentication_required
 from ..db import get_db
 from ..user import User
@@ -39,6 +40,9 @@ flask_api = Blueprint("rest_jobs", __name__)
 @authentication_required
 def route_api_v1_jobs_list():
     """
+    The jobs can be paginated with the optional arguments "page_num",
+    "nbr_items_per_page" and "continuation_token". When there is a next page,
+    its continuation token is sent in the "Clockwork-Continuation-Token" header.
 
     .. :quickref: list all Slurm jobs
     """
@@ -54,20 +58,26 @@ def route_api_v1_jobs_list():
     # want_count = to_boolean(want_count)
 
     # Parse the request arguments
-    (query, LD_jobs, nbr_total_jobs) = search_request(
-        current_user,
-        request.args,
-        force_pagination=False,
-    )
+    try:
+        (query, LD_jobs, nbr_total_jobs) = search_request(
+            current_user,
+            request.args,
+            force_pagination=False,
+        )
+    except InvalidContinuationTokenError:
+        return jsonify("Invalid continuation_token."), 400
 
     # Return the requested jobs, and the number of all the jobs
     LD_jobs = [
         strip_artificial_fields_from_job(D_job) for D_job in LD_jobs
     ]  # Remove the field "_id" of each job before jsonification
     if query.want_count:
-        return jsonify({"nbr_total_jobs": nbr_total_jobs, "jobs": LD_jobs})
+        response = jsonify({"nbr_total_jobs": nbr_total_jobs, "jobs": LD_jobs})
     else:
-        return jsonify(LD_jobs)
+        response = jsonify(LD_jobs)
+    if query.next_continuation_token:
+        response.headers["Clockwork-Continuation-Token"] = query.next_continuation_token
+    return response
 
 
 @flask_api.route("/jobs/one")
@@ -11,8 +11,11 @@ import logging
 from clockwork_web.core.nodes_helper import (
     get_nodes,
     get_filter_node_name,
+    get_nodes_continuation_token,
     strip_artificial_fields_from_node,
 )
+from clockwork_web.core.continuation_token_helper import InvalidContinuationTokenError
+from clockwork_web.core.pagination_helper import get_pagination_values
 from clockwork_web.core.jobs_helper import (
     combine_all_mongodb_filters,
     get_filter_cluster_name,
@@ -30,6 +33,10 @@ def route_api_v1_nodes_list():
     """
     Take one optional args "cluster_name", as in "/nodes/list?cluster_name=beluga".
 
+    The nodes can be paginated with the optional arguments "page_num",
+    "nbr_items_per_page" and "continuation_token". When there is a next page,
+    its continuation token is sent in the "Clockwork-Continuation-Token" header.
+
     .. :quickref: list all Slurm nodes
     """
     current_user_id = g.current_user_with_rest_auth["mila_email_username"]
@@ -39,12 +46,38 @@ def route_api_v1_nodes_list():
 
     # Set up filters related to the constraints (here, not so much)
     filter = get_filter_cluster_name(request.args.get("cluster_name", None))
+
+    # The nodes are only paginated if it is requested
+    pagination_page_num = request.args.get("page_num", type=int)
+    pagination_nbr_items_per_page = request.args.get("nbr_items_per_page", type=int)
+    continuation_token = request.args.get("continuation_token", None) or None
+    if pagination_page_num or pagination_nbr_items_per_page or continuation_token:
+        (nbr_skipped_items, nbr_items_to_display) = get_pagination_values(
+            current_user_id, pagination_page_num, pagination_nbr_items_per_page
+        )
+    else:
+        (nbr_skipped_items, nbr_items_to_display) = (None, None)
+
     # Get a list of the nodes corresponding to the filters
-    (LD_nodes, _) = get_nodes(filter)
+    try:
+        (LD_nodes, _) = get_nodes(
+            filter,
+            nbr_skipped_items=nbr_skipped_items,
+            nbr_items_to_display=nbr_items_to_display,
+            continuation_token=continuation_token,
+        )
+    except InvalidContinuationTokenError:
+        return jsonify("Invalid continuation_token."), 400
+    next_continuation_token = get_nodes_continuation_token(
+        LD_nodes, nbr_items_to_display
+    )
     # Delete the _id element of each node
     LD_nodes = [strip_artificial_fields_from_node(D_node) for D_node in LD_nodes]
     # Return the nodes
-    return jsonify(LD_nodes)
+    response = jsonify(LD_nodes)
+    if next_continuation_token:
+        response.headers["Clockwork-Continuation-Token"] = next_continuation_token
+    return response
 
 
 @flask_api.route("/nodes/one")
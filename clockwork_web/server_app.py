@@ -124,9 +124,15 @@ def create_app(extra_config: dict):
     @app.template_global()
     def modify_query(**new_values):
         args = request.args.copy()
+        # A continuation token designates the page following the current one:
+        # it is only kept if it is explicitly provided
+        args.pop("continuation_token", None)
 
         for key, value in new_values.items():
-            args[key] = value
+            if value is None:
+                args.pop(key, None)
+            else:
+                args[key] = value
 
         return "{}?{}".format(request.path, urlencode(args))
 
@@ -22,6 +22,7 @@ from flask_babel import gettext
 import secrets
 
 from .db import get_db
+from clockwork_web.core.api_key_cache_helper import get_api_key_cache
 from clockwork_web.core.users_helper import (
     enable_dark_mode,
     disable_dark_mode,
@@ -161,6 +162,12 @@ class User(UserMixin):
         if res.modified_count != 1:
             self.clockwork_api_key = old_key
             raise ValueError(gettext("could not modify api key"))
+        # The old key should not be accepted anymore by the REST API. The other
+        # workers of the server keep accepting it until their cached
+        # authentication expires (see rest.auth_cache_ttl). Any other change of
+        # the user affecting the REST authentication (such as its status) has
+        # to invalidate its cached authentications the same way
+        get_api_key_cache().invalidate(self.mila_email_username)
 
     def new_update_key(self):
         """
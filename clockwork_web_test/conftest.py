@@ -10,6 +10,7 @@ from flask.globals import current_app
 from flask_login import login_user, logout_user
 
 import pytest
+from pymongo.collection import Collection
 
 import clockwork_web
 from clockwork_web.server_app import create_app
@@ -60,6 +61,33 @@ def client(app):
         yield client
 
 
+@pytest.fixture
+def read_documents(monkeypatch):
+    """
+    Record the reads sent to the database during a test.
+
+    Yields a dictionary presenting, for each collection name:
+    - in "find", the filters of the find (and find_one) calls,
+    - in "aggregate", the documents sent back by the aggregations.
+    """
+    D_read_documents = {"find": {}, "aggregate": {}}
+    original_find = Collection.find
+    original_aggregate = Collection.aggregate
+
+    def find(self, filter=None, *args, **kwargs):
+        D_read_documents["find"].setdefault(self.name, []).append(filter)
+        return original_find(self, filter, *args, **kwargs)
+
+    def aggregate(self, *args, **kwargs):
+        L_documents = list(original_aggregate(self, *args, **kwargs))
+        D_read_documents["aggregate"].setdefault(self.name, []).extend(L_documents)
+        return iter(L_documents)
+
+    monkeypatch.setattr(Collection, "find", find)
+    monkeypatch.setattr(Collection, "aggregate", aggregate)
+    yield D_read_documents
+
+
 @pytest.fixture
 def app_with_login():
     """Create and configure a new app instance with local login enabled."""
@@ -42,6 +42,34 @@ def test_clusters_one_success(client, current_user_id, cluster_name):
     assert response_logout.status_code == 302  # Redirect
 
 
+def test_clusters_one_does_not_read_jobs(client, read_documents):
+    """
+    Test that the function route_one computes the job dates of the cluster
+    in the database, without retrieving any job document.
+
+    Parameters:
+    - client            The web client used to send the request
+    - read_documents    The documents sent back by the database during the test
+    """
+    # Log in to Clockwork as a user who can access the Mila cluster
+    login_response = client.get("/login/testing?user_id=student00@mila.quebec")
+    assert login_response.status_code == 302  # Redirect
+    for D_reads in read_documents.values():
+        D_reads.clear()
+
+    response = client.get("/clusters/one?cluster_name=mila")
+    assert response.status_code == 200  # Success
+
+    # The jobs are only read through aggregations returning numbers
+    assert "jobs" not in read_documents["find"]
+    for D_document in read_documents["aggregate"].get("jobs", []):
+        assert "slurm" not in D_document and "cw" not in D_document
+
+    # Log out from Clockwork
+    response_logout = client.get("/login/logout")
+    assert response_logout.status_code == 302  # Redirect
+
+
 def test_clusters_one_forbidden(client):
     """
     Test the function route_one when retrieving an existing cluster, to which
@@ -13,7 +13,10 @@ Lots of details about these tests depend on the particular values that we put in
 
 """
 
+import html
 import json
+import re
+
 import pytest
 
 from clockwork_web.core.pagination_helper import get_pagination_values
@@ -207,6 +210,45 @@ def test_nodes_with_both_pagination_options(
     assert response_logout.status_code == 302  # Redirect
 
 
+def test_nodes_next_page_link(client, fake_data: dict[list[dict]]):
+    """
+    Check that the link to the next page carries the continuation token of
+    the current page, and leads to the nodes of the next page.
+
+    Parameters
+        client              The web client to request. Note that this fixture
+                            depends on other fixtures that are going to put the
+                            fake data in the database for us
+        fake_data           The data our tests are based on
+    """
+    current_user_id = "student00@mila.quebec"
+    nbr_items_per_page = 3
+
+    # Log in to Clockwork as the current_user
+    login_response = client.get(f"/login/testing?user_id={current_user_id}")
+    assert login_response.status_code == 302  # Redirect
+
+    response = client.get(f"/nodes/list?nbr_items_per_page={nbr_items_per_page}")
+    assert response.status_code == 200
+    L_links = re.findall(
+        r'href="([^"]*continuation_token=[^"]*)"', response.get_data(as_text=True)
+    )
+    assert len(L_links) == 1
+
+    # Follow the link to the next page
+    response = client.get(html.unescape(L_links[0]))
+    assert response.status_code == 200
+    expected_nodes = _get_associated_nodes_from_fake_data_in_order(
+        current_user_id, fake_data
+    )[nbr_items_per_page : 2 * nbr_items_per_page]
+    for D_node in expected_nodes:
+        assert D_node["slurm"]["name"] in response.get_data(as_text=True)
+
+    # Log out from Clockwork
+    response_logout = client.get("/login/logout")
+    assert response_logout.status_code == 302  # Redirect
+
+
 @pytest.mark.parametrize(
     "current_user_id,page_num",
     [
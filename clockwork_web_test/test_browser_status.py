@@ -2,6 +2,8 @@
 
 import re
 
+from clockwork_web.db import get_db
+
 
 def test_status_nb_users(client, fake_data):
     """
@@ -69,3 +71,95 @@ def test_status_nb_users(client, fake_data):
     assert int(result_nb_users.group(1)) == nb_users
     assert int(result_nb_enabled_users.group(1)) == nb_enabled_users
     assert int(result_nb_drac_users.group(1)) == nb_drac_users
+
+
+def test_status_cluster_stats(client, app, fake_data):
+    """
+    Verify that the status page presents the summary of the jobs stored
+    by the ingestion in the "cluster_stats" collection, and that the
+    clusters without summary are computed from their jobs.
+
+    Parameters:
+        client              The web client to request
+        app                 The scope of our tests, used to access the database
+        fake_data           The data our tests are based on
+    """
+    user_dict = fake_data["users"][0]
+    login_response = client.get(
+        f"/login/testing?user_id={user_dict['mila_email_username']}"
+    )
+    assert login_response.status_code == 302  # Redirect
+
+    re_nb_jobs = re.compile(r"<td>Number of jobs</td>\s+<td>([0-9]+)</td>")
+
+    # Without summary, the jobs are counted
+    response = client.get("/status/")
+    assert response.status_code == 200
+    L_nb_jobs = [
+        int(nb_jobs) for nb_jobs in re_nb_jobs.findall(response.get_data(as_text=True))
+    ]
+    assert sum(L_nb_jobs) == len(fake_data["jobs"])
+
+    # A stored summary is presented as is
+    with app.app_context():
+        get_db()["cluster_stats"].insert_one(
+            {
+                "cluster_name": "mila",
+                "jobs": {
+                    "nb_jobs": 123456,
+                    "nb_jobs_by_state": {"RUNNING": 123456},
+                    "job_dates": {"min": 1700000000.0, "max": 1700003600.0},
+                    "last_update": 1700003600.0,
+                },
+            }
+        )
+    try:
+        response = client.get("/status/")
+        assert response.status_code == 200
+        assert 123456 in [
+            int(nb_jobs)
+            for nb_jobs in re_nb_jobs.findall(response.get_data(as_text=True))
+        ]
+    finally:
+        with app.app_context():
+            get_db()["cluster_stats"].delete_many({})
+
+    # Log out from Clockwork
+    response_logout = client.get("/login/logout")
+    assert response_logout.status_code == 302  # Redirect
+
+
+def test_status_does_not_read_jobs(client, fake_data, read_documents):
+    """
+    Verify that the status page computes its counts in the database,
+    without retrieving any job or user document.
+
+    Parameters:
+        client              The web client to request
+        fake_data           The data our tests are based on
+        read_documents      The documents sent back by the database during the test
+    """
+    user_dict = fake_data["users"][0]
+    login_response = client.get(
+        f"/login/testing?user_id={user_dict['mila_email_username']}"
+    )
+    assert login_response.status_code == 302  # Redirect
+    for D_reads in read_documents.values():
+        D_reads.clear()
+
+    response = client.get("/status/")
+    assert response.status_code == 200
+
+    # The jobs are only read through aggregations returning numbers
+    assert "jobs" not in read_documents["find"]
+    for D_document in read_documents["aggregate"].get("jobs", []):
+        assert "slurm" not in D_document and "cw" not in D_document
+    # The users are counted by the database: only the current user is retrieved
+    for D_filter in read_documents["find"].get("users", []):
+        assert D_filter == {"mila_email_username": user_dict["mila_email_username"]}
+    for D_document in read_documents["aggregate"].get("users", []):
+        assert "mila_email_username" not in D_document
+
+    # Log out from Clockwork
+    response_logout = client.get("/login/logout")
+    assert response_logout.status_code == 302  # Redirect
@@ -0,0 +1,63 @@
+"""
+Tests for the clockwork_web.core.api_key_cache_helper functions.
+"""
+
+from clockwork_web.core.api_key_cache_helper import ApiKeyCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_api_key_cache():
+    clock = FakeClock()
+    cache = ApiKeyCache(ttl=30, negative_ttl=5, max_entries=100, clock=clock)
+    D_user = {"mila_email_username": "student00@mila.quebec", "clockwork_api_key": "k"}
+
+    assert cache.get("student00@mila.quebec", "k") == (False, None)
+    cache.set_authenticated("student00@mila.quebec", "k", D_user)
+
+    # The authentication is reused with the same key only, without the key
+    assert cache.get("student00@mila.quebec", "k") == (
+        True,
+        {"mila_email_username": "student00@mila.quebec"},
+    )
+    assert cache.get("student00@mila.quebec", "other") == (False, None)
+
+    # A failed authentication is reused for a shorter time
+    cache.set_rejected("student00@mila.quebec", "other")
+    assert cache.get("student00@mila.quebec", "other") == (True, None)
+    clock.now = 10
+    assert cache.get("student00@mila.quebec", "other") == (False, None)
+    assert cache.get("student00@mila.quebec", "k")[0]
+    clock.now = 31
+    assert cache.get("student00@mila.quebec", "k") == (False, None)
+
+    # All the keys are rejected for an unknown user
+    cache.set_rejected("unknown@mila.quebec")
+    assert cache.get("unknown@mila.quebec", "any key") == (True, None)
+
+    assert cache.get_stats()["hits"] == 4
+
+
+def test_api_key_cache_invalidate():
+    cache = ApiKeyCache(ttl=30, negative_ttl=5, max_entries=100)
+    cache.set_authenticated("student00@mila.quebec", "k", {})
+    cache.set_rejected("student00@mila.quebec", "other")
+    cache.set_authenticated("student01@mila.quebec", "k", {})
+
+    cache.invalidate("student00@mila.quebec")
+    assert cache.get("student00@mila.quebec", "k") == (False, None)
+    assert cache.get("student00@mila.quebec", "other") == (False, None)
+    assert cache.get("student01@mila.quebec", "k") == (True, {})
+
+
+def test_api_key_cache_max_entries():
+    cache = ApiKeyCache(ttl=30, negative_ttl=5, max_entries=10)
+    for i in range(25):
+        cache.set_rejected("student00@mila.quebec", f"key{i}")
+        assert cache.get_stats()["size"] <= 10
@@ -0,0 +1,58 @@
+"""
+Tests for the clockwork_web.core.cluster_stats_helper functions.
+"""
+
+from clockwork_web.core import cluster_stats_helper
+from clockwork_web.core.cluster_stats_helper import ClusterFreshnessCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cluster_freshness_cache(monkeypatch):
+    clock = FakeClock()
+    L_reads = []
+    D_last_job_updates = {"mila": 1700000000.0, "graham": None}
+
+    def read_last_job_updates(cluster_names):
+        L_reads.append(list(cluster_names))
+        return {
+            cluster_name: D_last_job_updates.get(cluster_name)
+            for cluster_name in cluster_names
+        }
+
+    monkeypatch.setattr(
+        cluster_stats_helper, "_read_last_job_updates", read_last_job_updates
+    )
+    cache = ClusterFreshnessCache(ttl=10, clock=clock)
+
+    # Several renderings within the ttl read the database once
+    for _ in range(5):
+        assert cache.get_last_job_updates(["mila", "graham"]) == {
+            "mila": 1700000000.0,
+            "graham": None,
+        }
+    assert L_reads == [["mila", "graham"]]
+    assert cache.refreshes == 1
+
+    # A subset of the clusters is served from the cache
+    assert cache.get_last_job_updates(["graham"]) == {"graham": None}
+    assert len(L_reads) == 1
+
+    # The values are read again once expired
+    D_last_job_updates["mila"] = 1700000100.0
+    clock.now = 10.0
+    assert cache.get_last_job_updates(["mila", "graham"])["mila"] == 1700000100.0
+    assert len(L_reads) == 2
+
+    # An unknown cluster triggers a read, as well as an invalidation
+    cache.get_last_job_updates(["mila", "cedar"])
+    assert len(L_reads) == 3
+    cache.invalidate()
+    cache.get_last_job_updates(["mila"])
+    assert len(L_reads) == 4
@@ -0,0 +1,91 @@
+"""
+Tests for the clockwork_web.core.continuation_token_helper functions.
+"""
+
+import pytest
+
+from clockwork_web.core.continuation_token_helper import (
+    InvalidContinuationTokenError,
+    decode_continuation_token,
+    encode_continuation_token,
+    get_continuation_token,
+    get_keyset_filter,
+    get_sorting_values,
+)
+
+SORTING = [["slurm.end_time", -1], ["slurm.job_id", 1], ["slurm.cluster_name", 1]]
+
+
+def test_continuation_token():
+    D_job = {"slurm": {"end_time": None, "job_id": "123", "cluster_name": "mila"}}
+    assert get_sorting_values(D_job, SORTING) == [None, "123", "mila"]
+    assert get_sorting_values({"slurm": {}}, SORTING) == [None, None, None]
+
+    continuation_token = encode_continuation_token(D_job, SORTING)
+    assert decode_continuation_token(continuation_token, SORTING) == [
+        None,
+        "123",
+        "mila",
+    ]
+
+    # The token is only valid for the sorting it has been created with
+    with pytest.raises(InvalidContinuationTokenError):
+        decode_continuation_token(continuation_token, SORTING[1:])
+    for invalid_token in ["", "invalid", "e30=", "W10="]:
+        with pytest.raises(InvalidContinuationTokenError):
+            decode_continuation_token(invalid_token, SORTING)
+
+    # A token is only created for a full page
+    assert get_continuation_token([D_job], SORTING, 2) is None
+    assert get_continuation_token([D_job], SORTING, None) is None
+    assert get_continuation_token([D_job, D_job], SORTING, 2) == continuation_token
+
+
+def test_get_keyset_filter():
+    # In descending order, the None values follow the other values
+    assert get_keyset_filter(SORTING, [1700000000, "123", "mila"]) == {
+        "$or": [
+            {
+                "$and": [
+                    {
+                        "$or": [
+                            {"slurm.end_time": {"$lt": 1700000000}},
+                            {"slurm.end_time": None},
+                        ]
+                    }
+                ]
+            },
+            {
+                "$and": [
+                    {"slurm.end_time": 1700000000},
+                    {"slurm.job_id": {"$gt": "123"}},
+                ]
+            },
+            {
+                "$and": [
+                    {"slurm.end_time": 1700000000},
+                    {"slurm.job_id": "123"},
+                    {"slurm.cluster_name": {"$gt": "mila"}},
+                ]
+            },
+        ]
+    }
+
+    # In descending order, nothing follows a None value
+    assert get_keyset_filter(SORTING, [None, "123", "mila"]) == {
+        "$or": [
+            {"$and": [{"slurm.end_time": None}, {"slurm.job_id": {"$gt": "123"}}]},
+            {
+                "$and": [
+                    {"slurm.end_time": None},
+                    {"slurm.job_id": "123"},
+                    {"slurm.cluster_name": {"$gt": "mila"}},
+                ]
+            },
+        ]
+    }
+
+    # In ascending order, all the other values follow a None value
+    assert get_keyset_filter([["slurm.end_time", 1]], [None]) == {
+        "$or": [{"$and": [{"slurm.end_time": {"$ne": None}}]}]
+    }
@@ -7,6 +7,7 @@ import pytest
 from clockwork_web.core.jobs_helper import *
 from clockwork_web.db import get_db
 from clockwork_web.core.pagination_helper import get_pagination_values
+from clockwork_web.core.continuation_token_helper import InvalidContinuationTokenError
 
 
 @pytest.mark.parametrize(
@@ -56,6 +57,75 @@ def test_get_jobs_with_pagination(app, fake_data, page_num, nbr_items_per_page):
         assert jobs_count == None
 
 
+@pytest.mark.parametrize(
+    "sort_by,sort_asc", [("submit_time", -1), ("end_time", 1), ("user", 1)]
+)
+def test_get_jobs_with_continuation_token(app, fake_data, sort_by, sort_asc):
+    """
+    Test that the pages retrieved through continuation tokens are the pages
+    retrieved by skipping the jobs of the previous pages.
+
+    Parameters:
+        app                 The scope of our tests, used to set the context (to access MongoDB)
+        fake_data           The data on which our tests are based
+        sort_by             Field used to sort the jobs
+        sort_asc            Whether the jobs are sorted in ascending (1) or descending (-1) order
+    """
+    nbr_items_per_page = 7
+    with app.app_context():
+        LD_retrieved_jobs = []
+        continuation_token = None
+        for page_num in range(1, len(fake_data["jobs"]) // nbr_items_per_page + 2):
+            (nbr_skipped_items, nbr_items_to_display) = get_pagination_values(
+                None, page_num, nbr_items_per_page
+            )
+            (LD_page_jobs, _) = get_jobs(
+                nbr_skipped_items=nbr_skipped_items,
+                nbr_items_to_display=nbr_items_to_display,
+                sort_by=sort_by,
+                sort_asc=sort_asc,
+                continuation_token=continuation_token,
+            )
+            (LD_skipped_page_jobs, _) = get_jobs(
+                nbr_skipped_items=nbr_skipped_items,
+                nbr_items_to_display=nbr_items_to_display,
+                sort_by=sort_by,
+                sort_asc=sort_asc,
+            )
+            assert LD_page_jobs == LD_skipped_page_jobs
+            LD_retrieved_jobs.extend(LD_page_jobs)
+
+            continuation_token = get_jobs_continuation_token(
+                LD_page_jobs, nbr_items_to_display, sort_by=sort_by, sort_asc=sort_asc
+            )
+            if continuation_token is None:
+                break
+
+        # All the jobs have been retrieved once
+        assert continuation_token is None
+        assert len(LD_retrieved_jobs) == len(fake_data["jobs"])
+        assert len(
+            {
+                (D_job["slurm"]["job_id"], D_job["slurm"]["cluster_name"])
+                for D_job in LD_retrieved_jobs
+            }
+        ) == len(fake_data["jobs"])
+
+        # A token can not be used with another sorting
+        with pytest.raises(InvalidContinuationTokenError):
+            get_jobs(
+                nbr_skipped_items=0,
+                nbr_items_to_display=nbr_items_per_page,
+                sort_by="job_id",
+                continuation_token=get_jobs_continuation_token(
+                    LD_retrieved_jobs[:nbr_items_per_page],
+                    nbr_items_per_page,
+                    sort_by=sort_by,
+                    sort_asc=sort_asc,
+                ),
+            )
+
+
 @pytest.mark.parametrize("want_count", [(True, False)])
 def test_get_and_count_jobs_without_filters_or_pagination(app, fake_data, want_count):
     """
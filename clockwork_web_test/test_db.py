@@ -1,7 +1,11 @@
+import os
+
 from flask import current_app
 
 import pytest
-from clockwork_web.db import get_db, init_db
+import clockwork_web.db
+from clockwork_web.config import get_config
+from clockwork_web.db import get_db, get_pool_stats, init_db
 
 
 def test_insert_and_retrieve(app):
@@ -29,3 +33,37 @@ def test_insert_and_retrieve(app):
 
         # clean up
         mc["jobs"].delete_many({"slurm.job_id": job_id, "slurm.cluster_name": "mila"})
+
+
+def test_shared_client(app):
+    """
+    The requests of a process share the same client, whose pool
+    statistics are collected by a listener of the client.
+    """
+    with app.app_context():
+        client = clockwork_web.db._get_db()
+        get_db()["jobs"].find_one({})
+
+    with app.app_context():
+        assert clockwork_web.db._get_db() is client
+        D_pool_stats = get_pool_stats()
+        assert D_pool_stats["pid"] == os.getpid()
+        assert D_pool_stats["max_pool_size"] == get_config("mongo.max_pool_size")
+        assert clockwork_web.db._client_pool_stats in client.options.event_listeners
+        # All the connections have been returned to the pool
+        assert D_pool_stats["checked_out"] == 0
+        assert D_pool_stats["connections_open"] <= D_pool_stats["max_pool_size"]
+
+
+def test_client_recreated_after_fork(app, monkeypatch):
+    """
+    A process forked after the creation of the client (as the gunicorn
+    workers) creates its own client.
+    """
+    with app.app_context():
+        client = clockwork_web.db._get_db()
+        monkeypatch.setattr(os, "getpid", lambda: -1)
+        new_client = clockwork_web.db._get_db()
+        assert new_client is not client
+        assert get_pool_stats()["pid"] == -1
+        new_client["admin"].command("ping")
@@ -1,5 +1,10 @@
 from base64 import b64encode
 
+from clockwork_web.config import get_config
+from clockwork_web.core.api_key_cache_helper import get_api_key_cache
+from clockwork_web.db import get_db
+from clockwork_web.user import User
+
 # We don't test the successful case here because it's tested in
 # all the other tests.
 
@@ -26,3 +31,71 @@ def test_bad_key(client, valid_rest_auth_headers):
     response = client.get("api/v1/clusters/jobs/list", headers=valid_rest_auth_headers)
     assert response.status_code == 401
     assert "Authorization error" in response.get_data(as_text=True)
+
+
+def test_cached_authentication(client, app, valid_rest_auth_headers):
+    """
+    The successful authentications are cached, until the API key is rotated.
+    """
+    api_key_cache = get_api_key_cache()
+    api_key_cache.clear()
+
+    response = client.get("api/v1/clusters/jobs/list", headers=valid_rest_auth_headers)
+    assert response.status_code == 200
+    nb_hits = api_key_cache.get_stats()["hits"]
+    response = client.get("api/v1/clusters/jobs/list", headers=valid_rest_auth_headers)
+    assert response.status_code == 200
+    assert api_key_cache.get_stats()["hits"] == nb_hits + 1
+
+    # The rotation of the key invalidates the cached authentication
+    email = get_config("clockwork.test.email")
+    with app.app_context():
+        User.get(email).new_api_key()
+    try:
+        response = client.get(
+            "api/v1/clusters/jobs/list", headers=valid_rest_auth_headers
+        )
+        assert response.status_code == 401
+    finally:
+        with app.app_context():
+            get_db()["users"].update_one(
+                {"mila_email_username": email},
+                {"$set": {"clockwork_api_key": get_config("clockwork.test.api_key")}},
+            )
+        api_key_cache.clear()
+
+
+def test_disabled_user(client, app, valid_rest_auth_headers):
+    """
+    The disabled users are rejected, even when their authentication is cached.
+    """
+    api_key_cache = get_api_key_cache()
+    api_key_cache.clear()
+    email = get_config("clockwork.test.email")
+
+    response = client.get("api/v1/clusters/jobs/list", headers=valid_rest_auth_headers)
+    assert response.status_code == 200
+    # The user is disabled by another process, which does not clear the cache
+    (is_cached, D_user) = api_key_cache.get(email, get_config("clockwork.test.api_key"))
+    assert is_cached
+    D_user["status"] = "disabled"
+    api_key_cache.set_authenticated(email, get_config("clockwork.test.api_key"), D_user)
+    response = client.get("api/v1/clusters/jobs/list", headers=valid_rest_auth_headers)
+    assert response.status_code == 401
+
+    api_key_cache.clear()
+    with app.app_context():
+        get_db()["users"].update_one(
+            {"mila_email_username": email}, {"$set": {"status": "disabled"}}
+        )
+    try:
+        response = client.get(
+            "api/v1/clusters/jobs/list", headers=valid_rest_auth_headers
+        )
+        assert response.status_code == 401
+    finally:
+        with app.app_context():
+            get_db()["users"].update_one(
+                {"mila_email_username": email}, {"$set": {"status": "enabled"}}
+            )
+        api_key_cache.clear()
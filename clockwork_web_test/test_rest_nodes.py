@@ -69,6 +69,42 @@ def test_node_list(client, valid_rest_auth_headers):
     assert "application/json" in response.content_type
 
 
+def test_node_list_with_continuation_token(client, fake_data, valid_rest_auth_headers):
+    """
+    Make requests to the REST API endpoint /api/v1/clusters/nodes/list,
+    following the continuation tokens sent back in the response headers.
+    """
+    LD_nodes = []
+    continuation_token = ""
+    while True:
+        response = client.get(
+            f"/api/v1/clusters/nodes/list?nbr_items_per_page=5&continuation_token={continuation_token}",
+            headers=valid_rest_auth_headers,
+        )
+        assert response.status_code == 200
+        LD_nodes.extend(response.json)
+        continuation_token = response.headers.get("Clockwork-Continuation-Token")
+        if continuation_token is None:
+            break
+
+    # The pages contain all the nodes, in the order of the unpaginated list
+    response = client.get(
+        f"/api/v1/clusters/nodes/list", headers=valid_rest_auth_headers
+    )
+    assert response.status_code == 200
+    assert "Clockwork-Continuation-Token" not in response.headers
+    assert LD_nodes == response.json
+    assert len(LD_nodes) == len(fake_data["nodes"])
+
+
+def test_node_list_invalid_continuation_token(client, valid_rest_auth_headers):
+    response = client.get(
+        f"/api/v1/clusters/nodes/list?continuation_token=invalid",
+        headers=valid_rest_auth_headers,
+    )
+    assert response.status_code == 400
+
+
 def test_single_node_gpu_with_specs(client, fake_data, valid_rest_auth_headers):
     """
     Make a request to the REST API endpoint /api/v1/nodes/one/gpu.
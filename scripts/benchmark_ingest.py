@@ -0,0 +1,293 @@
+"""
+Benchmark the ingestion of large synthetic sacct and sinfo reports into MongoDB.
+
+For each requested size, a synthetic report is generated (see
+synthetic_slurm_reports.py) and ingested twice through
+main_read_report_and_update_collection: the first pass inserts all the
+entities, and the second pass ingests the same report again, as a periodic
+ingestion would do for the jobs which did not change.
+
+Each pass runs in a fresh subprocess, and reports:
+- the wall time spent in each stage of the ingestion (see IngestStats)
+- the peak RSS of the process
+- the number of MongoDB commands sent, by command name
+
+The database used is dropped before each size, so it should be dedicated to
+the benchmark. The results can be written as JSON, in order to compare branches.
+
+Example (from the root of the repository, with a local mongod):
+    export CLOCKWORK_CONFIG=test_config.toml
+    python3 scripts/benchmark_ingest.py --job_sizes 10000 100000 --nb_nodes 2000 \\
+        --connection_string mongodb://localhost:27017 --output_file /tmp/ingest.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from pymongo import MongoClient, monitoring
+
+# Number of distinct users among which the owners of the synthetic jobs are drawn
+NB_USERS = 500
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    Count the MongoDB commands sent, and their cumulated duration, by command name.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.durations = {}
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._add(event)
+
+    def failed(self, event):
+        self._add(event)
+
+    def _add(self, event):
+        self.counts[event.command_name] = self.counts.get(event.command_name, 0) + 1
+        self.durations[event.command_name] = (
+            self.durations.get(event.command_name, 0) + event.duration_micros / 1e6
+        )
+
+
+def get_database(connection_string, database_name, event_listeners=()):
+    return MongoClient(connection_string, event_listeners=list(event_listeners))[
+        database_name
+    ]
+
+
+def prepare_database(connection_string, database_name, sorting_indexes="default"):
+    """
+    Drop the benchmark database, then create the indexes and the users
+    used by the ingestion.
+
+    Parameters:
+        sorting_indexes     Sortings of the jobs which are indexed: "default" (as
+                            the ingestion does), "all" or "none"
+    """
+    from slurm_state.helpers.jobs_indexes_helper import (
+        create_jobs_identifying_index,
+        create_jobs_sorting_indexes,
+        get_all_jobs_sortings,
+    )
+
+    client = MongoClient(connection_string)
+    client.drop_database(database_name)
+    db = client[database_name]
+    create_jobs_identifying_index(db["jobs"])
+    if sorting_indexes == "default":
+        create_jobs_sorting_indexes(db["jobs"])
+    elif sorting_indexes == "all":
+        create_jobs_sorting_indexes(db["jobs"], get_all_jobs_sortings())
+    db["nodes"].create_index(
+        [("slurm.name", 1), ("slurm.cluster_name", 1)],
+        name="name_and_cluster_name",
+    )
+    db["users"].insert_many(
+        [
+            {
+                "mila_email_username": f"user{i:04d}@mila.quebec",
+                "mila_cluster_username": f"user{i:04d}",
+                "cc_account_username": f"user{i:04d}",
+            }
+            for i in range(NB_USERS)
+        ]
+    )
+    client.close()
+
+
+def measure(entity, report_path, cluster_name, connection_string, database_name):
+    """
+    Ingest a report and return the measures of this run.
+    This is called in the subprocess.
+    """
+    from slurm_state.mongo_update import main_read_report_and_update_collection
+
+    command_counter = CommandCounter()
+    db = get_database(
+        connection_string, database_name, event_listeners=[command_counter]
+    )
+
+    rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timestamp_start = time.perf_counter()
+    stats = main_read_report_and_update_collection(
+        entity,
+        db[entity],
+        db["users"] if entity == "jobs" else None,
+        cluster_name,
+        report_path,
+        from_file=True,
+    )
+    duration = time.perf_counter() - timestamp_start
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "entity": entity,
+        "nb_entities": stats.counters[entity],
+        "report_size_mb": os.path.getsize(report_path) / 2**20,
+        "duration_s": duration,
+        "entities_per_s": stats.counters[entity] / duration if duration else None,
+        "baseline_rss_mb": rss_before_kb / 1024,
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "mongo_command_counts": command_counter.counts,
+        "mongo_command_durations_s": command_counter.durations,
+        **stats.to_dict(),
+    }
+
+
+def get_git_revision():
+    """
+    Return the current commit of the repository, or None if unavailable.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--job_sizes", type=int, nargs="*", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--nb_nodes", type=int, nargs="*", default=[5000])
+    parser.add_argument("--work_dir", default="/tmp/clockwork_benchmark")
+    parser.add_argument("--cluster_name", default="mila")
+    parser.add_argument("--slurm_version", default="22.05.9")
+    parser.add_argument(
+        "--connection_string",
+        default=os.environ.get(
+            "MONGODB_CONNECTION_STRING", "mongodb://localhost:27017"
+        ),
+    )
+    parser.add_argument(
+        "--database_name",
+        default="clockwork_benchmark",
+        help="Database used for the benchmark. It is dropped before each size.",
+    )
+    parser.add_argument("--nb_passes", type=int, default=2)
+    parser.add_argument(
+        "--sorting_indexes",
+        choices=["default", "all", "none"],
+        default="default",
+        help="Sortings of the jobs which are indexed: the default sorting of the web interface "
+        "(as the ingestion does), all the sortings, or none. Compare the runs to measure the "
+        "cost of the indexes on the ingestion.",
+    )
+    parser.add_argument(
+        "--output_file", help="Optional path to a JSON file storing the results."
+    )
+    # Internal argument used to run a single measure in a subprocess
+    parser.add_argument("--worker", nargs=2, metavar=("ENTITY", "REPORT_PATH"))
+    args = parser.parse_args(argv[1:])
+
+    if args.worker:
+        entity, report_path = args.worker
+        print(
+            json.dumps(
+                measure(
+                    entity,
+                    report_path,
+                    args.cluster_name,
+                    args.connection_string,
+                    args.database_name,
+                )
+            )
+        )
+        return
+
+    # Import here so that the subprocesses do not need it
+    from synthetic_slurm_reports import write_synthetic_report
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    L_runs = [("jobs", size) for size in args.job_sizes] + [
+        ("nodes", size) for size in args.nb_nodes
+    ]
+    L_results = []
+    for (entity, size) in L_runs:
+        report_path = os.path.join(
+            args.work_dir, f"{'sacct' if entity == 'jobs' else 'sinfo'}_{size}"
+        )
+        if not os.path.exists(report_path):
+            print(
+                f"Generating a synthetic report with {size} {entity} at {report_path}."
+            )
+            write_synthetic_report(
+                report_path,
+                entity,
+                size,
+                cluster_name=args.cluster_name,
+                slurm_version=args.slurm_version,
+            )
+
+        prepare_database(
+            args.connection_string,
+            args.database_name,
+            sorting_indexes=args.sorting_indexes,
+        )
+        for pass_index in range(args.nb_passes):
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "--cluster_name",
+                    args.cluster_name,
+                    "--connection_string",
+                    args.connection_string,
+                    "--database_name",
+                    args.database_name,
+                    "--worker",
+                    entity,
+                    report_path,
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result["pass"] = pass_index
+            L_results.append(result)
+            print(
+                f"{size:>9} {entity:<5} | pass {pass_index} | "
+                f"{result['duration_s']:7.2f} s | "
+                f"{result['entities_per_s']:9.0f} {entity}/s | "
+                f"peak RSS {result['peak_rss_mb']:8.1f} MB | "
+                + ", ".join(
+                    f"{stage} {duration:.2f}s"
+                    for (stage, duration) in result["stage_durations"].items()
+                )
+                + " | "
+                + ", ".join(
+                    f"{name} x{count}"
+                    for (name, count) in result["mongo_command_counts"].items()
+                )
+            )
+
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            json.dump(
+                {
+                    "git_revision": get_git_revision(),
+                    "sorting_indexes": args.sorting_indexes,
+                    "timestamp": time.time(),
+                    "results": L_results,
+                },
+                f,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,131 @@
+"""
+Compare the peak memory and the throughput of the two parsing modes of the
+Slurm reports:
+- "json_load": the whole report is loaded with json.load before the entities are parsed
+- "streaming": the entities are read one by one from the report
+
+Each measure is done in a fresh subprocess, so that the peak RSS of a run
+is not affected by the previous ones.
+
+Example (from the root of the repository):
+    export CLOCKWORK_CONFIG=test_config.toml
+    python3 scripts/benchmark_report_parsing.py --sizes 100000 1000000 --work_dir /tmp/cw_bench
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+MODES = ["json_load", "streaming"]
+
+
+def measure(mode, report_path, cluster_name, slurm_version):
+    """
+    Parse the report and return the measures of this run.
+    This is called in the subprocess.
+    """
+    from slurm_state.mongo_update import fetch_slurm_report
+    from slurm_state.parsers.job_parser import JobParser
+
+    parser = JobParser(
+        cluster_name, slurm_version=slurm_version, streaming=(mode == "streaming")
+    )
+
+    rss_before_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timestamp_start = time.perf_counter()
+    nb_jobs = 0
+    for _ in fetch_slurm_report(parser, report_path):
+        nb_jobs += 1
+    duration = time.perf_counter() - timestamp_start
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "mode": mode,
+        "nb_jobs": nb_jobs,
+        "report_size_mb": os.path.getsize(report_path) / 2**20,
+        "duration_s": duration,
+        "jobs_per_s": nb_jobs / duration if duration else None,
+        "baseline_rss_mb": rss_before_kb / 1024,
+        "peak_rss_mb": peak_rss_kb / 1024,
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--modes", choices=MODES, nargs="+", default=MODES)
+    parser.add_argument("--work_dir", default="/tmp/clockwork_benchmark")
+    parser.add_argument("--cluster_name", default="mila")
+    parser.add_argument("--slurm_version", default="22.05.9")
+    parser.add_argument(
+        "--output_file", help="Optional path to a JSON file storing the results."
+    )
+    # Internal argument used to run a single measure in a subprocess
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "REPORT_PATH"))
+    args = parser.parse_args(argv[1:])
+
+    if args.worker:
+        mode, report_path = args.worker
+        print(
+            json.dumps(
+                measure(mode, report_path, args.cluster_name, args.slurm_version)
+            )
+        )
+        return
+
+    # Import here so that the subprocesses do not need it
+    from synthetic_slurm_reports import write_synthetic_report
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    L_results = []
+    for size in args.sizes:
+        report_path = os.path.join(args.work_dir, f"sacct_{size}")
+        if not os.path.exists(report_path):
+            print(f"Generating a synthetic report with {size} jobs at {report_path}.")
+            write_synthetic_report(
+                report_path,
+                "jobs",
+                size,
+                cluster_name=args.cluster_name,
+                slurm_version=args.slurm_version,
+            )
+
+        for mode in args.modes:
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "--cluster_name",
+                    args.cluster_name,
+                    "--slurm_version",
+                    args.slurm_version,
+                    "--worker",
+                    mode,
+                    report_path,
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            L_results.append(result)
+            print(
+                f"{size:>9} jobs | {mode:<9} | "
+                f"{result['report_size_mb']:8.1f} MB report | "
+                f"{result['duration_s']:7.2f} s | "
+                f"{result['jobs_per_s']:9.0f} jobs/s | "
+                f"peak RSS {result['peak_rss_mb']:8.1f} MB "
+                f"(baseline {result['baseline_rss_mb']:.1f} MB)"
+            )
+
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            json.dump(L_results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,99 @@
+"""
+Compare the throughput of the two translations of the Slurm entities:
+- "reference": the translators of parser_helper are applied to each field
+- "compiled": the entities are translated by a compiled translation plan
+
+The synthetic jobs and nodes are generated in memory beforehand, so that
+only the translation is measured.
+
+Example (from the root of the repository):
+    python3 scripts/benchmark_translation_plans.py --nb_entities 100000
+"""
+
+import argparse
+import copy
+import json
+import random
+import sys
+import time
+
+MODES = ["reference", "compiled"]
+
+
+def measure(translate, L_slurm_entities, nb_repeats):
+    """
+    Return the best number of entities translated per second over nb_repeats runs.
+    """
+    best_duration = None
+    for _ in range(nb_repeats):
+        # The reference translators modify their input
+        L_entities = copy.deepcopy(L_slurm_entities)
+        timestamp_start = time.perf_counter()
+        for slurm_entity in L_entities:
+            translate(slurm_entity)
+        duration = time.perf_counter() - timestamp_start
+        if best_duration is None or duration < best_duration:
+            best_duration = duration
+    return len(L_slurm_entities) / best_duration
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nb_entities", type=int, default=100000)
+    parser.add_argument("--nb_repeats", type=int, default=3)
+    parser.add_argument(
+        "--output_file", help="Optional path to a JSON file storing the results."
+    )
+    args = parser.parse_args(argv[1:])
+
+    from synthetic_slurm_reports import get_synthetic_job, get_synthetic_node
+    from slurm_state.helpers.translation_plan_helper import (
+        compile_translation_plan,
+        get_reference_translator,
+    )
+    from slurm_state.parsers.job_parser import JOB_FIELD_SPECS_V22_AND_23
+    from slurm_state.parsers.node_parser import NODE_FIELD_SPECS_V22
+
+    rng = random.Random(0)
+    now = 1700000000
+    D_entities = {
+        "jobs": (
+            JOB_FIELD_SPECS_V22_AND_23,
+            [
+                get_synthetic_job(rng, i, "mila", now)
+                for i in range(1, args.nb_entities + 1)
+            ],
+        ),
+        "nodes": (
+            NODE_FIELD_SPECS_V22,
+            [get_synthetic_node(rng, i, now) for i in range(args.nb_entities)],
+        ),
+    }
+
+    L_results = []
+    for (entity, (field_specs, L_slurm_entities)) in D_entities.items():
+        D_translators = {
+            "reference": get_reference_translator(field_specs),
+            "compiled": compile_translation_plan(field_specs),
+        }
+        for mode in MODES:
+            entities_per_s = measure(
+                D_translators[mode], L_slurm_entities, args.nb_repeats
+            )
+            L_results.append(
+                {
+                    "entity": entity,
+                    "mode": mode,
+                    "nb_entities": len(L_slurm_entities),
+                    "entities_per_s": entities_per_s,
+                }
+            )
+            print(f"{entity:<5} | {mode:<9} | {entities_per_s:12.0f} {entity}/s")
+
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            json.dump(L_results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,181 @@
+"""
+Benchmark the latency of the database accesses of the web server, when a new
+MongoClient is created for each request (as clockwork_web/db.py used to do)
+and when a single pooled MongoClient is shared by all the requests of the
+process (as it does now).
+
+Each simulated request runs a cheap query, similar to the one of
+/api/v1/clusters/nodes/one: a find_one on the "nodes" collection through the
+"name_and_cluster_name" index. The requests are sent by several threads, as
+the threads of a gunicorn worker would do.
+
+For each mode, the latency percentiles of the requests and the throughput
+are reported. The results can be written as JSON, in order to compare setups.
+
+Example (from the root of the repository, with a local mongod):
+    python3 scripts/benchmark_web_db_client.py --nb_requests 2000 --nb_threads 8 \\
+        --connection_string mongodb://localhost:27017 --output_file /tmp/web_db.json
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import statistics
+import time
+
+from pymongo import MongoClient
+
+# Name of the node retrieved by the simulated requests
+NODE_NAME = "benchmark-node"
+CLUSTER_NAME = "mila"
+
+
+def prepare_database(connection_string, database_name):
+    """
+    Store the node retrieved by the simulated requests.
+    """
+    client = MongoClient(connection_string)
+    nodes_collection = client[database_name]["nodes"]
+    nodes_collection.create_index(
+        [("slurm.name", 1), ("slurm.cluster_name", 1)],
+        name="name_and_cluster_name",
+    )
+    nodes_collection.replace_one(
+        {"slurm.name": NODE_NAME, "slurm.cluster_name": CLUSTER_NAME},
+        {"slurm": {"name": NODE_NAME, "cluster_name": CLUSTER_NAME}, "cw": {}},
+        upsert=True,
+    )
+    client.close()
+
+
+def find_node(db):
+    return db["nodes"].find_one(
+        {"slurm.name": NODE_NAME, "slurm.cluster_name": CLUSTER_NAME}, {"_id": 0}
+    )
+
+
+def request_with_new_client(connection_string, database_name):
+    """
+    Simulate a request creating its own client, closed at the end of the request.
+    """
+    client = MongoClient(connection_string)
+    try:
+        find_node(client[database_name])
+    finally:
+        client.close()
+
+
+def run_mode(mode, connection_string, database_name, nb_requests, nb_threads):
+    """
+    Send the simulated requests of a mode ("per_request" or "pooled").
+
+    Returns:
+        A dictionary presenting the latencies (in milliseconds) and the throughput
+    """
+    if mode == "pooled":
+        client = MongoClient(connection_string, maxPoolSize=nb_threads)
+        db = client[database_name]
+        # The client is created when the worker starts, not by the requests
+        find_node(db)
+        request = lambda: find_node(db)
+    else:
+        client = None
+        request = lambda: request_with_new_client(connection_string, database_name)
+
+    def timed_request(_):
+        start = time.perf_counter()
+        request()
+        return 1000 * (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        L_latencies_ms = sorted(executor.map(timed_request, range(nb_requests)))
+    duration = time.perf_counter() - start
+
+    if client is not None:
+        client.close()
+
+    return {
+        "mode": mode,
+        "nb_requests": nb_requests,
+        "nb_threads": nb_threads,
+        "latency_ms_mean": statistics.mean(L_latencies_ms),
+        "latency_ms_p50": L_latencies_ms[len(L_latencies_ms) // 2],
+        "latency_ms_p95": L_latencies_ms[int(0.95 * (len(L_latencies_ms) - 1))],
+        "latency_ms_p99": L_latencies_ms[int(0.99 * (len(L_latencies_ms) - 1))],
+        "latency_ms_max": L_latencies_ms[-1],
+        "requests_per_second": nb_requests / duration,
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Compare a MongoClient per request with a shared pooled MongoClient.",
+    )
+    parser.add_argument(
+        "--connection_string",
+        default=os.environ.get(
+            "MONGODB_CONNECTION_STRING", "mongodb://localhost:27017"
+        ),
+        help="Connection string of the MongoDB server.",
+    )
+    parser.add_argument(
+        "--database_name",
+        default="clockwork_benchmark",
+        help="Database in which the benchmark node is stored.",
+    )
+    parser.add_argument(
+        "--nb_requests",
+        type=int,
+        default=1000,
+        help="Number of simulated requests for each mode.",
+    )
+    parser.add_argument(
+        "--nb_threads",
+        type=int,
+        default=8,
+        help="Number of threads sending the requests.",
+    )
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["per_request", "pooled"],
+        default=["per_request", "pooled"],
+        help="Modes to benchmark.",
+    )
+    parser.add_argument(
+        "--output_file", help="File in which the results are written as JSON."
+    )
+    args = parser.parse_args(argv[1:])
+
+    prepare_database(args.connection_string, args.database_name)
+
+    L_results = []
+    for mode in args.modes:
+        D_result = run_mode(
+            mode,
+            args.connection_string,
+            args.database_name,
+            args.nb_requests,
+            args.nb_threads,
+        )
+        print(
+            f"{mode}: mean {D_result['latency_ms_mean']:.2f} ms, "
+            f"p50 {D_result['latency_ms_p50']:.2f} ms, "
+            f"p95 {D_result['latency_ms_p95']:.2f} ms, "
+            f"p99 {D_result['latency_ms_p99']:.2f} ms, "
+            f"{D_result['requests_per_second']:.0f} requests/s."
+        )
+        L_results.append(D_result)
+
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            json.dump(L_results, f, indent=2)
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(sys.argv)
@@ -316,6 +316,8 @@ def client_side_user_updates(LD_users_DB, LD_users_LDAP):
                 # No matter what we said in the database, if the LDAP
                 # says that it's disabled, then we propagate that change.
                 # We wouldn't do the same thing with "enabled" in the LDAP, though.
+                # The web server keeps accepting the REST calls of the user for at
+                # most rest.auth_cache_ttl seconds (see api_key_cache_helper.py).
                 entry["status"] = "disabled"
             assert "cc_account_username" in entry  # sanity check
             assert "clockwork_api_key" in entry  # sanity check
@@ -17,6 +17,11 @@ In that regards, this ends up with fake_data that's slightly
 different when we run this script in the context of "dev.sh"
 than when pytest runs with "test.sh" and loads the fake data
 without messing around with the job status.
+
+Jobs and nodes dump files written by read_report_commit_to_db.py (through
+--cw_jobs_file and --cw_nodes_file, in any format and compression) can also
+be loaded with --jobs_dump_files and --nodes_dump_files. They are read lazily
+and inserted by batches, so that large datasets can be loaded.
 """
 
 import argparse
@@ -28,8 +33,13 @@ import os
 from clockwork_web.config import register_config
 from slurm_state.mongo_client import get_mongo_client
 from slurm_state.config import get_config
+from slurm_state.helpers.dump_file_helper import iter_dump_file
+from slurm_state.mongo_update import iter_batches
 from test_common.fake_data import mutate_some_job_status, populate_fake_data
 
+# Number of elements of a dump file inserted at once
+DUMP_FILE_BATCH_SIZE = 1000
+
 
 def store_data_in_db(data_json_file=None):
     # Open the database and insert the contents.
@@ -39,6 +49,19 @@ def store_data_in_db(data_json_file=None):
     )
 
 
+def store_dump_file_in_db(collection_name, dump_file):
+    """
+    Insert the jobs or nodes of a dump file into a collection, by batches.
+    """
+    client = get_mongo_client()
+    collection = client[get_config("mongo.database_name")][collection_name]
+    nb_elements = 0
+    for L_elements in iter_batches(iter_dump_file(dump_file), DUMP_FILE_BATCH_SIZE):
+        collection.insert_many(L_elements, ordered=False)
+        nb_elements += len(L_elements)
+    print(f"Inserted {nb_elements} {collection_name} from {dump_file}.")
+
+
 def modify_timestamps(data):
     """
     This function updates the timestamps in order to simulate jobs which have
@@ -76,6 +99,18 @@ def main(argv):
         default=False,
         help="Modify the timestamps of the jobs in order to simulate more recent jobs if this argument is provided.",
     )
+    parser.add_argument(
+        "--jobs_dump_files",
+        nargs="*",
+        default=[],
+        help="Jobs dump files to store in the database, in addition to the fake data.",
+    )
+    parser.add_argument(
+        "--nodes_dump_files",
+        nargs="*",
+        default=[],
+        help="Nodes dump files to store in the database, in addition to the fake data.",
+    )
     args = parser.parse_args(argv[1:])
 
     # Register the elements to access the database
@@ -107,6 +142,14 @@ def main(argv):
         # Store the generated fake data in the database
         store_data_in_db()
 
+    # Store the jobs and nodes of the dump files, if any
+    for (collection_name, L_dump_files) in [
+        ("jobs", args.jobs_dump_files),
+        ("nodes", args.nodes_dump_files),
+    ]:
+        for dump_file in L_dump_files:
+            store_dump_file_in_db(collection_name, dump_file)
+
 
 if __name__ == "__main__":
     main(sys.argv)
@@ -0,0 +1,254 @@
+"""
+Generate synthetic sacct and sinfo JSON reports of arbitrary size.
+
+These reports follow the format of the files found in slurm_state_test/files,
+and are used to benchmark the parsing and ingestion of large reports.
+The entities are written one by one, so that generating a report with
+millions of jobs does not require holding it in memory.
+
+Example:
+    python3 scripts/synthetic_slurm_reports.py --entity jobs --nb_entities 100000 --output_file /tmp/sacct_100k
+"""
+
+import argparse
+import json
+import random
+import sys
+
+JOB_STATES = ["RUNNING", "PENDING", "COMPLETED", "FAILED", "CANCELLED", "TIMEOUT"]
+NODE_STATES = ["idle", "mixed", "allocated", "down", "drained"]
+GPU_TYPES = ["a100", "v100", "rtx8000", "t4"]
+
+
+def _report_header(entity, slurm_version):
+    """
+    Return the beginning of a report, up to the opening of the entities array.
+    """
+    major, minor, micro = slurm_version.split(".")
+    meta = {
+        "plugin": {"type": "openapi/dbv0.0.37", "name": "Slurm OpenAPI DB v0.0.37"},
+        "Slurm": {
+            "version": {"major": int(major), "micro": int(micro), "minor": int(minor)},
+            "release": slurm_version,
+        },
+    }
+    return f'{{\n  "meta": {json.dumps(meta)},\n  "errors": [],\n  "{entity}": [\n'
+
+
+def get_synthetic_job(rng, job_id, cluster_name, now, nb_users=500):
+    """
+    Return a job as presented in a sacct JSON report.
+
+    Parameters:
+        rng             A random.Random instance
+        job_id          The ID of the job
+        cluster_name    The name of the cluster on which the job runs
+        now             Timestamp used as a reference for the times of the job
+        nb_users        Number of distinct users among which the job owner is drawn
+    """
+    username = f"user{rng.randrange(nb_users):04d}"
+    account = f"def-prof{rng.randrange(50):02d}-rrg"
+    state = rng.choices(JOB_STATES, weights=[40, 25, 25, 5, 4, 1])[0]
+    submission = now - rng.randrange(7 * 24 * 3600)
+    start = 0 if state == "PENDING" else submission + rng.randrange(3600)
+    end = 0 if state in ["PENDING", "RUNNING"] else start + rng.randrange(48 * 3600)
+    nb_cpus = rng.choice([1, 2, 4, 8, 16])
+    nb_gpus = rng.choice([0, 0, 1, 1, 2, 4])
+    tres = [
+        {"type": "cpu", "name": None, "id": 1, "count": nb_cpus},
+        {"type": "mem", "name": None, "id": 2, "count": 4096 * nb_cpus},
+        {"type": "node", "name": None, "id": 4, "count": 1},
+        {"type": "billing", "name": None, "id": 5, "count": nb_cpus},
+    ]
+    if nb_gpus:
+        tres.append({"type": "gres", "name": "gpu", "id": 1001, "count": nb_gpus})
+    is_array = rng.random() < 0.2
+
+    return {
+        "account": account,
+        "comment": {"administrator": None, "job": None, "system": None},
+        "allocation_nodes": 1,
+        "array": {
+            "job_id": job_id - job_id % 10 if is_array else 0,
+            "limits": {"max": {"running": {"tasks": 0}}},
+            "task": None,
+            "task_id": job_id % 10 if is_array else None,
+        },
+        "association": {
+            "account": account,
+            "cluster": cluster_name,
+            "partition": None,
+            "user": username,
+        },
+        "cluster": cluster_name,
+        "constraints": "",
+        "derived_exit_code": {"status": "SUCCESS", "return_code": 0},
+        "time": {
+            "elapsed": max(0, (end or now) - start) if start else 0,
+            "eligible": submission,
+            "end": end,
+            "start": start,
+            "submission": submission,
+            "suspended": 0,
+            "system": {"seconds": 0, "microseconds": 0},
+            "limit": rng.choice([60, 180, 720, 1440, 2880]),
+            "total": {"seconds": 0, "microseconds": 0},
+            "user": {"seconds": 0, "microseconds": 0},
+        },
+        "exit_code": {
+            "status": "FAILED" if state == "FAILED" else "SUCCESS",
+            "return_code": 1 if state == "FAILED" else 0,
+        },
+        "flags": ["CLEAR_SCHEDULING"],
+        "group": username,
+        "het": {"job_id": 0, "job_offset": None},
+        "job_id": job_id,
+        "name": f"somejobname_{rng.randrange(10**6)}",
+        "mcs": {"label": ""},
+        "nodes": "None assigned"
+        if state == "PENDING"
+        else f"cn-{rng.randrange(2000):04d}",
+        "partition": rng.choice(["long", "main", "unkillable", "short-unkillable"]),
+        "priority": rng.randrange(10**6),
+        "qos": "normal",
+        "required": {"CPUs": nb_cpus, "memory": 4096 * nb_cpus},
+        "kill_request_user": None,
+        "reservation": {"id": 0, "name": 0},
+        "state": {"current": state, "reason": "None"},
+        "steps": [],
+        "tres": {"allocated": [] if state == "PENDING" else tres, "requested": tres},
+        "user": username,
+        "wckey": {"wckey": "", "flags": []},
+        "working_directory": f"/home/{username}/{rng.randrange(1000)}",
+    }
+
+
+def get_synthetic_node(rng, index, now):
+    """
+    Return a node as presented in a sinfo JSON report.
+
+    Parameters:
+        rng     A random.Random instance
+        index   Index of the node, used to build its name
+        now     Timestamp used as a reference for the times of the node
+    """
+    name = f"cn-{index:04d}"
+    nb_cpus = rng.choice([32, 48, 64, 80])
+    memory = rng.choice([128000, 256000, 386618, 512000])
+    used_cpus = rng.randrange(nb_cpus + 1)
+    if rng.random() < 0.6:
+        gpu_type = rng.choice(GPU_TYPES)
+        nb_gpus = rng.choice([4, 8])
+        used_gpus = rng.randrange(nb_gpus + 1)
+        gres = f"gpu:{gpu_type}:{nb_gpus}(S:0-1)"
+        gres_used = f"gpu:{gpu_type}:{used_gpus}(IDX:0-{max(used_gpus - 1, 0)})"
+        tres_gpu = f",gres/gpu={nb_gpus}"
+        tres_used_gpu = f",gres/gpu={used_gpus}"
+        features = f"x86_64,{gpu_type},{rng.choice([16, 32, 48, 80])}gb"
+    else:
+        gres, gres_used, tres_gpu, tres_used_gpu = "", "gpu:0", "", ""
+        features = "x86_64"
+
+    return {
+        "architecture": "x86_64",
+        "boards": 1,
+        "boot_time": now - rng.randrange(30 * 24 * 3600),
+        "comment": "",
+        "cores": nb_cpus // 2,
+        "cpu_load": rng.randrange(nb_cpus * 100),
+        "free_memory": rng.randrange(memory),
+        "cpus": nb_cpus,
+        "last_busy": now - rng.randrange(3600),
+        "features": features,
+        "active_features": features,
+        "gres": gres,
+        "gres_drained": "N/A",
+        "gres_used": gres_used,
+        "name": name,
+        "address": name,
+        "hostname": name,
+        "state": rng.choices(NODE_STATES, weights=[20, 50, 20, 5, 5])[0],
+        "state_flags": [],
+        "operating_system": "Linux",
+        "owner": None,
+        "partitions": ["long", "main"],
+        "port": 6818,
+        "real_memory": memory,
+        "reason": "",
+        "reason_changed_at": 0,
+        "reason_set_by_user": None,
+        "slurmd_start_time": now - rng.randrange(30 * 24 * 3600),
+        "sockets": 2,
+        "threads": 1,
+        "temporary_disk": 0,
+        "weight": 1,
+        "tres": f"cpu={nb_cpus},mem={memory}M,billing={nb_cpus}{tres_gpu}",
+        "slurmd_version": "22.05.9",
+        "alloc_memory": rng.randrange(memory),
+        "alloc_cpus": used_cpus,
+        "idle_cpus": nb_cpus - used_cpus,
+        "tres_used": f"cpu={used_cpus},mem={rng.randrange(memory)}M{tres_used_gpu}",
+        "tres_weighted": float(nb_cpus),
+    }
+
+
+def write_synthetic_report(
+    output_file,
+    entity,
+    nb_entities,
+    cluster_name="mila",
+    slurm_version="22.05.9",
+    now=1700000000,
+    seed=0,
+    first_job_id=1,
+):
+    """
+    Write a synthetic sacct (if entity is "jobs") or sinfo (if entity is "nodes")
+    report containing nb_entities entities.
+
+    Returns:
+        The number of bytes written
+    """
+    assert entity in ["jobs", "nodes"]
+    rng = random.Random(seed)
+    nb_bytes = 0
+    with open(output_file, "w") as f:
+        nb_bytes += f.write(_report_header(entity, slurm_version))
+        for i in range(nb_entities):
+            if entity == "jobs":
+                e = get_synthetic_job(rng, first_job_id + i, cluster_name, now)
+            else:
+                e = get_synthetic_node(rng, i, now)
+            separator = ",\n" if i < nb_entities - 1 else "\n"
+            nb_bytes += f.write(json.dumps(e, indent=2) + separator)
+        nb_bytes += f.write("  ]\n}\n")
+    return nb_bytes
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic sacct or sinfo JSON report."
+    )
+    parser.add_argument("--entity", choices=["jobs", "nodes"], default="jobs")
+    parser.add_argument("--nb_entities", type=int, required=True)
+    parser.add_argument("--output_file", required=True)
+    parser.add_argument("--cluster_name", default="mila")
+    parser.add_argument("--slurm_version", default="22.05.9")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv[1:])
+
+    nb_bytes = write_synthetic_report(
+        args.output_file,
+        args.entity,
+        args.nb_entities,
+        cluster_name=args.cluster_name,
+        slurm_version=args.slurm_version,
+        seed=args.seed,
+    )
+    print(
+        f"Wrote {args.nb_entities} {args.entity} ({nb_bytes} bytes) to {args.output_file}."
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv)
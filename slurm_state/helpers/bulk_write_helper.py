@@ -0,0 +1,238 @@
+"""
+Helper class to send large lists of database operations to MongoDB.
+"""
+
+import concurrent.futures
+import logging
+import statistics
+import time
+
+from pymongo import InsertOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+# Default number of operations sent in a single bulk_write
+DEFAULT_CHUNK_SIZE = 500
+# Default number of chunks sent concurrently
+DEFAULT_MAX_WORKERS = 4
+# Default number of retries of a chunk presenting transient errors
+DEFAULT_MAX_RETRIES = 3
+# Default delay (in seconds) before the first retry, doubled at each retry
+DEFAULT_BACKOFF = 0.5
+
+# Error codes of the write errors which are worth retrying, as they are
+# related to the state of the replica set rather than to the operation itself
+RETRYABLE_ERROR_CODES = {
+    6,  # HostUnreachable
+    7,  # HostNotFound
+    89,  # NetworkTimeout
+    91,  # ShutdownInProgress
+    189,  # PrimarySteppedDown
+    262,  # ExceededTimeLimit
+    9001,  # SocketException
+    10107,  # NotWritablePrimary
+    11600,  # InterruptedAtShutdown
+    11602,  # InterruptedDueToReplStateChange
+    13435,  # NotPrimaryNoSecondaryOk
+    13436,  # NotPrimaryOrSecondary
+}
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+# Counters of the bulk_write results which are aggregated
+RESULT_COUNTERS = ["nInserted", "nMatched", "nModified", "nUpserted", "nRemoved"]
+
+
+class BulkWriter:
+    """
+    Send database operations to a collection by chunks, concurrently and
+    with ordered=False, so that one slow or failed operation does not stall
+    the others.
+
+    The chunks presenting transient errors (AutoReconnect, or BulkWriteError
+    with retryable error codes) are retried with an exponential backoff. Only
+    the failed operations of a chunk are retried.
+
+    The duplicate key errors are write conflicts: another writer inserted the
+    same document meanwhile (for instance a job, whose identifying index is
+    unique). These operations did not apply, and are not retried: they are
+    counted in nb_conflicts, and the caller compares them again to the
+    database if needed (see count_job_write_conflicts in mongo_update.py).
+
+    The counts of the results and the latency of each chunk are aggregated
+    over all the calls to write, and can be displayed through get_summary.
+    """
+
+    def __init__(
+        self,
+        collection,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        max_workers=DEFAULT_MAX_WORKERS,
+        max_retries=DEFAULT_MAX_RETRIES,
+        backoff=DEFAULT_BACKOFF,
+    ):
+        """
+        Parameters:
+            collection      Collection in which the operations are written
+            chunk_size      Maximum number of operations per bulk_write
+            max_workers     Number of chunks sent concurrently
+            max_retries     Maximum number of retries of a chunk presenting transient errors
+            backoff         Delay (in seconds) before the first retry, doubled at each retry
+        """
+        assert chunk_size > 0
+        self.collection = collection
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        # Aggregated counts of the bulk_write results
+        self.counts = {counter: 0 for counter in RESULT_COUNTERS}
+        # Latencies (in seconds) of the chunks
+        self.chunk_latencies = []
+        # Number of retries, all chunks combined
+        self.nb_retries = 0
+        # Number of operations sent
+        self.nb_operations = 0
+        # Number of operations which did not apply because of a duplicate key
+        self.nb_conflicts = 0
+
+    def write(self, operations):
+        """
+        Write the operations, and wait for all of them to be done.
+
+        Parameters:
+            operations  List of pymongo operations (InsertOne, UpdateOne, ...)
+
+        Raises:
+            The first error of the chunks which could not be written, once all
+            the other chunks have been written.
+        """
+        L_chunks = [
+            operations[i : i + self.chunk_size]
+            for i in range(0, len(operations), self.chunk_size)
+        ]
+        if not L_chunks:
+            return
+        self.nb_operations += len(operations)
+
+        if len(L_chunks) == 1 or self.max_workers <= 1:
+            L_outcomes = [self._write_chunk_safely(chunk) for chunk in L_chunks]
+        else:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(L_chunks))
+            ) as executor:
+                L_outcomes = list(executor.map(self._write_chunk_safely, L_chunks))
+
+        # Aggregate the results in the main thread
+        first_error = None
+        for (D_counts, latency, nb_retries, nb_conflicts, error) in L_outcomes:
+            for counter in RESULT_COUNTERS:
+                self.counts[counter] += D_counts[counter]
+            self.chunk_latencies.append(latency)
+            self.nb_retries += nb_retries
+            self.nb_conflicts += nb_conflicts
+            if error is not None and first_error is None:
+                first_error = error
+
+        if first_error is not None:
+            raise first_error
+
+    def _write_chunk_safely(self, operations):
+        """
+        Write a chunk of operations, retrying the transient errors.
+
+        Returns:
+            A 5-tuple containing the counts of the results, the latency of the chunk,
+            its number of retries, its number of write conflicts and the error which
+            prevented it to be written (or None)
+        """
+        D_counts = {counter: 0 for counter in RESULT_COUNTERS}
+        timestamp_start = time.perf_counter()
+        nb_retries = 0
+        nb_conflicts = 0
+        error = None
+
+        while True:
+            try:
+                result = self.collection.bulk_write(operations, ordered=False)
+                _add_counts(D_counts, result.bulk_api_result)
+                error = None
+                break
+            except AutoReconnect as e:
+                # The whole chunk is retried, as we do not know which
+                # operations have been applied
+                error = e
+                L_retryable_operations = operations
+            except BulkWriteError as e:
+                # The operations which did not fail have been applied
+                _add_counts(D_counts, e.details)
+                error = e
+                L_retryable_operations = []
+                is_fatal = bool(e.details.get("writeConcernErrors"))
+                for D_error in e.details.get("writeErrors", []):
+                    if D_error["code"] in RETRYABLE_ERROR_CODES:
+                        L_retryable_operations.append(operations[D_error["index"]])
+                    elif D_error["code"] == DUPLICATE_KEY_ERROR_CODE:
+                        if nb_retries and isinstance(
+                            operations[D_error["index"]], InsertOne
+                        ):
+                            # An insertion already applied during an attempt
+                            # interrupted by a transient error
+                            D_counts["nInserted"] += 1
+                        else:
+                            # A document inserted meanwhile by another writer
+                            nb_conflicts += 1
+                    else:
+                        is_fatal = True
+                if is_fatal:
+                    break
+                if not L_retryable_operations:
+                    error = None
+                    break
+
+            if nb_retries >= self.max_retries:
+                break
+            nb_retries += 1
+            delay = self.backoff * 2 ** (nb_retries - 1)
+            logging.warning(
+                f"Retrying {len(L_retryable_operations)} operations on {self.collection.name} "
+                f"in {delay} seconds after a transient error: {error}"
+            )
+            time.sleep(delay)
+            operations = L_retryable_operations
+
+        return (
+            D_counts,
+            time.perf_counter() - timestamp_start,
+            nb_retries,
+            nb_conflicts,
+            error,
+        )
+
+    def get_summary(self):
+        """
+        Return a string summarizing the chunks written and their latencies.
+        """
+        if not self.chunk_latencies:
+            return f"{self.collection.name}: no operation written."
+        L_latencies_ms = sorted(1000 * latency for latency in self.chunk_latencies)
+        return (
+            f"{self.collection.name}: {self.nb_operations} operations written in "
+            f"{len(L_latencies_ms)} chunks of at most {self.chunk_size} "
+            f"({self.max_workers} concurrent writers, {self.nb_retries} retries, "
+            f"{self.nb_conflicts} conflicts). "
+            f"Chunk latency (ms): min {L_latencies_ms[0]:.1f}, "
+            f"median {statistics.median(L_latencies_ms):.1f}, "
+            f"max {L_latencies_ms[-1]:.1f}, total {sum(L_latencies_ms):.1f}. "
+            + ", ".join(
+                f"{counter}={self.counts[counter]}" for counter in RESULT_COUNTERS
+            )
+        )
+
+
+def _add_counts(D_counts, D_result):
+    """
+    Add the counters of a bulk_write result (or of the details of a
+    BulkWriteError) to D_counts.
+    """
+    for counter in RESULT_COUNTERS:
+        D_counts[counter] += D_result.get(counter, 0)
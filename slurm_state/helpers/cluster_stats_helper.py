@@ -0,0 +1,309 @@
+"""
+Helper functions to maintain the "cluster_stats" collection, which holds
+a small summary of the jobs and nodes of each cluster, so that the web
+pages presenting the clusters do not have to read all their jobs.
+
+The summary of a cluster is refreshed by the ingestion after each commit of
+its jobs or nodes. The summary of the nodes is recomputed, as the nodes of a
+cluster are few. The summary of the jobs is maintained incrementally from the
+changes of state of the jobs written by the ingestion (see
+update_jobs_stats_from_events), and only recomputed from all the jobs of the
+cluster once in a while, to absorb any drift. It presents the following format:
+    {
+        "cluster_name": "mila",
+        "jobs": {
+            "nb_jobs": 5000,
+            "nb_jobs_by_state": {"RUNNING": 120, "COMPLETED": 4800, ...},
+            "job_dates": {"min": 1700000000.0, "max": 1700003600.0},
+            "last_update": 1700003600.0,
+            "last_full_refresh": 1700000000.0
+        },
+        "nodes": {
+            "nb_nodes": 300,
+            "nb_nodes_by_state": {"idle": 20, "mixed": 250, ...},
+            "gpu_total": 1200,
+            "gpu_used": 1100,
+            "gpu_free": 100,
+            "last_update": 1700003600.0
+        }
+    }
+where "job_dates" holds the oldest and latest "cw.last_slurm_update" of the
+jobs, or None if the cluster has no job.
+"""
+
+import time
+
+# Default number of seconds after which the summary of the jobs of a cluster
+# is recomputed from all its jobs, instead of being updated incrementally
+DEFAULT_JOBS_STATS_FULL_REFRESH_INTERVAL = 24 * 3600
+
+
+def create_cluster_stats_indexes(cluster_stats_collection, jobs_collection=None):
+    """
+    Create the index of the "cluster_stats" collection, which holds
+    one document per cluster, and the index of the jobs used to maintain
+    the summary of their cluster.
+    """
+    cluster_stats_collection.create_index(
+        [("cluster_name", 1)], name="cluster_name", unique=True
+    )
+    if jobs_collection is not None:
+        jobs_collection.create_index(
+            [("slurm.cluster_name", 1), ("cw.last_slurm_update", 1)],
+            name="cluster_name_and_last_slurm_update",
+        )
+
+
+def compute_jobs_stats(jobs_collection, cluster_name):
+    """
+    Compute the summary of the jobs of a cluster, through a single aggregation
+    run by the database: no job document is sent back.
+
+    Parameters:
+        jobs_collection     Collection of the jobs in the database
+        cluster_name        Name of the cluster
+
+    Returns:
+        A dictionary presenting the "nb_jobs", "nb_jobs_by_state" and "job_dates" of the cluster
+    """
+    LD_groups = jobs_collection.aggregate(
+        [
+            {"$match": {"slurm.cluster_name": cluster_name}},
+            {
+                "$group": {
+                    "_id": "$slurm.job_state",
+                    "count": {"$sum": 1},
+                    "min_update": {"$min": "$cw.last_slurm_update"},
+                    "max_update": {"$max": "$cw.last_slurm_update"},
+                }
+            },
+        ]
+    )
+
+    D_jobs_stats = {"nb_jobs": 0, "nb_jobs_by_state": {}, "job_dates": None}
+    L_min_updates = []
+    L_max_updates = []
+    for D_group in LD_groups:
+        D_jobs_stats["nb_jobs"] += D_group["count"]
+        D_jobs_stats["nb_jobs_by_state"][str(D_group["_id"])] = D_group["count"]
+        if D_group["min_update"] is not None:
+            L_min_updates.append(D_group["min_update"])
+            L_max_updates.append(D_group["max_update"])
+    if L_min_updates:
+        D_jobs_stats["job_dates"] = {
+            "min": min(L_min_updates),
+            "max": max(L_max_updates),
+        }
+    return D_jobs_stats
+
+
+def compute_nodes_stats(nodes_collection, cluster_name):
+    """
+    Compute the summary of the nodes of a cluster, through a single aggregation
+    run by the database: no node document is sent back.
+
+    Parameters:
+        nodes_collection    Collection of the nodes in the database
+        cluster_name        Name of the cluster
+
+    Returns:
+        A dictionary presenting the "nb_nodes", "nb_nodes_by_state" and the GPU totals of the cluster
+    """
+    LD_groups = nodes_collection.aggregate(
+        [
+            {"$match": {"slurm.cluster_name": cluster_name}},
+            {
+                "$group": {
+                    "_id": "$slurm.state",
+                    "count": {"$sum": 1},
+                    "gpu_total": {"$sum": "$cw.resources.gpu_total"},
+                    "gpu_used": {"$sum": "$cw.resources.gpu_used"},
+                }
+            },
+        ]
+    )
+
+    D_nodes_stats = {
+        "nb_nodes": 0,
+        "nb_nodes_by_state": {},
+        "gpu_total": 0,
+        "gpu_used": 0,
+    }
+    for D_group in LD_groups:
+        D_nodes_stats["nb_nodes"] += D_group["count"]
+        D_nodes_stats["nb_nodes_by_state"][str(D_group["_id"])] = D_group["count"]
+        D_nodes_stats["gpu_total"] += D_group["gpu_total"]
+        D_nodes_stats["gpu_used"] += D_group["gpu_used"]
+    D_nodes_stats["gpu_free"] = max(
+        D_nodes_stats["gpu_total"] - D_nodes_stats["gpu_used"], 0
+    )
+    return D_nodes_stats
+
+
+def update_cluster_stats(
+    cluster_stats_collection, entity, collection, cluster_name, now=None
+):
+    """
+    Refresh the summary of the jobs or the nodes of a cluster. The summary
+    of the other entity is left untouched.
+
+    Parameters:
+        cluster_stats_collection    Collection of the summaries of the clusters
+        entity                      "jobs" or "nodes"
+        collection                  Collection of the jobs or nodes in the database
+        cluster_name                Name of the cluster
+        now                         Timestamp of the refresh. Default is the current time
+
+    Returns:
+        The summary of the entity
+    """
+    assert entity in ["jobs", "nodes"]
+    if now is None:
+        now = time.time()
+
+    if entity == "jobs":
+        D_entity_stats = compute_jobs_stats(collection, cluster_name)
+    else:
+        D_entity_stats = compute_nodes_stats(collection, cluster_name)
+    D_entity_stats["last_update"] = now
+
+    cluster_stats_collection.update_one(
+        {"cluster_name": cluster_name},
+        {"$set": {entity: D_entity_stats}},
+        upsert=True,
+    )
+    return D_entity_stats
+
+
+def count_job_events(L_job_events, D_jobs_stats_delta):
+    """
+    Add the changes of state of jobs to the changes of the summary of their cluster.
+
+    Parameters:
+        L_job_events        Events of the jobs written to the database (see job_events_helper)
+        D_jobs_stats_delta  Dictionary presenting the change of "nb_jobs" and the changes of
+                            "nb_jobs_by_state", updated in place
+    """
+    D_jobs_stats_delta.setdefault("nb_jobs", 0)
+    D_nb_jobs_by_state = D_jobs_stats_delta.setdefault("nb_jobs_by_state", {})
+    for D_event in L_job_events:
+        if D_event["old_state"] is None:
+            # The job has been inserted
+            D_jobs_stats_delta["nb_jobs"] += 1
+        else:
+            old_state = str(D_event["old_state"])
+            D_nb_jobs_by_state[old_state] = D_nb_jobs_by_state.get(old_state, 0) - 1
+        new_state = str(D_event["new_state"])
+        D_nb_jobs_by_state[new_state] = D_nb_jobs_by_state.get(new_state, 0) + 1
+
+
+def get_oldest_job_update(jobs_collection, cluster_name):
+    """
+    Retrieve the oldest "cw.last_slurm_update" of the jobs of a cluster, through
+    the index "cluster_name_and_last_slurm_update", or None if the cluster has no job.
+    """
+    D_job = jobs_collection.find_one(
+        {"slurm.cluster_name": cluster_name, "cw.last_slurm_update": {"$ne": None}},
+        {"_id": 0, "cw.last_slurm_update": 1},
+        sort=[("cw.last_slurm_update", 1)],
+    )
+    return None if D_job is None else D_job["cw"]["last_slurm_update"]
+
+
+def update_jobs_stats_from_events(
+    cluster_stats_collection,
+    jobs_collection,
+    cluster_name,
+    D_jobs_stats_delta,
+    latest_job_update,
+    now=None,
+    full_refresh_interval=DEFAULT_JOBS_STATS_FULL_REFRESH_INTERVAL,
+    stats=None,
+):
+    """
+    Update the summary of the jobs of a cluster with the changes made by an ingestion,
+    without reading all the jobs of the cluster:
+        - the counts are incremented by the changes of state of the written jobs;
+        - the latest update is the maximum of the stored one and of the ingestion's one;
+        - the oldest update is read through an index.
+    The summary is recomputed from all the jobs if it does not exist yet, or
+    if it has not been recomputed for full_refresh_interval seconds.
+
+    Parameters:
+        cluster_stats_collection    Collection of the summaries of the clusters
+        jobs_collection             Collection of the jobs in the database
+        cluster_name                Name of the cluster
+        D_jobs_stats_delta          Changes of the counts of the jobs (see count_job_events)
+        latest_job_update           Latest "cw.last_slurm_update" written by the ingestion,
+                                    or None if no job has been written
+        now                         Timestamp of the refresh. Default is the current time
+        full_refresh_interval       Number of seconds after which the summary is recomputed.
+                                    Default is one day
+        stats                       IngestStats counting the queries as "mongo_round_trips". Default is None
+    """
+    if now is None:
+        now = time.time()
+
+    D_stored_stats = cluster_stats_collection.find_one(
+        {"cluster_name": cluster_name},
+        {"_id": 0, "jobs.job_dates": 1, "jobs.last_full_refresh": 1},
+    )
+    D_stored_jobs_stats = (D_stored_stats or {}).get("jobs")
+    if (
+        D_stored_jobs_stats is None
+        or now - D_stored_jobs_stats.get("last_full_refresh", 0)
+        >= full_refresh_interval
+    ):
+        D_jobs_stats = compute_jobs_stats(jobs_collection, cluster_name)
+        D_jobs_stats["last_update"] = now
+        D_jobs_stats["last_full_refresh"] = now
+        cluster_stats_collection.update_one(
+            {"cluster_name": cluster_name},
+            {"$set": {"jobs": D_jobs_stats}},
+            upsert=True,
+        )
+        if stats is not None:
+            # One read, one aggregation and one update
+            stats.count("mongo_round_trips", 3)
+        return
+
+    D_update = {"$set": {"jobs.last_update": now}}
+    D_inc = {
+        f"jobs.nb_jobs_by_state.{state}": delta
+        for (state, delta) in D_jobs_stats_delta.get("nb_jobs_by_state", {}).items()
+        if delta
+    }
+    if D_jobs_stats_delta.get("nb_jobs"):
+        D_inc["jobs.nb_jobs"] = D_jobs_stats_delta["nb_jobs"]
+    if D_inc:
+        D_update["$inc"] = D_inc
+
+    # The jobs written by the ingestion are the most recently updated ones, and
+    # the oldest update only moves when the oldest jobs are written
+    oldest_job_update = get_oldest_job_update(jobs_collection, cluster_name)
+    if oldest_job_update is not None:
+        if D_stored_jobs_stats.get("job_dates") is None:
+            D_update["$set"]["jobs.job_dates"] = {
+                "min": oldest_job_update,
+                "max": (
+                    oldest_job_update
+                    if latest_job_update is None
+                    else max(oldest_job_update, latest_job_update)
+                ),
+            }
+        else:
+            D_update["$set"]["jobs.job_dates.min"] = oldest_job_update
+            if latest_job_update is not None:
+                D_update["$max"] = {"jobs.job_dates.max": latest_job_update}
+
+    cluster_stats_collection.update_one({"cluster_name": cluster_name}, D_update)
+    if stats is not None:
+        # One read, one indexed find and one update
+        stats.count("mongo_round_trips", 3)
+
+
+def get_cluster_stats(cluster_stats_collection, cluster_name):
+    """
+    Retrieve the summary of a cluster, or None if it has never been computed.
+    """
+    return cluster_stats_collection.find_one({"cluster_name": cluster_name}, {"_id": 0})
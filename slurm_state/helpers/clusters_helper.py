@@ -7,6 +7,7 @@ from slurm_state.config import (
     string,
     optional_string,
     string_list,
+    string_choices,
     integer,
     timezone,
     SubdictValidator,
@@ -66,6 +67,17 @@ def _load_clusters_from_config():
     clusters_valid.add_field("sacct_path", optional_string)
     clusters_valid.add_field("sinfo_path", optional_string)
     clusters_valid.add_field("slurm_version", optional_string, default=None)
+    # Compression of the reports during their transfer from the cluster,
+    # and number of seconds allowed to retrieve them
+    clusters_valid.add_field(
+        "report_compression", string_choices("none", "gzip", "zstd"), default="none"
+    )
+    clusters_valid.add_field("report_timeout", integer, default=600)
+
+    # Number of seconds between two ingestions of the jobs or the nodes by the
+    # ingestion daemon
+    clusters_valid.add_field("jobs_poll_interval", integer, default=300)
+    clusters_valid.add_field("nodes_poll_interval", integer, default=300)
 
     # Load the clusters from the configuration file, asserting that it uses the
     # predefined format
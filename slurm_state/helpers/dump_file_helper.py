@@ -0,0 +1,192 @@
+"""
+Helper functions to write the Clockwork jobs and nodes in dump files
+as they are produced by the ingestion pipeline, and to read them back.
+
+Two formats are available:
+- "json": a JSON list, as written by json.dump(elements, f, indent=4)
+- "jsonl": JSON Lines, one compact element per line, optionally
+  compressed with gzip or zstd
+"""
+
+import gzip
+import json
+import textwrap
+
+from slurm_state.helpers.json_stream_helper import iter_json_array_items
+
+try:
+    # Optional, only required to write or read the dump files compressed with zstd
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DUMP_FORMATS = ["json", "jsonl"]
+DUMP_COMPRESSIONS = ["none", "gzip", "zstd"]
+
+# First bytes of the files compressed with gzip or zstd
+GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+ZSTD_MAGIC_NUMBER = b"\x28\xb5\x2f\xfd"
+
+
+def open_dump_file(file_path, mode, compression="none"):
+    """
+    Open a dump file in text mode, compressed or not.
+
+    Parameters:
+        file_path   Path of the dump file
+        mode        "r" or "w"
+        compression "none", "gzip" or "zstd"
+
+    Returns:
+        A file object opened in text mode
+    """
+    assert mode in ["r", "w"]
+    if compression == "gzip":
+        return gzip.open(file_path, f"{mode}t", encoding="utf-8")
+    elif compression == "zstd":
+        if zstandard is None:
+            raise Exception(
+                'The package "zstandard" is required to handle dump files compressed with zstd.'
+            )
+        return zstandard.open(file_path, f"{mode}t", encoding="utf-8")
+    elif compression == "none":
+        return open(file_path, mode, encoding="utf-8")
+    raise ValueError(f'Unknown compression "{compression}".')
+
+
+def get_dump_file_compression(file_path):
+    """
+    Return the compression ("none", "gzip" or "zstd") of a dump file, from its first bytes.
+    """
+    with open(file_path, "rb") as f:
+        header = f.read(len(ZSTD_MAGIC_NUMBER))
+    if header.startswith(GZIP_MAGIC_NUMBER):
+        return "gzip"
+    elif header.startswith(ZSTD_MAGIC_NUMBER):
+        return "zstd"
+    return "none"
+
+
+def get_dump_writer(file_path, dump_format="json", compression="none"):
+    """
+    Return the writer of a dump file in the requested format.
+
+    Parameters:
+        file_path   Path of the dump file
+        dump_format "json" (default) or "jsonl"
+        compression "none" (default), "gzip" or "zstd". Only available for the "jsonl" format
+
+    Returns:
+        A JSONListWriter or a JSONLinesWriter, to use as a context manager
+    """
+    if dump_format == "json":
+        assert (
+            compression == "none"
+        ), 'The dump files are only compressed in the "jsonl" format.'
+        return JSONListWriter(file_path)
+    elif dump_format == "jsonl":
+        return JSONLinesWriter(file_path, compression=compression)
+    raise ValueError(f'Unknown dump format "{dump_format}".')
+
+
+def iter_dump_file(file_path):
+    """
+    Yield one by one the elements of a dump file, whatever its format
+    and compression, without loading the whole file in memory.
+
+    Parameters:
+        file_path   Path of a dump file written in the "json" or "jsonl" format
+
+    Returns:
+        A generator over the elements of the dump file
+    """
+    compression = get_dump_file_compression(file_path)
+
+    # A JSON list starts with "[" while each JSON line is an object
+    with open_dump_file(file_path, "r", compression=compression) as f:
+        first_character = f.read(64).lstrip()[:1]
+
+    with open_dump_file(file_path, "r", compression=compression) as f:
+        if first_character == "[":
+            yield from iter_json_array_items(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class JSONListWriter:
+    """
+    Write the elements of a JSON list one by one in a file.
+
+    The produced file is identical to the one which would be written by
+    json.dump(elements, f, indent=4), without holding all the elements
+    in memory.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.nb_elements = 0
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.file_path, "w")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._f.write("\n]" if self.nb_elements else "[]")
+        self._f.close()
+        self._f = None
+
+    def write(self, element):
+        """
+        Append an element to the JSON list.
+        """
+        self._f.write(",\n" if self.nb_elements else "[\n")
+        self._f.write(textwrap.indent(json.dumps(element, indent=4), "    "))
+        self.nb_elements += 1
+
+    def write_all(self, elements):
+        """
+        Append several elements to the JSON list.
+        """
+        for element in elements:
+            self.write(element)
+
+
+class JSONLinesWriter:
+    """
+    Write elements one by one in a JSON Lines file, optionally compressed.
+
+    It presents the same interface as JSONListWriter.
+    """
+
+    def __init__(self, file_path, compression="none"):
+        assert compression in DUMP_COMPRESSIONS
+        self.file_path = file_path
+        self.compression = compression
+        self.nb_elements = 0
+        self._f = None
+
+    def __enter__(self):
+        self._f = open_dump_file(self.file_path, "w", compression=self.compression)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._f.close()
+        self._f = None
+
+    def write(self, element):
+        """
+        Append an element to the file, on its own line.
+        """
+        self._f.write(json.dumps(element, separators=(",", ":")))
+        self._f.write("\n")
+        self.nb_elements += 1
+
+    def write_all(self, elements):
+        """
+        Append several elements to the file.
+        """
+        for element in elements:
+            self.write(element)
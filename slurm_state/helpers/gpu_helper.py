@@ -5,6 +5,14 @@ to a format used by Clockwork).
 
 import re
 
+# The Gres field has the following format: "gpu:<gpu_name>:<gpu_number>"
+# with, optionally, at the end: "(S:0)" if the GPU are associated with
+# socket 0, "(S:0-1)" for instance if associated to sockets 0 and 1.
+GRES_REGEX = re.compile(r"gpu:(\w*?):(\d+)$")
+GRES_WITH_SOCKETS_REGEX = re.compile(r"gpu:(\w*?):(\d+)\(S:(.*)\)")
+# The 'AvailableFeatures' field ends with the amount of RAM of the GPU, such as "32gb"
+FEATURES_REGEX = re.compile(r"^(\w*,)*(\d+)gb$")
+
 
 def get_cw_gres_description(unparsed_gres, unparsed_features):
     """
@@ -80,16 +88,10 @@ def get_gres_dict(slurm_gres_field):
         gres_dict = {}
         gres_dict_parsed = {}
 
-        # The Gres field has the following format: "gpu:<gpu_name>:<gpu_number>"
-        # with, optionally, at the end: "(S:0)" if the GPU are associated with
-        # socket 0, "(S:0-1)" for instance if associated to sockets 0 and 1.
-        prog1 = re.compile(r"gpu:(\w*?):(\d+)$")
-        prog2 = re.compile(r"gpu:(\w*?):(\d+)\(S:(.*)\)")
-
-        if m := prog1.match(slurm_gres_field):
+        if m := GRES_REGEX.match(slurm_gres_field):
             # Get the gpu name and number.
             gres_dict_parsed = {"name": m.group(1), "number": int(m.group(2))}
-        elif m := prog2.match(slurm_gres_field):
+        elif m := GRES_WITH_SOCKETS_REGEX.match(slurm_gres_field):
             # Get the gpu name and number, as well as associated sockets
             # if there are any.
             gres_dict_parsed = {
@@ -123,9 +125,8 @@ def get_cw_gpu_name(slurm_gpu_name, features):
         A string containing the GPU name based on the convention presented above.
     """
     # Parse the 'AvailableFeatures' field
-    prog = re.compile(r"^(\w*,)*(\d+)gb$")
     # If the field matches this format, the amount of RAM can be retrieved
-    if m := prog.match(features):
+    if m := FEATURES_REGEX.match(features):
         gpu_ram = m.group(2)
         # Change the name if needed
         if slurm_gpu_name == "v100" and gpu_ram == "32":
@@ -0,0 +1,75 @@
+"""
+Helper functions to retrieve the jobs of a cluster from the end of the
+last window successfully committed to the database (its "high-water mark"),
+instead of a fixed window ending now.
+
+The high-water marks are stored in a collection, one document per cluster:
+    {"cluster_name": "mila", "last_end": 1700000000.0}
+"""
+
+# Default number of seconds of the window retrieved when no high-water mark is stored
+DEFAULT_SACCT_WINDOW = 600
+# Default number of seconds by which a window overlaps the previous one, in order
+# to retrieve the jobs updated while the previous window was being committed
+DEFAULT_SACCT_OVERLAP = 60
+# Default maximum number of seconds covered by a single sacct call
+DEFAULT_SACCT_MAX_WINDOW = 3600
+
+
+def compute_sacct_windows(
+    last_end,
+    now,
+    overlap=DEFAULT_SACCT_OVERLAP,
+    max_window=DEFAULT_SACCT_MAX_WINDOW,
+    default_window=DEFAULT_SACCT_WINDOW,
+):
+    """
+    Split the time elapsed since the high-water mark into the windows of the sacct calls.
+
+    Parameters:
+        last_end        High-water mark: timestamp of the end of the last committed window,
+                        or None if no window has been committed yet
+        now             Timestamp of the end of the last window
+        overlap         Number of seconds by which the first window overlaps the high-water mark
+        max_window      Maximum number of seconds covered by a window
+        default_window  Number of seconds covered by the window when there is no high-water mark
+
+    Returns:
+        A list of consecutive (start, end) timestamps, ending at now
+    """
+    assert max_window > 0
+    if last_end is None:
+        start = now - default_window
+    else:
+        # A high-water mark in the future (for instance because of a clock change)
+        # still leads to a window covering the overlap
+        start = min(last_end, now) - overlap
+
+    L_windows = []
+    while start < now:
+        end = min(start + max_window, now)
+        L_windows.append((start, end))
+        start = end
+    return L_windows
+
+
+def get_high_water_mark(high_water_marks_collection, cluster_name):
+    """
+    Return the high-water mark of a cluster, or None if none has been stored.
+    """
+    D_mark = high_water_marks_collection.find_one(
+        {"cluster_name": cluster_name}, {"_id": 0, "last_end": 1}
+    )
+    return None if D_mark is None else D_mark["last_end"]
+
+
+def set_high_water_mark(high_water_marks_collection, cluster_name, last_end):
+    """
+    Store the high-water mark of a cluster. The mark never goes backward, so
+    that concurrent or late ingestions cannot make a window be retrieved twice.
+    """
+    high_water_marks_collection.update_one(
+        {"cluster_name": cluster_name},
+        {"$max": {"last_end": last_end}},
+        upsert=True,
+    )
@@ -0,0 +1,209 @@
+"""
+Helper class to export the measures of the ingestions (see IngestStats),
+as a Prometheus textfile and in the "ingest_runs" collection of the database.
+
+Each ingestion is stored in the "ingest_runs" collection, for instance:
+    {
+        "cluster_name": "mila",
+        "entity": "jobs",
+        "start": 1700000000.0,
+        "date": datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc),
+        "duration": 12.5,
+        "error": None,
+        "stage_durations": {"fetch": 8.1, "parse": 1.2, ...},
+        "counters": {"jobs": 5000, "mongo_round_trips": 7, ...}
+    }
+The "date" field is the UTC datetime of the start, used by the TTL index
+removing the old runs (see create_ingest_runs_indexes).
+
+The textfiles (to be read by the textfile collector of the Prometheus node
+exporter) present the measures of the last ingestion of each cluster and
+entity. Each cluster and entity has its own textfile, whose path is the given
+path suffixed by the cluster name and the entity (see get_textfile_path): the
+ingestions of the clusters may run in separate processes (for instance one
+cron job per cluster), which would otherwise overwrite the measures of the
+others. For instance, with the path /var/lib/node_exporter/clockwork_ingest.prom,
+the last ingestion of the jobs of mila is described in
+/var/lib/node_exporter/clockwork_ingest.mila.jobs.prom.
+"""
+
+import contextlib
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+from slurm_state.helpers.ingest_stats_helper import IngestStats
+
+# Prefix of the names of the exported metrics
+METRICS_PREFIX = "clockwork_ingest"
+# Default number of seconds after which the runs are removed from the database
+DEFAULT_INGEST_RUNS_TTL = 30 * 24 * 3600
+
+
+def create_ingest_runs_indexes(ingest_runs_collection, ttl=DEFAULT_INGEST_RUNS_TTL):
+    """
+    Create the indexes of the "ingest_runs" collection: the TTL index removing
+    the old runs, and the index used to retrieve the last runs of a cluster.
+    """
+    ingest_runs_collection.create_index(
+        [("date", 1)], name="date_ttl", expireAfterSeconds=ttl
+    )
+    ingest_runs_collection.create_index(
+        [("cluster_name", 1), ("entity", 1), ("start", -1)],
+        name="cluster_name_entity_and_start",
+    )
+
+
+def escape_label_value(value):
+    """
+    Escape a label value of the Prometheus text format.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_metric(name, D_labels, value):
+    """
+    Return a line of the Prometheus text format.
+    """
+    labels = ",".join(
+        f'{label}="{escape_label_value(label_value)}"'
+        for (label, label_value) in D_labels.items()
+    )
+    return f"{METRICS_PREFIX}_{name}{{{labels}}} {value}"
+
+
+def get_textfile_path(textfile_path, cluster_name, entity):
+    """
+    Return the path of the textfile of a cluster and an entity, by inserting
+    them before the extension of textfile_path.
+    """
+    (root, extension) = os.path.splitext(textfile_path)
+    return f"{root}.{cluster_name}.{entity}{extension}"
+
+
+class IngestMetricsExporter:
+    """
+    Export the measures of each ingestion run. It can be shared by
+    concurrent ingestions.
+    """
+
+    def __init__(self, textfile_path=None, ingest_runs_collection=None):
+        """
+        Parameters:
+            textfile_path           Path from which the Prometheus textfile of each cluster and
+                                    entity is named (see get_textfile_path). Default is None,
+                                    which means no textfile is written
+            ingest_runs_collection  Collection in which each run is stored. Default is None,
+                                    which means the runs are not stored
+        """
+        self.textfile_path = textfile_path
+        self.ingest_runs_collection = ingest_runs_collection
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def measure(self, cluster_name, entity):
+        """
+        Context manager yielding the IngestStats of an ingestion run,
+        which is recorded at the end of the block, even if it fails.
+        """
+        stats = IngestStats()
+        start = time.time()
+        error = None
+        try:
+            yield stats
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            try:
+                self.record(
+                    cluster_name, entity, stats, start, time.time() - start, error=error
+                )
+            except Exception:
+                # The export of the measures should not interrupt the ingestions
+                logging.exception(
+                    f"Failed to export the measures of the {entity} of {cluster_name}."
+                )
+
+    def record(self, cluster_name, entity, stats, start, duration, error=None):
+        """
+        Export the measures of an ingestion run.
+
+        Parameters:
+            cluster_name    Name of the ingested cluster
+            entity          "jobs" or "nodes"
+            stats           IngestStats of the run
+            start           Timestamp of the beginning of the run
+            duration        Number of seconds taken by the run
+            error           Error which interrupted the run, if any
+        """
+        D_run = {
+            "cluster_name": cluster_name,
+            "entity": entity,
+            "start": start,
+            "duration": duration,
+            "error": None if error is None else str(error),
+            **stats.to_dict(),
+        }
+        if self.ingest_runs_collection is not None:
+            # insert_one adds an "_id" to the given document
+            self.ingest_runs_collection.insert_one(
+                dict(D_run, date=datetime.fromtimestamp(start, tz=timezone.utc))
+            )
+        if self.textfile_path is not None:
+            with self._lock:
+                self._write_textfile(
+                    get_textfile_path(self.textfile_path, cluster_name, entity), D_run
+                )
+
+    def get_metrics_lines(self, D_run):
+        """
+        Return the lines of the Prometheus textfile describing the last run
+        of a cluster and an entity.
+        """
+        L_lines = [
+            f"# HELP {METRICS_PREFIX}_last_run_timestamp_seconds Start of the last ingestion.",
+            f"# TYPE {METRICS_PREFIX}_last_run_timestamp_seconds gauge",
+            f"# HELP {METRICS_PREFIX}_last_run_success 1 if the last ingestion succeeded, 0 otherwise.",
+            f"# TYPE {METRICS_PREFIX}_last_run_success gauge",
+            f"# HELP {METRICS_PREFIX}_duration_seconds Duration of the last ingestion.",
+            f"# TYPE {METRICS_PREFIX}_duration_seconds gauge",
+            f"# HELP {METRICS_PREFIX}_stage_duration_seconds Duration of each stage of the last ingestion.",
+            f"# TYPE {METRICS_PREFIX}_stage_duration_seconds gauge",
+        ]
+        D_labels = {"cluster": D_run["cluster_name"], "entity": D_run["entity"]}
+        L_lines.append(
+            format_metric("last_run_timestamp_seconds", D_labels, D_run["start"])
+        )
+        L_lines.append(
+            format_metric("last_run_success", D_labels, int(D_run["error"] is None))
+        )
+        L_lines.append(format_metric("duration_seconds", D_labels, D_run["duration"]))
+        for (stage, duration) in D_run["stage_durations"].items():
+            L_lines.append(
+                format_metric(
+                    "stage_duration_seconds", {**D_labels, "stage": stage}, duration
+                )
+            )
+        # Each counter of the run (entities, bytes, round trips...) is its own metric
+        for (name, value) in sorted(D_run["counters"].items()):
+            metric_name = "last_run_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+            L_lines += [
+                f"# HELP {METRICS_PREFIX}_{metric_name} Number of {name} counted by the last ingestion.",
+                f"# TYPE {METRICS_PREFIX}_{metric_name} gauge",
+                format_metric(metric_name, D_labels, value),
+            ]
+        return L_lines
+
+    def _write_textfile(self, textfile_path, D_run):
+        """
+        Write the Prometheus textfile of a run. It is renamed once written,
+        so that it is never read partially.
+        """
+        tmp_path = f"{textfile_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(self.get_metrics_lines(D_run)) + "\n")
+        os.replace(tmp_path, textfile_path)
@@ -0,0 +1,49 @@
+"""
+Helper class to measure the stages of an ingestion.
+"""
+
+import contextlib
+import time
+
+
+class IngestStats:
+    """
+    Wall time spent in each stage of an ingestion (for instance "parse",
+    "diff" or "write"), and counters of what has been processed.
+
+    The durations and counters of a stage accumulate over the batches.
+    """
+
+    def __init__(self):
+        # format: {stage name: number of seconds}
+        self.stage_durations = {}
+        # format: {counter name: value}
+        self.counters = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Context manager adding the time spent in its block to the stage "name".
+        """
+        timestamp_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_durations[name] = self.stage_durations.get(name, 0) + (
+                time.perf_counter() - timestamp_start
+            )
+
+    def count(self, name, value=1):
+        """
+        Add value to the counter "name".
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        """
+        Return the durations and the counters, as a dictionary.
+        """
+        return {
+            "stage_durations": dict(self.stage_durations),
+            "counters": dict(self.counters),
+        }
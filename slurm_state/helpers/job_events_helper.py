@@ -0,0 +1,109 @@
+"""
+Helper functions to handle the "job_events" collection, in which the
+ingestion appends an event each time the state of a job changes.
+
+An event presents the following format:
+    {
+        "cluster_name": "mila",
+        "job_id": "4553",
+        "mila_email_username": "student00@mila.quebec",
+        "old_state": "PENDING",     (None for a job seen for the first time)
+        "new_state": "RUNNING",
+        "timestamp": 1700000000.0,
+        "date": datetime(2023, 11, 14, 22, 13, 20)
+    }
+The "date" field is the UTC datetime of the timestamp, as the TTL indexes
+of MongoDB only apply to dates. The events are removed by MongoDB once
+they are older than the TTL of the collection.
+
+The events are stamped when they are inserted (see stamp_job_events). As
+several ingestions insert events concurrently, an event may still become
+visible slightly after an event with a later timestamp. Thus, a consumer
+polling the events should read them again from a little before its last
+seen timestamp (the overlap of find_job_events_since), and ignore the
+events whose "_id" it has already seen.
+"""
+
+import time
+from datetime import datetime, timezone
+
+# Default number of seconds after which the events are removed
+DEFAULT_JOB_EVENTS_TTL = 7 * 24 * 3600
+# Default number of seconds before the last seen timestamp from which the events
+# are read again, to retrieve the events inserted late by concurrent ingestions
+DEFAULT_JOB_EVENTS_OVERLAP = 60
+
+
+def create_job_events_indexes(job_events_collection, ttl=DEFAULT_JOB_EVENTS_TTL):
+    """
+    Create the indexes of the "job_events" collection: the TTL index removing
+    the old events, and the index used to read the events in time order.
+    """
+    job_events_collection.create_index(
+        [("date", 1)], name="date_ttl", expireAfterSeconds=ttl
+    )
+    job_events_collection.create_index(
+        [("cluster_name", 1), ("timestamp", 1)], name="cluster_name_and_timestamp"
+    )
+
+
+def get_job_event(D_job, old_state, timestamp):
+    """
+    Return the event describing the transition of a Clockwork job from old_state
+    to its current state.
+    """
+    return {
+        "cluster_name": D_job["slurm"]["cluster_name"],
+        "job_id": D_job["slurm"]["job_id"],
+        "mila_email_username": D_job["cw"].get("mila_email_username"),
+        "old_state": old_state,
+        "new_state": D_job["slurm"].get("job_state"),
+        "timestamp": timestamp,
+        "date": datetime.fromtimestamp(timestamp, tz=timezone.utc),
+    }
+
+
+def stamp_job_events(L_job_events, timestamp=None):
+    """
+    Set the timestamp (and date) of events right before they are inserted, so that
+    the events retrieved after the diff of the jobs are not stamped in the past.
+
+    Parameters:
+        L_job_events    Events to stamp, updated in place
+        timestamp       Time of the insertion. Default is the current time
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    date = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+    for D_event in L_job_events:
+        D_event["timestamp"] = timestamp
+        D_event["date"] = date
+
+
+def find_job_events_since(
+    job_events_collection,
+    timestamp,
+    cluster_names=None,
+    overlap=DEFAULT_JOB_EVENTS_OVERLAP,
+):
+    """
+    Retrieve the events which occurred after a timestamp, in time order.
+
+    The events of the overlap seconds before the timestamp are retrieved as
+    well, as some of them may have been inserted after the previous read. The
+    events already seen by the consumer should be ignored thanks to their "_id".
+
+    Parameters:
+        job_events_collection   Collection of the job events
+        timestamp               Last timestamp seen by the consumer
+        cluster_names           If not None, only the events of these clusters are retrieved
+        overlap                 Number of seconds before the timestamp from which the events
+                                are retrieved. Default is 60
+
+    Returns:
+        A cursor over the events, sorted by timestamp then "_id"
+    """
+    D_filter = {"timestamp": {"$gt": timestamp - overlap}}
+    if cluster_names is not None:
+        D_filter["cluster_name"] = {"$in": list(cluster_names)}
+    return job_events_collection.find(D_filter).sort([("timestamp", 1), ("_id", 1)])
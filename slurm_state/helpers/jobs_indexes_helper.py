@@ -0,0 +1,119 @@
+"""
+Indexes of the jobs collection supporting the sortings of the web interface.
+
+The jobs are listed page by page with continuation tokens (keyset pagination),
+each page being retrieved by filtering the jobs placed after the last job of
+the previous page. This is only efficient if an index matches the sorting: the
+sortable field, then the job ID and the cluster name, which identify each job
+(see get_jobs_sorting in clockwork_web/core/jobs_helper.py).
+
+As the job ID and the cluster name are always sorted in ascending order, an
+index can not be used for both directions of the sortable field: an index
+supports a single sorting, that is a field and a direction.
+
+Each index slows down the ingestion, which updates the jobs constantly. Only
+the default sorting of the web interface (by descending submit time, see
+parse_search_request in clockwork_web/core/search_helper.py) is indexed. The
+other sortings should only be indexed once the cost of their indexes on the
+ingestion has been measured (see --sorting_indexes in scripts/benchmark_ingest.py).
+
+The job ID and the cluster name are also indexed on their own by a unique index,
+which prevents two concurrent ingestions from both inserting the same new job.
+"""
+
+# Name of the unique index identifying the jobs
+JOBS_IDENTIFYING_INDEX = "job_id_and_cluster_name"
+# Fields identifying each job
+JOBS_IDENTIFYING_FIELDS = ["slurm.job_id", "slurm.cluster_name"]
+
+# Fields by which the jobs can be sorted in the web interface
+JOBS_SORTING_FIELDS = [
+    "slurm.cluster_name",
+    "cw.mila_email_username",
+    "slurm.job_id",
+    "slurm.name",
+    "slurm.job_state",
+    "slurm.submit_time",
+    "slurm.start_time",
+    "slurm.end_time",
+]
+# Sortings supported by an index, as (field, direction) pairs
+DEFAULT_JOBS_INDEXED_SORTINGS = [("slurm.submit_time", -1)]
+
+
+def get_all_jobs_sortings():
+    """
+    Return all the sortings of the jobs available in the web interface,
+    as (field, direction) pairs.
+    """
+    return [
+        (field, direction) for field in JOBS_SORTING_FIELDS for direction in [1, -1]
+    ]
+
+
+def get_jobs_sorting_indexes(L_sortings=DEFAULT_JOBS_INDEXED_SORTINGS):
+    """
+    Return the indexes supporting some sortings of the jobs.
+
+    Parameters:
+        L_sortings  List of the (field, direction) pairs to index. Default is the
+                    default sorting of the web interface only
+
+    Returns:
+        A list of (index name, list of (field, direction) pairs)
+    """
+    L_indexes = []
+    for (field, direction) in L_sortings:
+        L_keys = [(field, direction)] + [
+            (identifying_field, 1)
+            for identifying_field in JOBS_IDENTIFYING_FIELDS
+            if identifying_field != field
+        ]
+        if L_keys == [
+            (identifying_field, 1) for identifying_field in JOBS_IDENTIFYING_FIELDS
+        ]:
+            # Already created as the index JOBS_IDENTIFYING_INDEX
+            continue
+        L_indexes.append(
+            (
+                f"sort_{field.split('.')[-1]}_{'asc' if direction == 1 else 'desc'}",
+                L_keys,
+            )
+        )
+    return L_indexes
+
+
+def create_jobs_identifying_index(jobs_collection):
+    """
+    Create the unique index identifying the jobs by their job ID and cluster name,
+    if it does not exist.
+
+    The index was not unique in the previous versions: such an index is replaced.
+    This fails if some jobs are stored twice, which has to be fixed by hand first.
+
+    Parameters:
+        jobs_collection     Collection of the jobs
+    """
+    D_index = jobs_collection.index_information().get(JOBS_IDENTIFYING_INDEX)
+    if D_index is not None and not D_index.get("unique"):
+        jobs_collection.drop_index(JOBS_IDENTIFYING_INDEX)
+    jobs_collection.create_index(
+        [(field, 1) for field in JOBS_IDENTIFYING_FIELDS],
+        name=JOBS_IDENTIFYING_INDEX,
+        unique=True,
+    )
+
+
+def create_jobs_sorting_indexes(
+    jobs_collection, L_sortings=DEFAULT_JOBS_INDEXED_SORTINGS
+):
+    """
+    Create the indexes supporting some sortings of the jobs, if they do not exist.
+
+    Parameters:
+        jobs_collection     Collection of the jobs
+        L_sortings          List of the (field, direction) pairs to index. Default is
+                            the default sorting of the web interface only
+    """
+    for (name, L_keys) in get_jobs_sorting_indexes(L_sortings):
+        jobs_collection.create_index(L_keys, name=name)
@@ -0,0 +1,207 @@
+"""
+Functions to read the elements of a large JSON array incrementally,
+without loading the whole JSON document in memory.
+
+The sacct and sinfo reports are JSON documents presenting the following
+format:
+    {
+        "meta": {...},
+        "errors": [...],
+        "jobs": [{...}, {...}, ...]    (or "nodes" for the sinfo reports)
+    }
+Only one element of the "jobs" (or "nodes") array is held in memory at a time
+when using iter_json_array_items. The "meta" object, placed at the beginning of
+the reports, can be read without reading the rest of the report with
+read_json_object_value.
+"""
+
+import json
+
+# Size (in characters) of the chunks read from the file
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+_WHITESPACES = " \t\n\r"
+# Characters which can follow a JSON value
+_DELIMITERS = _WHITESPACES + ",:]}"
+
+_decoder = json.JSONDecoder()
+
+
+class _JSONStreamReader:
+    """
+    Minimal incremental reader over a text file containing JSON data.
+
+    It keeps a buffer of a few chunks (or of about twice the size of the value
+    being decoded, if larger), and uses the raw_decode function of the standard
+    JSON decoder to decode one value at a time. A value larger than the buffer is decoded again from its beginning once
+    more data is read: the size of the reads doubles at each attempt, so that
+    the number of attempts is logarithmic in the size of the value, and the
+    total decoding work stays linear.
+    """
+
+    def __init__(self, f, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        """
+        Read a new chunk from the file and append it to the buffer, after
+        having dropped the part of the buffer which has already been consumed.
+
+        Parameters:
+            size    Number of characters to read. Default is the chunk size
+
+        Returns:
+            False if the end of the file has been reached, True otherwise
+        """
+        if self.eof:
+            return False
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skip the whitespaces and return the next character, without consuming it.
+
+        Returns:
+            The next non-whitespace character, or None if the end of the file
+            has been reached
+        """
+        while True:
+            buffer = self.buffer
+            pos = self.pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACES:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return None
+
+    def expect(self, expected_characters):
+        """
+        Consume the next non-whitespace character, which has to be one of the
+        expected characters.
+
+        Returns:
+            The consumed character
+        """
+        c = self.peek()
+        if c is None or c not in expected_characters:
+            raise ValueError(
+                f'Invalid JSON data: expected one of "{expected_characters}" but got "{c}".'
+            )
+        self.pos += 1
+        return c
+
+    def decode(self):
+        """
+        Decode and consume the next JSON value.
+        """
+        self.peek()
+        read_size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value may be incomplete: read more data and retry
+                if not self._fill(read_size):
+                    raise
+                read_size *= 2
+                continue
+            # A value which is not followed by a delimiter could have been
+            # truncated (for instance, a number split into "1." and "25"),
+            # thus we read more data and decode it again
+            if (
+                end == len(self.buffer) or self.buffer[end] not in _DELIMITERS
+            ) and self._fill(read_size):
+                read_size *= 2
+                continue
+            self.pos = end
+            return value
+
+
+def _seek_key(reader, key):
+    """
+    Go through the top-level object until the requested key is found, so that
+    the reader is placed at the beginning of the associated value.
+
+    Raises:
+        KeyError if the key has not been found in the object
+    """
+    reader.expect("{")
+    if reader.peek() == "}":
+        raise KeyError(key)
+    while True:
+        current_key = reader.decode()
+        reader.expect(":")
+        if current_key == key:
+            return
+        # Skip the value associated to another key
+        reader.decode()
+        if reader.expect(",}") == "}":
+            raise KeyError(key)
+
+
+def read_json_object_value(f, key, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Read the value associated to a key of a JSON object stored in a file,
+    without reading the content following this value.
+
+    Parameters:
+        f           A file object opened in text mode
+        key         Key of the top-level object whose value is read
+        chunk_size  Number of characters read from the file at once
+
+    Returns:
+        The decoded value
+
+    Raises:
+        KeyError if the key has not been found in the JSON document, and
+        ValueError or json.JSONDecodeError if the JSON document is malformed
+    """
+    reader = _JSONStreamReader(f, chunk_size=chunk_size)
+    _seek_key(reader, key)
+    return reader.decode()
+
+
+def iter_json_array_items(f, key=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield one by one the elements of a JSON array stored in a file.
+
+    Parameters:
+        f           A file object opened in text mode
+        key         If None, the JSON document is expected to be an array.
+                    Otherwise, the JSON document is expected to be an object, and
+                    the elements are retrieved from the array associated to this key
+        chunk_size  Number of characters read from the file at once
+
+    Returns:
+        A generator over the elements of the array
+
+    Raises:
+        KeyError if the key has not been found in the JSON document, and
+        ValueError or json.JSONDecodeError if the JSON document is malformed.
+        As the elements are yielded as soon as they are decoded, the content
+        following the array is not checked.
+    """
+    reader = _JSONStreamReader(f, chunk_size=chunk_size)
+
+    if key is not None:
+        _seek_key(reader, key)
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.decode()
+        if reader.expect(",]") == "]":
+            return
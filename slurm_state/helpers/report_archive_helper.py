@@ -0,0 +1,131 @@
+"""
+Helper class to keep the raw sacct and sinfo reports in a local archive,
+in order to replay them later (see slurm_state/replay_reports.py).
+
+The reports are compressed and partitioned by cluster, entity and day (UTC):
+    <archive_folder>/<cluster_name>/<entity>/<YYYY-MM-DD>/<entity>_<timestamp>.json.gz
+where <timestamp> is the time at which the report has been retrieved.
+"""
+
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+from slurm_state.helpers.dump_file_helper import DUMP_COMPRESSIONS, open_dump_file
+
+# Extension of the archived reports, according to their compression
+ARCHIVE_EXTENSIONS = {"none": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+
+
+def get_partition_name(timestamp):
+    """
+    Return the name of the daily partition (in UTC) of a timestamp.
+    """
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+
+
+class ReportArchive:
+    """
+    Local archive of the raw reports retrieved from the clusters.
+    """
+
+    def __init__(self, archive_folder, compression="gzip"):
+        assert compression in DUMP_COMPRESSIONS
+        self.archive_folder = archive_folder
+        self.compression = compression
+
+    def get_report_path(self, cluster_name, entity, timestamp):
+        """
+        Return the path of the report of a cluster and entity retrieved at the given timestamp.
+        """
+        return os.path.join(
+            self.archive_folder,
+            cluster_name,
+            entity,
+            get_partition_name(timestamp),
+            f"{entity}_{timestamp:.3f}{ARCHIVE_EXTENSIONS[self.compression]}",
+        )
+
+    def store(self, report_file_path, cluster_name, entity, timestamp=None):
+        """
+        Copy a report into the archive, compressing it.
+
+        Parameters:
+            report_file_path    Path of the report to archive
+            cluster_name        Name of the cluster from which the report has been retrieved
+            entity              "jobs" or "nodes"
+            timestamp           Time at which the report has been retrieved. Default is now
+
+        Returns:
+            The path of the archived report
+        """
+        assert entity in ["jobs", "nodes"]
+        if timestamp is None:
+            timestamp = time.time()
+        archived_path = self.get_report_path(cluster_name, entity, timestamp)
+        os.makedirs(os.path.dirname(archived_path), exist_ok=True)
+
+        # The report is written under a temporary name, so that an interrupted
+        # copy is never replayed
+        tmp_path = f"{archived_path}.tmp"
+        with open(report_file_path, "r", encoding="utf-8") as f_in, open_dump_file(
+            tmp_path, "w", compression=self.compression
+        ) as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.replace(tmp_path, archived_path)
+        return archived_path
+
+    def get_cluster_names(self):
+        """
+        Return the sorted names of the clusters presenting archived reports.
+        """
+        if not os.path.isdir(self.archive_folder):
+            return []
+        return sorted(
+            name
+            for name in os.listdir(self.archive_folder)
+            if os.path.isdir(os.path.join(self.archive_folder, name))
+        )
+
+    def list_reports(self, cluster_name, entity, start_time=None, end_time=None):
+        """
+        List the archived reports of a cluster and entity, whatever their compression.
+
+        Parameters:
+            cluster_name    Name of the cluster
+            entity          "jobs" or "nodes"
+            start_time      If not None, only the reports retrieved at or after this timestamp are listed
+            end_time        If not None, only the reports retrieved before this timestamp are listed
+
+        Returns:
+            A list of (timestamp, path) tuples, sorted by timestamp
+        """
+        entity_folder = os.path.join(self.archive_folder, cluster_name, entity)
+        if not os.path.isdir(entity_folder):
+            return []
+
+        # Only the partitions which may contain reports of the time range are read
+        first_partition = None if start_time is None else get_partition_name(start_time)
+        last_partition = None if end_time is None else get_partition_name(end_time)
+
+        L_reports = []
+        for partition in os.listdir(entity_folder):
+            if (first_partition is not None and partition < first_partition) or (
+                last_partition is not None and partition > last_partition
+            ):
+                continue
+            partition_folder = os.path.join(entity_folder, partition)
+            for file_name in os.listdir(partition_folder):
+                if file_name.endswith(".tmp") or not file_name.startswith(f"{entity}_"):
+                    continue
+                timestamp = float(
+                    file_name[len(entity) + 1 :].split(".json", maxsplit=1)[0]
+                )
+                if (start_time is None or timestamp >= start_time) and (
+                    end_time is None or timestamp < end_time
+                ):
+                    L_reports.append(
+                        (timestamp, os.path.join(partition_folder, file_name))
+                    )
+        return sorted(L_reports)
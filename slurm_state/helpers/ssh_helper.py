@@ -1,13 +1,67 @@
 import os
+import select
+import shlex
+import threading
+import time
+import zlib
 
 from paramiko import SSHClient, AutoAddPolicy, ssh_exception, RSAKey
 
+try:
+    # Optional, only required to retrieve the reports compressed with zstd
+    import zstandard
+except ImportError:
+    zstandard = None
 
-def open_connection(hostname, username, ssh_key_path, port=22):
+# Default number of seconds after which an unused pooled connection is closed
+DEFAULT_IDLE_TIMEOUT = 600
+# Default number of seconds between two keepalive packets on a pooled connection
+DEFAULT_KEEPALIVE_INTERVAL = 30
+# Default number of seconds allowed to retrieve the output of a command streamed to a file,
+# and to wait for each chunk of the output of the other commands
+DEFAULT_COMMAND_TIMEOUT = 600
+# Default number of seconds allowed to open a SSH connection and authenticate
+DEFAULT_CONNECT_TIMEOUT = 60
+# Number of bytes read at once from the SSH channel
+STREAM_CHUNK_SIZE = 1 << 16
+# Number of bytes of the end of the standard error kept to report a failed command
+MAX_STDERR_SIZE = 1 << 16
+
+# Commands compressing the standard output of a remote command
+REMOTE_COMPRESSION_COMMANDS = {"gzip": "gzip -c", "zstd": "zstd -c"}
+
+
+# Parsed private keys
+# format: {ssh_key_path: (modification time of the key file, RSAKey)}
+_private_keys = {}
+_private_keys_lock = threading.Lock()
+
+
+def load_private_key(ssh_key_path):
+    """
+    Return the RSA private key stored at ssh_key_path.
+
+    The parsed keys are cached, and parsed again only if their file has been modified.
+    """
+    mtime = os.path.getmtime(ssh_key_path)
+    with _private_keys_lock:
+        entry = _private_keys.get(ssh_key_path)
+        if entry is None or entry[0] != mtime:
+            entry = (mtime, RSAKey.from_private_key_file(ssh_key_path))
+            _private_keys[ssh_key_path] = entry
+        return entry[1]
+
+
+def open_connection(
+    hostname, username, ssh_key_path, port=22, timeout=DEFAULT_CONNECT_TIMEOUT
+):
     """
     If successful, this will connect to the remote server and
     the value of self.ssh_client will be usable.
     Otherwise, this will set self.ssh_client=None or it will quit().
+
+    The timeout (in seconds) applies to the TCP connection, to the SSH
+    banner and to the authentication, so that an unresponsive host fails.
     """
 
     ssh_client = SSHClient()
@@ -16,7 +70,7 @@ def open_connection(hostname, username, ssh_key_path, port=22):
     assert os.path.exists(
         ssh_key_path
     ), f"Error. The absolute path given for ssh_key_path does not exist: {ssh_key_path} ."
-    pkey = RSAKey.from_private_key_file(ssh_key_path)
+    pkey = load_private_key(ssh_key_path)
 
     # The call to .connect was seen to raise an exception now and then.
     #     raise AuthenticationException("Authentication timeout.")
@@ -26,7 +80,14 @@ def open_connection(hostname, username, ssh_key_path, port=22):
     try:
         # For some reason, we really need to specify which key_filename to use.
         ssh_client.connect(
-            hostname, username=username, port=port, pkey=pkey, look_for_keys=False
+            hostname,
+            username=username,
+            port=port,
+            pkey=pkey,
+            look_for_keys=False,
+            timeout=timeout,
+            banner_timeout=timeout,
+            auth_timeout=timeout,
         )
         print(f"Successful SSH connection to {username}@{hostname} port {port}.")
     except ssh_exception.AuthenticationException as inst:
@@ -45,16 +106,206 @@ def open_connection(hostname, username, ssh_key_path, port=22):
     return ssh_client
 
 
-def launch_slurm_command(command, hostname, username, ssh_key_filename, port=22):
+class SSHConnectionPool:
+    """
+    Keep the authenticated SSH connections open between the commands, so that
+    successive commands sent to the same host do not each pay a full handshake.
+
+    The connections are keyed by (hostname, username, port, ssh_key_path). They
+    send keepalive packets, are closed after being unused for idle_timeout
+    seconds, and are transparently reopened when they have been dropped.
+
+    A connection is checked out while a command launched by exec_command is
+    running, until the channel of the command is given back through release.
+    The connections checked out are never closed as idle, even when the output
+    of their command takes longer than idle_timeout to be streamed.
+    """
+
+    def __init__(
+        self,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        keepalive_interval=DEFAULT_KEEPALIVE_INTERVAL,
+        clock=time.monotonic,
+    ):
+        """
+        Parameters:
+            idle_timeout        Number of seconds after which an unused connection is closed
+            keepalive_interval  Number of seconds between two keepalive packets (0 to disable them)
+            clock               Function returning the current time, in seconds
+        """
+        self.idle_timeout = idle_timeout
+        self.keepalive_interval = keepalive_interval
+        self.clock = clock
+        # format: {(hostname, username, port, ssh_key_path): [SSHClient, last use time, number of checkouts]}
+        self._connections = {}
+        self._lock = threading.Lock()
+        # Number of connections opened by the pool
+        self.nb_connections_opened = 0
+
+    def get_client(self, hostname, username, ssh_key_path, port=22, checkout=False):
+        """
+        Return a connected SSHClient, reusing the pooled connection if it is
+        still active.
+
+        Parameters:
+            checkout    Whether the connection is checked out, in which case it is
+                        not closed as idle until release is called
+
+        Returns:
+            A SSHClient, or None if the connection failed (see open_connection)
+        """
+        key = (hostname, username, port, ssh_key_path)
+        self.evict_idle_connections()
+
+        with self._lock:
+            entry = self._connections.get(key)
+            if entry is not None:
+                transport = entry[0].get_transport()
+                if transport is not None and transport.is_active():
+                    entry[1] = self.clock()
+                    if checkout:
+                        entry[2] += 1
+                    return entry[0]
+                # The connection has been dropped
+                del self._connections[key]
+                entry[0].close()
+
+        ssh_client = open_connection(hostname, username, ssh_key_path, port=port)
+        if ssh_client is None:
+            return None
+        if self.keepalive_interval:
+            ssh_client.get_transport().set_keepalive(self.keepalive_interval)
+
+        with self._lock:
+            self.nb_connections_opened += 1
+            entry = self._connections.get(key)
+            if entry is not None:
+                # Another thread opened a connection meanwhile: keep only one
+                ssh_client.close()
+                ssh_client = entry[0]
+            else:
+                entry = [ssh_client, self.clock(), 0]
+                self._connections[key] = entry
+            if checkout:
+                entry[2] += 1
+        return ssh_client
+
+    def release(self, channel):
+        """
+        Close the channel of a command launched by exec_command, and give back
+        its connection, which can then be closed once idle.
+        """
+        transport = channel.get_transport()
+        with self._lock:
+            for entry in self._connections.values():
+                if entry[2] and entry[0].get_transport() is transport:
+                    entry[1] = self.clock()
+                    entry[2] -= 1
+                    break
+        channel.close()
+
+    def discard(self, hostname, username, ssh_key_path, port=22):
+        """
+        Close the pooled connection of a host, if any.
+        """
+        with self._lock:
+            entry = self._connections.pop(
+                (hostname, username, port, ssh_key_path), None
+            )
+        if entry is not None:
+            entry[0].close()
+
+    def exec_command(
+        self, command, hostname, username, ssh_key_path, port=22, timeout=None
+    ):
+        """
+        Run a command on a host through a pooled connection. If the connection
+        is found to be dropped when opening the command channel, it is reopened
+        and the command is sent again once.
+
+        The timeout (in seconds, or None) is set on the channel of the command.
+        The connection is checked out until the channel of the command is given
+        to release.
+
+        Returns:
+            The (stdin, stdout, stderr) file-like objects of the command, or None
+            if no connection could be established
+        """
+        for attempt in range(2):
+            ssh_client = self.get_client(
+                hostname, username, ssh_key_path, port=port, checkout=True
+            )
+            if ssh_client is None:
+                return None
+            try:
+                return ssh_client.exec_command(command, timeout=timeout)
+            except (ssh_exception.SSHException, EOFError, OSError):
+                # The connection, checked out by this command only, is closed
+                self.discard(hostname, username, ssh_key_path, port=port)
+                if attempt:
+                    raise
+                print(f"Reconnecting to {username}@{hostname} port {port}.")
+
+    def evict_idle_connections(self):
+        """
+        Close the connections which have not been used for idle_timeout seconds.
+        The connections checked out by a running command are kept.
+        """
+        now = self.clock()
+        with self._lock:
+            L_idle_keys = [
+                key
+                for (key, (_, last_use, nb_checkouts)) in self._connections.items()
+                if nb_checkouts == 0 and now - last_use > self.idle_timeout
+            ]
+            L_idle_clients = [self._connections.pop(key)[0] for key in L_idle_keys]
+        for ssh_client in L_idle_clients:
+            ssh_client.close()
+
+    def close_all(self):
+        """
+        Close all the pooled connections.
+        """
+        with self._lock:
+            L_clients = [entry[0] for entry in self._connections.values()]
+            self._connections = {}
+        for ssh_client in L_clients:
+            ssh_client.close()
+
+
+# Pool shared by all the Slurm commands of the process
+_ssh_connection_pool = SSHConnectionPool()
+
+
+def get_ssh_connection_pool():
+    """
+    Return the SSH connection pool shared by the whole process.
+    """
+    return _ssh_connection_pool
+
+
+def launch_slurm_command(
+    command,
+    hostname,
+    username,
+    ssh_key_filename,
+    port=22,
+    timeout=DEFAULT_COMMAND_TIMEOUT,
+):
     """
     Launch a Slurm command through SSH and retrieve its response.
 
+    The connection is taken from the process-wide SSH connection pool,
+    and is left open for the next commands.
+
     Parameters:
         command             The Slurm command to launch through SSH
         hostname            The hostname used for the SSH connection to launch the Slurm command
         username            The username used for the SSH connection to launch the Slurm command
         ssh_key_filename    The name of the private key in .ssh folder used for the SSH connection to launch the Slurm command
         port                The port used for the SSH connection to launch the sinfo command
+        timeout             Number of seconds to wait for each chunk of the response, after
+                            which a socket.timeout is raised
     """
     # Print the command to use
     print(f"The command launched through SSH is:\n{command}")
@@ -65,10 +316,16 @@ def launch_slurm_command(command, hostname, username, ssh_key_filename, port=22)
     # Now this is the private ssh key that we are using with Paramiko.
     ssh_key_path = os.path.join(os.path.expanduser("~"), ".ssh", ssh_key_filename)
 
-    # Connect through SSH
+    # Connect through SSH and launch the command
+    pool = get_ssh_connection_pool()
     try:
-        ssh_client = open_connection(
-            hostname, username, ssh_key_path=ssh_key_path, port=port
+        streams = pool.exec_command(
+            command,
+            hostname,
+            username,
+            ssh_key_path=ssh_key_path,
+            port=port,
+            timeout=timeout,
         )
     except Exception as inst:
         print(
@@ -78,8 +335,8 @@ def launch_slurm_command(command, hostname, username, ssh_key_filename, port=22)
         return []
 
     # If a connection has been established
-    if ssh_client:
-        ssh_stdin, ssh_stdout, ssh_stderr = ssh_client.exec_command(command)
+    if streams is not None:
+        ssh_stdin, ssh_stdout, ssh_stderr = streams
 
         # We should find a better option to retrieve stderr
         """
@@ -89,8 +346,11 @@ def launch_slurm_command(command, hostname, username, ssh_key_filename, port=22)
                     f"Stderr in sinfo call on {hostname}. This doesn't mean that the call failed entirely, though.\n{response_stderr}"
                 )
             """
-        stdout = ssh_stdout.readlines()
-        ssh_client.close()
+        try:
+            stdout = ssh_stdout.readlines()
+        finally:
+            # Release the channel, but keep the connection open
+            pool.release(ssh_stdout.channel)
         return stdout
 
     else:
@@ -102,3 +362,155 @@ def launch_slurm_command(command, hostname, username, ssh_key_filename, port=22)
     raise Exception(
         f"No SSH connection has been established while trying to run {command}."
     )
+
+
+def _get_decompressor(compression):
+    """
+    Return an object presenting a decompress method, which decompresses
+    chunk by chunk data compressed with the given method ("none", "gzip" or "zstd").
+    """
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    elif compression == "zstd":
+        if zstandard is None:
+            raise Exception(
+                'The package "zstandard" is required to retrieve reports compressed with zstd.'
+            )
+        return zstandard.ZstdDecompressor().decompressobj()
+    elif compression == "none":
+        return None
+    raise ValueError(f'Unknown compression "{compression}".')
+
+
+def stream_slurm_command_to_file(
+    command,
+    file_name,
+    hostname,
+    username,
+    ssh_key_filename,
+    port=22,
+    compression="none",
+    timeout=DEFAULT_COMMAND_TIMEOUT,
+    pool=None,
+):
+    """
+    Launch a Slurm command through SSH and write its output into a file, chunk
+    by chunk, without holding it in memory.
+
+    If requested, the output is compressed on the remote host and decompressed
+    as it arrives. The file is written under a temporary name, and only renamed
+    to file_name once the command succeeded.
+
+    The standard error is drained while the output is streamed: otherwise, a
+    command writing a lot on it would block once the SSH window of the standard
+    error is full, while the output would be waited for. Only its end is kept,
+    to report a failure.
+
+    Parameters:
+        command             The Slurm command to launch through SSH
+        file_name           The path of the file to write
+        hostname            The hostname used for the SSH connection to launch the Slurm command
+        username            The username used for the SSH connection to launch the Slurm command
+        ssh_key_filename    The name of the private key in .ssh folder used for the SSH connection to launch the Slurm command
+        port                The port used for the SSH connection to launch the Slurm command
+        compression         "none", "gzip" or "zstd": how the output is compressed during the transfer
+        timeout             Number of seconds allowed to retrieve the whole output
+        pool                SSHConnectionPool to use. Default is the pool shared by the whole process
+
+    Returns:
+        A dictionary presenting the transfer statistics: the "compression" used,
+        the number of "bytes_received" through SSH, the number of "bytes_written"
+        in the file and the "duration" of the transfer, in seconds
+    """
+    if pool is None:
+        pool = get_ssh_connection_pool()
+    decompressor = _get_decompressor(compression)
+    if decompressor is not None:
+        # The exit status of the pipeline should be the one of the Slurm command.
+        # The login shell may not support pipefail (sh, dash), hence bash is used
+        command = "bash -o pipefail -c " + shlex.quote(
+            f"{command} | {REMOTE_COMPRESSION_COMMANDS[compression]}"
+        )
+    print(f"The command launched through SSH is:\n{command}")
+
+    assert ssh_key_filename, "Missing ssh_key_filename from config."
+    ssh_key_path = os.path.join(os.path.expanduser("~"), ".ssh", ssh_key_filename)
+
+    timestamp_start = time.monotonic()
+    deadline = timestamp_start + timeout
+    streams = pool.exec_command(
+        command, hostname, username, ssh_key_path, port=port, timeout=timeout
+    )
+    if streams is None:
+        raise Exception(
+            f"No SSH connection has been established while trying to run {command}."
+        )
+    (ssh_stdin, ssh_stdout, ssh_stderr) = streams
+    channel = ssh_stdout.channel
+    stderr_tail = b""
+
+    nb_bytes_received = 0
+    nb_bytes_written = 0
+    # The temporary file is specific to the thread, as a run abandoned by the
+    # ingestion daemon may still be writing its own report
+    tmp_file_name = f"{file_name}.{threading.get_ident()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+    try:
+        with open(tmp_file_name, "wb") as outfile:
+            while True:
+                remaining_time = deadline - time.monotonic()
+                if remaining_time <= 0:
+                    raise TimeoutError(
+                        f"The command {command} did not end within {timeout} seconds."
+                    )
+                if channel.recv_stderr_ready():
+                    stderr_tail = (
+                        stderr_tail + channel.recv_stderr(STREAM_CHUNK_SIZE)
+                    )[-MAX_STDERR_SIZE:]
+                    continue
+                if not channel.recv_ready():
+                    if channel.eof_received or channel.closed:
+                        break
+                    # Wait for the output, the standard error or the end of the command
+                    select.select([channel], [], [], remaining_time)
+                    continue
+                chunk = channel.recv(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                nb_bytes_received += len(chunk)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                nb_bytes_written += outfile.write(chunk)
+            if compression == "gzip":
+                nb_bytes_written += outfile.write(decompressor.flush())
+
+        exit_status = channel.recv_exit_status()
+        if exit_status != 0:
+            while channel.recv_stderr_ready():
+                stderr_tail = (stderr_tail + channel.recv_stderr(STREAM_CHUNK_SIZE))[
+                    -MAX_STDERR_SIZE:
+                ]
+            raise Exception(
+                f"The command {command} failed with the exit status {exit_status}: "
+                + stderr_tail.decode("utf-8", errors="replace")
+            )
+        os.replace(tmp_file_name, file_name)
+    except BaseException:
+        # Do not let a truncated report be parsed
+        if os.path.exists(tmp_file_name):
+            os.remove(tmp_file_name)
+        raise
+    finally:
+        pool.release(channel)
+
+    D_stats = {
+        "compression": compression,
+        "bytes_received": nb_bytes_received,
+        "bytes_written": nb_bytes_written,
+        "duration": time.monotonic() - timestamp_start,
+    }
+    print(
+        f"Received {nb_bytes_received} bytes ({compression}) from {hostname} in "
+        f"{D_stats['duration']:.2f} seconds, and wrote {nb_bytes_written} bytes in {file_name}."
+    )
+    return D_stats
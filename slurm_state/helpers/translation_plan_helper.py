@@ -0,0 +1,218 @@
+"""
+Compiled translation plans of the Slurm entities.
+
+The fields kept from the jobs and nodes of the Slurm reports are described
+by field specs: tuples (key, translator name, *translator arguments). For
+instance:
+    (
+        ("account", "copy"),
+        ("cluster", "rename", "cluster_name"),
+        ("state", "rename_subitems", (("current", "job_state"),)),
+    )
+
+These specs can be turned:
+- into a field map of the translators of parser_helper, applied to each field
+  of the entities (see get_reference_translator). This is the reference
+  implementation of the translation;
+- into a compiled translation plan (see compile_translation_plan): a function,
+  prepared once per field specs, which only visits the mapped keys and
+  builds the translated entity in one pass, without modifying the input entity.
+
+The translators available in the field specs are:
+    copy                                                    (key, "copy")
+    copy_with_none_as_empty_string                          (key, "copy_with_none_as_empty_string")
+    copy_and_stringify                                      (key, "copy_and_stringify")
+    rename                                                  (key, "rename", name)
+    rename_subitems                                         (key, "rename_subitems", ((subitem, name), ...))
+    rename_and_stringify_subitems                           (key, "rename_and_stringify_subitems", ((subitem, name), ...))
+    zero_to_null_and_rename_subitems                        (key, "zero_to_null_and_rename_subitems", ((subitem, name), ...))
+    join_subitems                                           (key, "join_subitems", separator, name)
+    extract_tres_data                                       (key, "extract_tres_data")
+"""
+
+import functools
+
+from slurm_state.helpers.parser_helper import (
+    copy,
+    copy_and_stringify,
+    copy_with_none_as_empty_string,
+    extract_tres_data,
+    join_subitems,
+    rename,
+    rename_and_stringify_subitems,
+    rename_subitems,
+    translate_with_value_modification,
+    zero_to_null,
+)
+
+
+def build_field_map(field_specs):
+    """
+    Return the field map associating each key of the field specs
+    to its translator from parser_helper.
+    """
+    field_map = {}
+    for (key, translator_name, *args) in field_specs:
+        if translator_name == "copy":
+            field_map[key] = copy
+        elif translator_name == "copy_with_none_as_empty_string":
+            field_map[key] = copy_with_none_as_empty_string
+        elif translator_name == "copy_and_stringify":
+            field_map[key] = copy_and_stringify
+        elif translator_name == "rename":
+            field_map[key] = rename(args[0])
+        elif translator_name == "rename_subitems":
+            field_map[key] = rename_subitems(dict(args[0]))
+        elif translator_name == "rename_and_stringify_subitems":
+            field_map[key] = rename_and_stringify_subitems(dict(args[0]))
+        elif translator_name == "zero_to_null_and_rename_subitems":
+            field_map[key] = translate_with_value_modification(
+                zero_to_null, rename_subitems, subitem_dict=dict(args[0])
+            )
+        elif translator_name == "join_subitems":
+            field_map[key] = join_subitems(args[0], args[1])
+        elif translator_name == "extract_tres_data":
+            field_map[key] = extract_tres_data
+        else:
+            raise ValueError(f'Unknown translator "{translator_name}".')
+    return field_map
+
+
+def get_reference_translator(field_specs):
+    """
+    Return a function translating a Slurm entity by applying the translators
+    of parser_helper to each of its fields. Note that these translators may
+    modify the input entity.
+    """
+    field_map = build_field_map(field_specs)
+
+    def translate(slurm_entity):
+        res_entity = {}
+        for k, v in slurm_entity.items():
+            # We will use a handler mapping to translate this
+            translator = field_map.get(k, None)
+            if translator is not None:
+                translator(k, v, res_entity)
+            # If no translator has been provided: ignore the field
+        return res_entity
+
+    return translate
+
+
+# Keys of the TRES counts, by TRES type (the GRES are handled separately)
+_TRES_KEYS = {
+    "mem": "mem",
+    "billing": "billing",
+    "cpu": "num_cpus",
+    "node": "num_nodes",
+}
+
+
+def _extract_tres_data(v, res):
+    """
+    Same as parser_helper.extract_tres_data, without the per-TRES function calls.
+    """
+    for (sacct_name, cw_name) in (
+        ("allocated", "tres_allocated"),
+        ("requested", "tres_requested"),
+    ):
+        D_tres = {}
+        for D_tres_item in v[sacct_name]:
+            tres_type = D_tres_item["type"]
+            tres_key = _TRES_KEYS.get(tres_type)
+            if tres_key is None and tres_type == "gres":
+                tres_key = "num_gpus" if D_tres_item["name"] == "gpu" else "gres"
+            if tres_key:
+                D_tres[tres_key] = D_tres_item["count"]
+        res[cw_name] = D_tres
+
+
+def _get_field_translator(translator_name, key, args):
+    """
+    Return the translation of the value v of the field key into res, as a
+    2-tuple (target, translate_field):
+    - the copies and renamings are done by the plan itself, as res[target] = v,
+      and translate_field is None;
+    - the other translations are done by calling translate_field(v, res), and
+      target is None.
+    """
+    if translator_name == "copy":
+        return (key, None)
+    elif translator_name == "rename":
+        return (args[0], None)
+    elif translator_name == "copy_with_none_as_empty_string":
+
+        def translate_field(v, res):
+            res[key] = None if v == "" else v
+
+    elif translator_name == "copy_and_stringify":
+
+        def translate_field(v, res):
+            res[key] = str(v)
+
+    elif translator_name == "rename_subitems":
+        L_subitems = tuple(args[0])
+
+        def translate_field(v, res):
+            for (subitem, name) in L_subitems:
+                res[name] = v[subitem]
+
+    elif translator_name == "rename_and_stringify_subitems":
+        L_subitems = tuple(args[0])
+
+        def translate_field(v, res):
+            for (subitem, name) in L_subitems:
+                res[name] = str(v[subitem])
+
+    elif translator_name == "zero_to_null_and_rename_subitems":
+        L_subitems = tuple(args[0])
+
+        def translate_field(v, res):
+            for (subitem, name) in L_subitems:
+                x = v[subitem]
+                res[name] = None if x == 0 else x
+
+    elif translator_name == "join_subitems":
+        (separator, name) = args
+
+        def translate_field(v, res):
+            res[name] = separator.join([str(x) for x in v.values()])
+
+    elif translator_name == "extract_tres_data":
+        translate_field = _extract_tres_data
+    else:
+        raise ValueError(f'Unknown translator "{translator_name}".')
+    return (None, translate_field)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_translation_plan(field_specs):
+    """
+    Compile the field specs into a function translating a Slurm entity.
+
+    The returned function has the same results as the reference translator
+    (see get_reference_translator), but only looks up the mapped keys of the
+    entity, and does not modify it: the plan is a tuple of (key, target,
+    translate_field) prepared once (see _get_field_translator), then applied
+    to each entity in a plain loop. The compilation is cached, so the field
+    specs (which must be hashable) are compiled once per process.
+    """
+    L_plan = tuple(
+        (key, *_get_field_translator(translator_name, key, args))
+        for (key, translator_name, *args) in field_specs
+    )
+    missing = object()
+
+    def translate(slurm_entity):
+        res = {}
+        for (key, target, translate_field) in L_plan:
+            v = slurm_entity.get(key, missing)
+            if v is missing:
+                continue
+            if translate_field is None:
+                res[target] = v
+            else:
+                translate_field(v, res)
+        return res
+
+    return translate
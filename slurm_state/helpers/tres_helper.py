@@ -0,0 +1,120 @@
+"""
+Functions to convert the TRES and GRES strings of the Slurm nodes (such as
+"cpu=40,mem=386618M,billing=96,gres/gpu=8" or "gpu:rtx8000:8(S:0-1)") into
+numeric values, stored in the "cw.resources" field of the Clockwork nodes.
+
+The same strings are shared by many nodes of a cluster, so that the parsed
+values are cached: the returned dictionaries must not be modified.
+"""
+
+import functools
+import re
+
+# Number of MB in each unit used by Slurm for the memory
+MEMORY_UNITS_IN_MB = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024**2, "P": 1024**3}
+
+TRES_VALUE_REGEX = re.compile(r"^(\d+(?:\.\d+)?)([KMGTP]?)$")
+# The items of a GRES string are separated by commas, which may also appear
+# between the parentheses of an item, as in "gpu:rtx8000:2(IDX:0,3)"
+GRES_SEPARATOR_REGEX = re.compile(r",(?![^(]*\))")
+# Items such as "gpu:1", "gpu:rtx8000:8" or "gpu:rtx8000:8(S:0-1)"
+GRES_ITEM_REGEX = re.compile(
+    r"^(?P<name>[^:()]+)(?::(?P<type>[^:()]+))?:(?P<count>\d+)(?:\(.*\))?$"
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_tres(tres):
+    """
+    Convert a TRES string into a dictionary of numbers.
+
+    Parameters:
+        tres    String such as "cpu=40,mem=386618M,billing=96,gres/gpu=8", or None
+
+    Returns:
+        A dictionary such as {"cpu": 40, "mem": 386618, "billing": 96, "gres/gpu": 8}.
+        The memory is expressed in MB. The items which can not be parsed are ignored.
+    """
+    D_tres = {}
+    if not tres:
+        return D_tres
+    for item in tres.split(","):
+        (name, _, value) = item.partition("=")
+        if not (m := TRES_VALUE_REGEX.match(value)):
+            continue
+        number = float(m.group(1))
+        if name == "mem":
+            number *= MEMORY_UNITS_IN_MB[m.group(2) or "M"]
+        D_tres[name] = int(number) if number.is_integer() else number
+    return D_tres
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_gres(gres):
+    """
+    Convert a GRES string into the number of resources of each name and type.
+
+    Parameters:
+        gres    String such as "gpu:rtx8000:8(S:0-1),tpu:0", or None
+
+    Returns:
+        A dictionary such as {"gpu": {"rtx8000": 8}, "tpu": {None: 0}}, the type
+        being None when it is not specified. The items which can not be parsed
+        (such as "(null)") are ignored.
+    """
+    DD_gres = {}
+    if not gres:
+        return DD_gres
+    for item in GRES_SEPARATOR_REGEX.split(gres):
+        if m := GRES_ITEM_REGEX.match(item.strip()):
+            D_counts = DD_gres.setdefault(m.group("name"), {})
+            D_counts[m.group("type")] = D_counts.get(m.group("type"), 0) + int(
+                m.group("count")
+            )
+    return DD_gres
+
+
+def get_cw_resources(slurm_node):
+    """
+    Compute the numeric description of the resources of a node, from the
+    "tres", "tres_used", "gres" and "gres_used" fields of its Slurm data.
+
+    Parameters:
+        slurm_node  The "slurm" component of a Clockwork node
+
+    Returns:
+        A dictionary presenting the following format:
+        {
+            "cpu_total": <int>, "cpu_used": <int>, "cpu_free": <int>,
+            "mem_mb_total": <int>, "mem_mb_used": <int>, "mem_mb_free": <int>,
+            "gpu_total": <int>, "gpu_used": <int>, "gpu_free": <int>,
+            "gpu_by_type": {<gpu type>: {"total": <int>, "used": <int>}}
+        }
+    """
+    D_tres = parse_tres(slurm_node.get("tres"))
+    D_tres_used = parse_tres(slurm_node.get("tres_used"))
+    D_gpu = parse_gres(slurm_node.get("gres")).get("gpu", {})
+    D_gpu_used = parse_gres(slurm_node.get("gres_used")).get("gpu", {})
+
+    D_resources = {
+        "cpu_total": D_tres.get("cpu", slurm_node.get("cpus") or 0),
+        "cpu_used": D_tres_used.get("cpu", 0),
+        "mem_mb_total": D_tres.get("mem", slurm_node.get("memory") or 0),
+        "mem_mb_used": D_tres_used.get("mem", 0),
+        # The GRES provide the types of the GPU, but the TRES are used
+        # when the GRES do not describe any GPU
+        "gpu_total": sum(D_gpu.values()) if D_gpu else D_tres.get("gres/gpu", 0),
+        "gpu_used": (
+            sum(D_gpu_used.values()) if D_gpu_used else D_tres_used.get("gres/gpu", 0)
+        ),
+        "gpu_by_type": {
+            gpu_type: {"total": number, "used": D_gpu_used.get(gpu_type, 0)}
+            for (gpu_type, number) in D_gpu.items()
+            if gpu_type is not None
+        },
+    }
+    for resource in ["cpu", "mem_mb", "gpu"]:
+        D_resources[f"{resource}_free"] = max(
+            D_resources[f"{resource}_total"] - D_resources[f"{resource}_used"], 0
+        )
+    return D_resources
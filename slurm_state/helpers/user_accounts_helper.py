@@ -0,0 +1,148 @@
+"""
+Helper functions to associate the cluster usernames found in the jobs
+to the Mila users stored in the database.
+"""
+
+import threading
+import time
+
+# Default number of seconds during which a username-to-user mapping is reused
+# before being retrieved again from the database
+DEFAULT_USER_ACCOUNT_CACHE_TTL = 300
+
+
+class UserAccountCache:
+    """
+    Process-level cache of the mappings between the cluster usernames and the
+    Mila users, stored with an expiration time.
+
+    A username which is not associated to any user is cached as well, so that
+    the jobs of unknown users do not trigger a query at each ingest.
+
+    The cache can be shared by the threads ingesting several clusters: its
+    entries and metrics are protected by a lock, which is not held while
+    the database is queried.
+    """
+
+    def __init__(self, ttl=DEFAULT_USER_ACCOUNT_CACHE_TTL, clock=time.monotonic):
+        """
+        Parameters:
+            ttl     Number of seconds during which a cached mapping is valid
+            clock   Function returning the current time, in seconds
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Format: {(users collection name, account field, username): (mila_email_username, expiration time)}
+        self._entries = {}
+        self._next_eviction = clock() + ttl
+        # Metrics
+        self.hits = 0  # Number of usernames resolved from the cache
+        self.misses = 0  # Number of usernames resolved from the database
+        self.queries = 0  # Number of queries sent to the database
+
+    def resolve(self, users_collection, account_field, usernames):
+        """
+        Retrieve the Mila users associated to cluster usernames, using at most
+        one query to the database.
+
+        Parameters:
+            users_collection    Collection of the users in the database
+            account_field       Field of the users documents storing the username on the
+                                cluster (for instance "mila_cluster_username" or "cc_account_username")
+            usernames           Iterable over the usernames to resolve
+
+        Returns:
+            A dictionary associating each username to the "mila_email_username"
+            of its user, or to None if no user is associated to this username
+        """
+        return self.resolve_and_count_queries(
+            users_collection, account_field, usernames
+        )[0]
+
+    def resolve_and_count_queries(self, users_collection, account_field, usernames):
+        """
+        Same as resolve, but also return the number of queries sent to the database
+        by this call, which is not affected by the other threads using the cache.
+
+        Returns:
+            A 2-tuple containing the dictionary returned by resolve, and the
+            number of queries sent to the database (0 or 1)
+        """
+        now = self.clock()
+        D_resolved = {}
+        L_missing_usernames = []
+        with self._lock:
+            self._evict_expired_entries(now)
+            for username in set(usernames):
+                entry = self._entries.get(
+                    (users_collection.full_name, account_field, username)
+                )
+                if entry is not None and entry[1] > now:
+                    D_resolved[username] = entry[0]
+                    self.hits += 1
+                else:
+                    L_missing_usernames.append(username)
+            if L_missing_usernames:
+                self.misses += len(L_missing_usernames)
+                self.queries += 1
+
+        if L_missing_usernames:
+            D_found = {}
+            for D_user in users_collection.find(
+                {account_field: {"$in": L_missing_usernames}},
+                {"_id": 0, account_field: 1, "mila_email_username": 1},
+            ):
+                # Keep the first user found, as find_one would do
+                D_found.setdefault(D_user[account_field], D_user["mila_email_username"])
+
+            with self._lock:
+                for username in L_missing_usernames:
+                    D_resolved[username] = D_found.get(username, None)
+                    self._entries[
+                        (users_collection.full_name, account_field, username)
+                    ] = (D_resolved[username], now + self.ttl)
+
+        return (D_resolved, 1 if L_missing_usernames else 0)
+
+    def _evict_expired_entries(self, now):
+        """
+        Remove the expired entries, at most once per TTL period.
+        The lock must be held by the caller.
+        """
+        if now < self._next_eviction:
+            return
+        self._entries = {k: v for (k, v) in self._entries.items() if v[1] > now}
+        self._next_eviction = now + self.ttl
+
+    def get_stats(self):
+        """
+        Return the metrics of the cache, as a dictionary.
+        """
+        with self._lock:
+            nb_lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "queries": self.queries,
+                "hit_ratio": self.hits / nb_lookups if nb_lookups else None,
+                "size": len(self._entries),
+            }
+
+    def clear(self):
+        """
+        Remove all the cached mappings.
+        """
+        with self._lock:
+            self._entries = {}
+
+
+# Cache shared by all the ingests of the process
+_user_account_cache = UserAccountCache()
+
+
+def get_user_account_cache():
+    """
+    Return the user account cache shared by the whole process.
+    """
+    return _user_account_cache
@@ -0,0 +1,512 @@
+"""
+Long-running entry point ingesting the jobs and nodes of all the clusters.
+
+Unlike read_report_commit_to_db.py, which handles one cluster per invocation,
+this daemon loads all the clusters from the configuration and ingests the
+jobs and nodes of each of them on its own interval (see the "jobs_poll_interval"
+and "nodes_poll_interval" fields of the clusters). The ingestions run in a
+bounded number of worker threads, sharing the same MongoDB client, so that a
+cluster which hangs does not prevent the other ones from being updated.
+
+The SSH connections and commands fail once their timeout is reached (see
+ssh_helper). As a last resort, an ingestion still running after --timeout
+seconds is abandoned: its thread is no longer counted as a worker, it is
+recorded as failed, and the task is scheduled again. As Python threads can
+not be killed, the abandoned thread keeps running until its blocking call
+returns, but its outcome is ignored. The high-water marks never go backward,
+thus a late commit of an abandoned run does not make a window be skipped.
+
+The outcome of the last ingestion of each cluster and entity is stored in the
+"ingest_status" collection of the database, for instance:
+    {
+        "cluster_name": "mila",
+        "entity": "jobs",
+        "last_start": 1700000000.0,
+        "last_end": 1700000012.5,
+        "last_duration": 12.5,
+        "last_success": 1700000012.5,
+        "last_error": None,
+        "nb_runs": 42,
+        "nb_failures": 0
+    }
+
+The jobs are retrieved from the end of the last window committed for the
+cluster, as stored in the "ingest_high_water_marks" collection.
+
+The durations of the stages and the counters of each ingestion are stored in
+the "ingest_runs" collection, and can be exported as Prometheus textfiles
+(see --metrics_textfile). The changes of state of the jobs are appended to
+the "job_events" collection, and the summary of each cluster is refreshed in
+the "cluster_stats" collection after each commit.
+
+Example:
+    python3 -m slurm_state.ingest_daemon --reports_folder /tmp/slurm_reports
+"""
+
+import argparse
+import concurrent.futures
+import logging
+import os
+import signal
+import threading
+import time
+
+from slurm_state.helpers.cluster_stats_helper import create_cluster_stats_indexes
+from slurm_state.helpers.clusters_helper import get_all_clusters
+from slurm_state.helpers.dump_file_helper import DUMP_COMPRESSIONS
+from slurm_state.helpers.ingest_metrics_helper import (
+    DEFAULT_INGEST_RUNS_TTL,
+    IngestMetricsExporter,
+    create_ingest_runs_indexes,
+)
+from slurm_state.helpers.jobs_indexes_helper import (
+    create_jobs_identifying_index,
+    create_jobs_sorting_indexes,
+)
+from slurm_state.helpers.job_events_helper import (
+    DEFAULT_JOB_EVENTS_TTL,
+    create_job_events_indexes,
+)
+from slurm_state.helpers.report_archive_helper import ReportArchive
+from slurm_state.helpers.ssh_helper import get_ssh_connection_pool
+from slurm_state.mongo_client import get_mongo_client
+from slurm_state.mongo_update import (
+    DEFAULT_BATCH_SIZE,
+    main_read_jobs_since_high_water_mark,
+    main_read_report_and_update_collection,
+)
+
+# Default number of ingestions running at the same time
+DEFAULT_MAX_WORKERS = 4
+# Default number of seconds after which a running ingestion is abandoned
+DEFAULT_TIMEOUT = 1800
+# Maximum number of seconds the scheduler sleeps between two checks
+MAX_SLEEP = 5
+
+
+class IngestTask:
+    """
+    Periodic ingestion of the jobs or nodes of a cluster.
+    """
+
+    def __init__(self, cluster_name, entity, interval):
+        """
+        Parameters:
+            cluster_name    Name of the cluster to ingest
+            entity          "jobs" or "nodes"
+            interval        Number of seconds between two runs of the ingestion
+        """
+        self.cluster_name = cluster_name
+        self.entity = entity
+        self.interval = interval
+        # Time (from the scheduler clock) at which the task should run next
+        self.next_run = 0
+        # Future of the current run, if any
+        self.future = None
+        # Time (from the scheduler clock) at which the current run started
+        self.started_at = 0
+        # Timestamp at which the current run started
+        self.start_timestamp = None
+        # Number of the current run. The outcome of a run is ignored if the run
+        # has been abandoned, that is if the task has been started again since
+        self.run_number = 0
+        # Number of runs abandoned because they exceeded the timeout
+        self.nb_abandoned_runs = 0
+
+
+def get_ingest_tasks(clusters, cluster_names=None):
+    """
+    List the ingestion tasks of the clusters.
+
+    Parameters:
+        clusters        Dictionary of the clusters, as returned by get_all_clusters
+        cluster_names   Names of the clusters to ingest. If None, all the clusters
+                        are ingested
+
+    Returns:
+        A list of IngestTask, one per cluster and entity
+    """
+    L_tasks = []
+    for (cluster_name, D_cluster) in clusters.items():
+        if cluster_names is not None and cluster_name not in cluster_names:
+            continue
+        for entity in ["jobs", "nodes"]:
+            L_tasks.append(
+                IngestTask(cluster_name, entity, D_cluster[f"{entity}_poll_interval"])
+            )
+    return L_tasks
+
+
+class IngestScheduler:
+    """
+    Run the ingestion tasks on their own interval, in a bounded number of threads.
+
+    A task is not run twice at the same time: if an ingestion is still running
+    when it is due again, it is run as soon as its current run ends, or as soon
+    as its current run is abandoned after timeout seconds.
+    """
+
+    def __init__(
+        self,
+        tasks,
+        ingest,
+        status_collection=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        timeout=DEFAULT_TIMEOUT,
+        clock=time.monotonic,
+    ):
+        """
+        Parameters:
+            tasks               List of the IngestTask to run
+            ingest              Function called as ingest(cluster_name, entity) to run an ingestion
+            status_collection   Collection in which the outcome of each ingestion is stored.
+                                If None, the outcomes are only logged
+            max_workers         Maximum number of ingestions running at the same time
+            timeout             Number of seconds after which a running ingestion is abandoned
+            clock               Function returning the current time, in seconds
+        """
+        self.tasks = tasks
+        self.ingest = ingest
+        self.status_collection = status_collection
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def tick(self):
+        """
+        Abandon the runs exceeding the timeout, then start the due tasks which
+        are not already running, as long as a worker is available.
+
+        Returns:
+            The number of seconds until the next task is due
+        """
+        now = self.clock()
+        for task in self.tasks:
+            if task.future is None:
+                continue
+            if task.future.done():
+                task.future = None
+            elif now - task.started_at > self.timeout:
+                self._abandon_run(task)
+
+        nb_running = sum(task.future is not None for task in self.tasks)
+        # The tasks which have been waiting the longest are started first
+        for task in sorted(self.tasks, key=lambda task: task.next_run):
+            if nb_running >= self.max_workers:
+                break
+            if task.future is None and task.next_run <= now:
+                task.started_at = now
+                task.start_timestamp = time.time()
+                task.next_run = now + task.interval
+                with self._lock:
+                    task.run_number += 1
+                    run_number = task.run_number
+                task.future = concurrent.futures.Future()
+                threading.Thread(
+                    target=self._run_task,
+                    args=(task, run_number, task.future),
+                    name=f"ingest-{task.cluster_name}-{task.entity}",
+                    # An abandoned run does not prevent the daemon from stopping
+                    daemon=True,
+                ).start()
+                nb_running += 1
+
+        return max(0, min(task.next_run for task in self.tasks) - self.clock())
+
+    def run(self, stop_event):
+        """
+        Run the tasks until stop_event is set, then wait for the running ones
+        (but not for the abandoned ones).
+        """
+        while not stop_event.is_set():
+            delay = self.tick()
+            stop_event.wait(min(delay, MAX_SLEEP))
+        self.wait()
+
+    def wait(self):
+        """
+        Wait for the runs in progress, without starting new ones.
+        """
+        for task in self.tasks:
+            if task.future is not None:
+                concurrent.futures.wait([task.future])
+
+    def _abandon_run(self, task):
+        """
+        Stop waiting for the current run of a task, which exceeded the timeout.
+        Its worker is released, and the run is recorded as failed.
+        """
+        with self._lock:
+            # The outcome of the abandoned run will be ignored
+            task.run_number += 1
+        task.future = None
+        task.nb_abandoned_runs += 1
+        error = f"TimeoutError: the ingestion did not end within {self.timeout} seconds"
+        logging.error(
+            f"Abandoned the ingestion of the {task.entity} of {task.cluster_name}, "
+            f"which did not end within {self.timeout} seconds."
+        )
+        self._store_status(task, task.start_timestamp, time.time(), error)
+
+    def _run_task(self, task, run_number, future):
+        """
+        Run an ingestion and store its outcome, unless the run has been abandoned.
+        The errors are logged, so that they do not stop the scheduling of the task.
+        """
+        start = time.time()
+        error = None
+        try:
+            self.ingest(task.cluster_name, task.entity)
+        except Exception as e:
+            logging.exception(
+                f"The ingestion of the {task.entity} of {task.cluster_name} failed."
+            )
+            error = f"{type(e).__name__}: {e}"
+        end = time.time()
+
+        with self._lock:
+            abandoned = task.run_number != run_number
+        if abandoned:
+            logging.warning(
+                f"The abandoned ingestion of the {task.entity} of {task.cluster_name} "
+                f"ended after {end - start:.1f} seconds, its outcome is ignored."
+            )
+        else:
+            logging.info(
+                f"Ingested the {task.entity} of {task.cluster_name} in {end - start:.1f} seconds"
+                + (f" (error: {error})." if error else ".")
+            )
+            self._store_status(task, start, end, error)
+        future.set_result(error)
+
+    def _store_status(self, task, start, end, error):
+        """
+        Store the outcome of a run, if a status collection has been provided.
+        """
+        if self.status_collection is not None:
+            try:
+                store_ingest_status(
+                    self.status_collection,
+                    task.cluster_name,
+                    task.entity,
+                    start,
+                    end,
+                    error,
+                )
+            except Exception:
+                logging.exception("Failed to store the ingestion status.")
+
+
+def store_ingest_status(status_collection, cluster_name, entity, start, end, error):
+    """
+    Store the outcome of an ingestion in the database.
+
+    Parameters:
+        status_collection   Collection of the ingestion statuses
+        cluster_name        Name of the ingested cluster
+        entity              "jobs" or "nodes"
+        start               Timestamp of the beginning of the ingestion
+        end                 Timestamp of the end of the ingestion
+        error               Description of the error which stopped the ingestion, or None
+    """
+    D_set = {
+        "last_start": start,
+        "last_end": end,
+        "last_duration": end - start,
+        "last_error": error,
+    }
+    if error is None:
+        D_set["last_success"] = end
+    status_collection.update_one(
+        {"cluster_name": cluster_name, "entity": entity},
+        {"$set": D_set, "$inc": {"nb_runs": 1, "nb_failures": int(error is not None)}},
+        upsert=True,
+    )
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Periodically ingest the jobs and nodes of all the clusters into the database.",
+    )
+    parser.add_argument(
+        "--reports_folder",
+        required=True,
+        help="Folder in which the Slurm reports are written, in a subfolder per cluster.",
+    )
+    parser.add_argument(
+        "--clusters",
+        nargs="+",
+        help="Names of the clusters to ingest. By default, all the configured clusters are ingested.",
+    )
+    parser.add_argument(
+        "--mongodb_collection", default="clockwork", help="Collection to populate."
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of ingestions running at the same time.",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=DEFAULT_TIMEOUT,
+        help="Number of seconds after which a running ingestion is abandoned, recorded as failed "
+        "and scheduled again. The SSH commands themselves fail after the report_timeout of the cluster.",
+    )
+    parser.add_argument(
+        "--unchanged_jobs",
+        choices=["touch", "skip"],
+        default="touch",
+        help="How to handle the jobs whose Slurm data did not change since the last update.",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of jobs or nodes read from the report, compared to the database and written at once.",
+    )
+    parser.add_argument(
+        "--report_archive_folder",
+        help="If provided, each retrieved sacct or sinfo report is kept in this folder, compressed and partitioned "
+        "by cluster, entity and day, so that it can be replayed by slurm_state/replay_reports.py.",
+    )
+    parser.add_argument(
+        "--report_archive_compression",
+        choices=DUMP_COMPRESSIONS,
+        default="gzip",
+        help="Compression of the archived reports.",
+    )
+    parser.add_argument(
+        "--metrics_textfile",
+        help="If provided, the durations of the stages and the counters of the last ingestion "
+        "of each cluster and entity are written in the Prometheus text format, in a file named "
+        "from this path and suffixed by the cluster name and the entity "
+        "(for instance clockwork_ingest.mila.jobs.prom for clockwork_ingest.prom).",
+    )
+    parser.add_argument(
+        "--job_events_ttl",
+        type=int,
+        default=DEFAULT_JOB_EVENTS_TTL,
+        help="Number of seconds during which the changes of state of the jobs are kept in the job_events collection.",
+    )
+    parser.add_argument(
+        "--ingest_runs_ttl",
+        type=int,
+        default=DEFAULT_INGEST_RUNS_TTL,
+        help="Number of seconds during which the measures of the ingestions are kept in the ingest_runs collection.",
+    )
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(threadName)s %(message)s"
+    )
+
+    L_tasks = get_ingest_tasks(get_all_clusters(), args.clusters)
+    assert L_tasks, "No cluster to ingest."
+
+    # The client is shared by all the ingestions
+    db = get_mongo_client()[args.mongodb_collection]
+    create_jobs_identifying_index(db["jobs"])
+    create_jobs_sorting_indexes(db["jobs"])
+    db["nodes"].create_index(
+        [("slurm.name", 1), ("slurm.cluster_name", 1)],
+        name="name_and_cluster_name",
+    )
+    db["nodes"].create_index(
+        [("slurm.cluster_name", 1), ("cw.resources.gpu_free", 1)],
+        name="cluster_name_and_gpu_free",
+    )
+    db["nodes"].create_index(
+        [("slurm.cluster_name", 1), ("cw.resources.cpu_free", 1)],
+        name="cluster_name_and_cpu_free",
+    )
+    db["ingest_status"].create_index(
+        [("cluster_name", 1), ("entity", 1)],
+        name="cluster_name_and_entity",
+        unique=True,
+    )
+    create_job_events_indexes(db["job_events"], ttl=args.job_events_ttl)
+    create_cluster_stats_indexes(db["cluster_stats"], db["jobs"])
+    create_ingest_runs_indexes(db["ingest_runs"], ttl=args.ingest_runs_ttl)
+    db["ingest_high_water_marks"].create_index(
+        [("cluster_name", 1)], name="cluster_name", unique=True
+    )
+
+    report_archive = (
+        ReportArchive(
+            args.report_archive_folder, compression=args.report_archive_compression
+        )
+        if args.report_archive_folder
+        else None
+    )
+
+    # The measures of each ingestion are stored in the "ingest_runs" collection
+    metrics_exporter = IngestMetricsExporter(
+        textfile_path=args.metrics_textfile,
+        ingest_runs_collection=db["ingest_runs"],
+    )
+
+    def ingest(cluster_name, entity):
+        report_file_path = os.path.join(
+            args.reports_folder, cluster_name, f"slurm_{entity}.json"
+        )
+        with metrics_exporter.measure(cluster_name, entity) as stats:
+            if entity == "jobs":
+                # The jobs are retrieved from the end of the last committed window
+                main_read_jobs_since_high_water_mark(
+                    db["jobs"],
+                    db["users"],
+                    db["ingest_high_water_marks"],
+                    cluster_name,
+                    report_file_path,
+                    unchanged_jobs=args.unchanged_jobs,
+                    batch_size=args.batch_size,
+                    report_archive=report_archive,
+                    job_events_collection=db["job_events"],
+                    cluster_stats_collection=db["cluster_stats"],
+                    stats=stats,
+                )
+            else:
+                main_read_report_and_update_collection(
+                    entity,
+                    db[entity],
+                    None,
+                    cluster_name,
+                    report_file_path,
+                    batch_size=args.batch_size,
+                    report_archive=report_archive,
+                    cluster_stats_collection=db["cluster_stats"],
+                    stats=stats,
+                )
+
+    scheduler = IngestScheduler(
+        L_tasks,
+        ingest,
+        status_collection=db["ingest_status"],
+        max_workers=args.max_workers,
+        timeout=args.timeout,
+    )
+
+    # Stop cleanly on SIGINT and SIGTERM
+    stop_event = threading.Event()
+    for signum in [signal.SIGINT, signal.SIGTERM]:
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    logging.info(
+        f"Ingesting {len(L_tasks)} tasks with {args.max_workers} workers: "
+        + ", ".join(
+            f"{task.cluster_name}/{task.entity} every {task.interval}s"
+            for task in L_tasks
+        )
+    )
+    scheduler.run(stop_event)
+    get_ssh_connection_pool().close_all()
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(sys.argv)
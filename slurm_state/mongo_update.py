@@ -2,29 +2,75 @@
 Insert elements extracted from the Slurm reports into the database.
 """
 
-import copy, json, logging, os, time
-from pymongo import InsertOne, ReplaceOne, UpdateOne
+import contextlib, copy, hashlib, itertools, json, logging, os, time
+from pymongo import InsertOne, UpdateMany, UpdateOne
 
 
+from slurm_state.helpers.bulk_write_helper import (
+    BulkWriter,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_WORKERS,
+)
 from slurm_state.helpers.gpu_helper import get_cw_gres_description
 from slurm_state.helpers.clusters_helper import get_all_clusters
+from slurm_state.helpers.cluster_stats_helper import (
+    count_job_events,
+    update_cluster_stats,
+    update_jobs_stats_from_events,
+)
+from slurm_state.helpers.dump_file_helper import (
+    get_dump_file_compression,
+    get_dump_writer,
+    open_dump_file,
+)
+from slurm_state.helpers.high_water_mark_helper import (
+    DEFAULT_SACCT_MAX_WINDOW,
+    DEFAULT_SACCT_OVERLAP,
+    compute_sacct_windows,
+    get_high_water_mark,
+    set_high_water_mark,
+)
+from slurm_state.helpers.ingest_stats_helper import IngestStats
+from slurm_state.helpers.job_events_helper import get_job_event, stamp_job_events
+from slurm_state.helpers.json_stream_helper import read_json_object_value
+from slurm_state.helpers.tres_helper import get_cw_resources
+from slurm_state.helpers.user_accounts_helper import get_user_account_cache
 
 # Import parser classes
 from slurm_state.parsers.job_parser import JobParser
 from slurm_state.parsers.node_parser import NodeParser
 
 
-def pprint_bulk_result(result):
-    if "upserted" in result.bulk_api_result:
-        # too long and not necessary
-        del result.bulk_api_result["upserted"]
-    print(result.bulk_api_result)
+# Default number of jobs or nodes processed at once by the ingestion pipeline
+DEFAULT_BATCH_SIZE = 2000
+# Default number of times a batch of jobs is written again after conflicting
+# with another ingestion
+DEFAULT_MAX_CONFLICT_RETRIES = 3
 
 
-def fetch_slurm_report(parser, report_path):
+def get_slurm_digest(slurm_entity: dict):
+    """
+    Compute a stable digest of the "slurm" component of a job or a node.
+
+    Two entities presenting the same Slurm data have the same digest, whatever
+    the order of their keys. It is stored in the "cw" component, so that the
+    unchanged entities can be identified without comparing the whole documents.
+    """
+    serialized_entity = json.dumps(slurm_entity, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(serialized_entity.encode("utf-8")).hexdigest()
+
+
+def fetch_slurm_report(parser, report_path, raise_parse_errors=False):
     """
     Yields elements ready to be slotted into the "slurm" field,
     but they have to be processed further before committing to MongoDB.
+
+    The report may be compressed with gzip or zstd (as the archived reports are).
+
+    As the report is parsed while it is read, a truncated or malformed report
+    stops the iteration after its last valid element. If raise_parse_errors is
+    True, the parse error is raised instead of being logged, so that the caller
+    does not consider the report as complete.
     """
     # Retrieve the cluster name
     cluster_name = parser.cluster["name"]
@@ -34,15 +80,42 @@ def fetch_slurm_report(parser, report_path):
     ctx = get_all_clusters().get(cluster_name, None)
     assert ctx is not None, f"{cluster_name} not configured"
 
-    with open(report_path, "r") as f:
+    with open_dump_file(
+        report_path, "r", compression=get_dump_file_compression(report_path)
+    ) as f:
         try:
             for e in parser.parser(f):
                 e["cluster_name"] = cluster_name
                 yield e
         except Exception as e:
+            if raise_parse_errors:
+                raise
             logging.warning(str(e))
 
 
+def get_report_slurm_version(report_path):
+    """
+    Retrieve the Slurm release which produced a report, from the "meta" object
+    placed at its beginning. Only the beginning of the report is read.
+
+    The report may be compressed with gzip or zstd (as the archived reports are).
+
+    Returns:
+        The release (such as "23.02.6"), or None if the report does not present it
+    """
+    with open_dump_file(
+        report_path, "r", compression=get_dump_file_compression(report_path)
+    ) as f:
+        try:
+            D_meta = read_json_object_value(f, "meta")
+        except (KeyError, ValueError):
+            return None
+    try:
+        return D_meta["Slurm"]["release"]
+    except (KeyError, TypeError):
+        return None
+
+
 def slurm_job_to_clockwork_job(slurm_job: dict):
     """
     Takes the components returned from the slurm reports,
@@ -66,7 +139,8 @@ def slurm_node_to_clockwork_node(slurm_node: dict):
     but without the "user" field and without a need
     to infer user accounts (because nodes don't belong
     to specific users).
-    We still add the "cw" field for our own uses.
+    We still add the "cw" field for our own uses: the GPU
+    description and the numeric resources of the node.
     """
 
     # If GPU information are available on the node
@@ -89,28 +163,57 @@ def slurm_node_to_clockwork_node(slurm_node: dict):
             "cw": {"gpu": {}},
         }
 
+    clockwork_node["cw"]["resources"] = get_cw_resources(slurm_node)
+
     return clockwork_node
 
 
-def lookup_user_account(users_collection):
+def resolve_user_accounts(LD_clockwork_jobs, users_collection, cache=None):
     """
-    Mutates the argument in order to fill in the
-    field for "cw" pertaining to the user account.
-    Returns the mutated value to facilitate a `map` call.
+    Mutates the jobs in order to fill in the field for "cw"
+    pertaining to the user account.
+
+    The distinct usernames of the jobs are resolved all at once, with at most one
+    query per account field (see UserAccountCache.resolve), instead of one query per job.
+
+    Parameters:
+        LD_clockwork_jobs   List of the Clockwork jobs to update
+        users_collection    Collection of the users in the database
+        cache               UserAccountCache used to resolve the usernames. Default is
+                            the cache shared by the whole process
+
+    Returns:
+        The number of queries sent to the database
     """
+    if cache is None:
+        cache = get_user_account_cache()
+    clusters = get_all_clusters()
 
-    def _lookup_user_account(clockwork_job: dict[dict]):
-        cluster_name = clockwork_job["slurm"]["cluster_name"]
-        cluster_username = clockwork_job["slurm"]["username"]
+    # Group the usernames by account field, as the clusters do not
+    # all store their usernames in the same field of the users
+    DS_usernames_by_account_field = {}
+    for D_job in LD_clockwork_jobs:
+        account_field = clusters[D_job["slurm"]["cluster_name"]]["account_field"]
+        DS_usernames_by_account_field.setdefault(account_field, set()).add(
+            D_job["slurm"]["username"]
+        )
 
-        account_field = get_all_clusters()[cluster_name]["account_field"]
-        result = users_collection.find_one({account_field: cluster_username})
-        if result is not None:
-            clockwork_job["cw"]["mila_email_username"] = result["mila_email_username"]
+    DD_resolved = {}
+    nb_queries = 0
+    for (account_field, S_usernames) in DS_usernames_by_account_field.items():
+        (D_resolved, nb_account_field_queries) = cache.resolve_and_count_queries(
+            users_collection, account_field, S_usernames
+        )
+        DD_resolved[account_field] = D_resolved
+        nb_queries += nb_account_field_queries
 
-        return clockwork_job
+    for D_job in LD_clockwork_jobs:
+        account_field = clusters[D_job["slurm"]["cluster_name"]]["account_field"]
+        mila_email_username = DD_resolved[account_field][D_job["slurm"]["username"]]
+        if mila_email_username is not None:
+            D_job["cw"]["mila_email_username"] = mila_email_username
 
-    return _lookup_user_account
+    return nb_queries
 
 
 def main_read_report_and_update_collection(
@@ -122,6 +225,21 @@ def main_read_report_and_update_collection(
     from_file=False,
     want_commit_to_db=True,
     dump_file="",
+    dump_format="json",
+    dump_compression="none",
+    dump_writer=None,
+    unchanged_jobs="touch",
+    batch_size=DEFAULT_BATCH_SIZE,
+    write_chunk_size=DEFAULT_CHUNK_SIZE,
+    write_workers=DEFAULT_MAX_WORKERS,
+    report_archive=None,
+    job_events_collection=None,
+    cluster_stats_collection=None,
+    source_timestamp=None,
+    max_conflict_retries=DEFAULT_MAX_CONFLICT_RETRIES,
+    raise_parse_errors=False,
+    slurm_version=None,
+    stats=None,
 ):
     """
     Create a Clockwork jobs or nodes list from a sacct report file and store it into
@@ -138,6 +256,39 @@ def main_read_report_and_update_collection(
                             is report_file_path. If False, the file is generated at the report_file_path path.
         want_commit_to_db   Boolean indicating whether or not the jobs or nodes are stored in the database. Default is True
         dump_file           String containing the path to the file in which we want to dump the data. Default is "", which means nothing is stored in an output file
+        dump_format         "json" (default) to dump the data as an indented JSON list, or "jsonl" to dump one element per line
+        dump_compression    "none" (default), "gzip" or "zstd": how the dump file is compressed. Only available for the "jsonl" format
+        dump_writer         Dump writer already opened through get_dump_writer, to which the data is written instead of dump_file.
+                            Default is None
+        unchanged_jobs      String defining how the jobs whose Slurm data did not change since the last update are handled. It could be
+                            "touch" (default), to only update their "last_slurm_update" timestamps, or "skip", to leave them untouched
+        batch_size          Number of jobs or nodes read from the report, compared to the database and written at once. Default is 2000
+        write_chunk_size    Maximum number of database operations sent in a single unordered bulk_write. Default is 500
+        write_workers       Number of chunks of database operations sent concurrently. Default is 4
+        report_archive      ReportArchive in which the generated report is stored. Default is None, which means
+                            the report is not archived
+        job_events_collection   Collection in which the changes of state of the jobs are appended (see
+                            job_events_helper). Default is None, which means the events are not stored
+        cluster_stats_collection    Collection in which the summary of the jobs or nodes of the cluster is refreshed
+                            once they are committed (see cluster_stats_helper). Default is None, which means
+                            the summary is not refreshed
+        source_timestamp    Time at which the report has been retrieved from the cluster, stored in the jobs
+                            to order the writes of concurrent ingestions (see get_jobs_updates_and_insertions).
+                            Default is None, which means the beginning of this ingestion if the report is
+                            generated, or the modification time of the existing report file otherwise
+        max_conflict_retries    Number of times a batch of jobs whose writes conflicted with another
+                            ingestion is compared again to the database and written. The conflicts
+                            remaining after these retries are dropped. Default is 3
+        raise_parse_errors  Boolean indicating whether an error raised while parsing the report is raised
+                            (True) or only logged (False). Default is False
+        slurm_version       Version of Slurm used to parse the report. Default is None, which means the
+                            version configured for the cluster, or the version retrieved from the cluster
+                            through SSH if none is configured
+        stats               IngestStats in which the time spent in each stage of the ingestion is added.
+                            Default is None, which means a new IngestStats is used
+
+    Returns:
+        The IngestStats of the ingestion
     """
     # Initialize the time of this operation's beginning
     timestamp_start = time.time()
@@ -148,13 +299,18 @@ def main_read_report_and_update_collection(
 
     # Check the input parameters
     assert entity in ["jobs", "nodes"]
+    assert unchanged_jobs in ["touch", "skip"]
+    assert batch_size > 0
+
+    if stats is None:
+        stats = IngestStats()
 
     if entity == "jobs":
         id_key = (
             "job_id"  # The id_key is used to determine how to retrieve the ID of a job
         )
         parser = JobParser(
-            cluster_name
+            cluster_name, slurm_version=slurm_version
         )  # This parser is used to retrieve and format useful information from a sacct job
         from_slurm_to_clockwork = slurm_job_to_clockwork_job  # This function is used to translate a Slurm job (created through the parser) to a Clockwork job
     elif entity == "nodes":
@@ -162,7 +318,7 @@ def main_read_report_and_update_collection(
             "name"  # The id_key is used to determine how to retrieve the ID of a node
         )
         parser = NodeParser(
-            cluster_name
+            cluster_name, slurm_version=slurm_version
         )  # This parser is used to retrieve and format useful information from a sacct node
         from_slurm_to_clockwork = slurm_node_to_clockwork_node  # This function is used to translate a Slurm node (created through the parser) to a Clockwork node
     else:
@@ -174,127 +330,542 @@ def main_read_report_and_update_collection(
     ## Retrieve entities ##
 
     # Generate a report file if required
-    if not from_file or not os.path.exists(report_file_path):
+    want_report_generation = not from_file or not os.path.exists(report_file_path)
+    if source_timestamp is None:
+        if want_report_generation:
+            # A report generated now describes the jobs at least as recently as this time
+            source_timestamp = timestamp_start
+        else:
+            # An existing report describes the jobs as they were when it has been
+            # written: an old report must not overwrite more recent data
+            source_timestamp = os.path.getmtime(report_file_path)
+    if want_report_generation:
         print(
             f"Generate report file for the {cluster_name} cluster at location {report_file_path}."
         )
-        parser.generate_report(report_file_path)
+        with stats.stage("fetch"):
+            parser.generate_report(report_file_path)
+        if parser.transfer_stats is not None:
+            stats.count("bytes_received", parser.transfer_stats["bytes_received"])
+        if report_archive is not None:
+            with stats.stage("archive"):
+                report_archive.store(
+                    report_file_path,
+                    cluster_name,
+                    entity,
+                    timestamp=source_timestamp,
+                )
 
-    # Construct an iterator over the list of entities in the report file,
-    # each one of them is turned into a clockwork job or node, according to applicability
-    I_clockwork_entities_from_report = map(
-        from_slurm_to_clockwork,
-        fetch_slurm_report(parser, report_file_path),
+    # The entities of the report are processed by batches: each batch is converted,
+    # associated to its users (for the jobs), compared to the database, written to the
+    # database and to the dump file before the next one is read. Thus, the memory used
+    # does not depend on the size of the report.
+    I_slurm_entities_from_report = fetch_slurm_report(
+        parser, report_file_path, raise_parse_errors=raise_parse_errors
     )
+    stats.count("report_bytes", os.path.getsize(report_file_path))
 
-    L_updates_to_do = []  # Entity updates to store in the database if requested
-    L_users_updates = []  # Users updates to store in the database if requested
-    L_data_for_dump_file = []  # Data to store in the dump file if requested
-
+    nb_entities = 0  # Number of entities read from the report
+    D_summary = {"inserted": 0, "changed": 0, "untouched": 0}
     if entity == "jobs":
-        (
-            L_updates_to_do,
-            L_users_updates,
-            L_data_for_dump_file,
-        ) = get_jobs_updates_and_insertions(
-            I_clockwork_entities_from_report, cluster_name, collection, users_collection
+        D_summary["stale"] = 0
+    # Changes of the summary of the jobs of the cluster (see cluster_stats_helper)
+    D_jobs_stats_delta = {}
+    latest_job_update = None
+
+    # The operations of a batch are sent by chunks, concurrently and unordered,
+    # as they all target distinct documents
+    writer = BulkWriter(
+        collection, chunk_size=write_chunk_size, max_workers=write_workers
+    )
+    users_writer = BulkWriter(
+        users_collection, chunk_size=write_chunk_size, max_workers=write_workers
+    )
+    job_events_writer = BulkWriter(
+        job_events_collection, chunk_size=write_chunk_size, max_workers=write_workers
+    )
+
+    # Open the dump file, if requested
+    with (
+        get_dump_writer(
+            dump_file, dump_format=dump_format, compression=dump_compression
         )
-    elif entity == "nodes":
-        (L_updates_to_do, L_data_for_dump_file) = get_nodes_updates(
-            I_clockwork_entities_from_report
+        if dump_file and dump_writer is None
+        else contextlib.nullcontext(dump_writer)
+    ) as dump_writer:
+        I_batches = iter_batches(I_slurm_entities_from_report, batch_size)
+        while True:
+            # The report is read (and its entities translated) lazily
+            with stats.stage("parse"):
+                L_slurm_entities = next(I_batches, None)
+            if L_slurm_entities is None:
+                break
+            nb_entities += len(L_slurm_entities)
+
+            # Each entity is turned into a clockwork job or node, according to applicability
+            with stats.stage("convert"):
+                LD_clockwork_entities = [
+                    from_slurm_to_clockwork(D_slurm_entity)
+                    for D_slurm_entity in L_slurm_entities
+                ]
+
+            # The jobs are associated to their Mila users
+            if entity == "jobs":
+                with stats.stage("resolve_users"):
+                    stats.count(
+                        "mongo_round_trips",
+                        resolve_user_accounts(LD_clockwork_entities, users_collection),
+                    )
+
+            L_users_updates = []  # Users updates to store in the database if requested
+            L_job_events = []  # Changes of state of the jobs
+            for nb_attempts in itertools.count(1):
+                with stats.stage("diff"):
+                    if entity == "jobs":
+                        (
+                            L_updates_to_do,
+                            L_users_updates,
+                            L_data_for_dump_file,
+                            D_batch_summary,
+                            L_attempt_job_events,
+                        ) = get_jobs_updates_and_insertions(
+                            LD_clockwork_entities,
+                            cluster_name,
+                            collection,
+                            users_collection,
+                            unchanged_jobs=unchanged_jobs,
+                            resolve_users=False,
+                            source_timestamp=source_timestamp,
+                            stats=stats,
+                        )
+                    elif entity == "nodes":
+                        (
+                            L_updates_to_do,
+                            L_data_for_dump_file,
+                            D_batch_summary,
+                        ) = get_nodes_updates(
+                            LD_clockwork_entities,
+                            cluster_name,
+                            collection,
+                            stats=stats,
+                        )
+                        L_attempt_job_events = []
+                    # The retries of a batch are not counted again
+                    if nb_attempts == 1:
+                        for k in D_summary:
+                            D_summary[k] += D_batch_summary[k]
+
+                # Commit new elements and changes to the database, if requested
+                if not want_commit_to_db:
+                    L_job_events += L_attempt_job_events
+                    break
+                with stats.stage("write"):
+                    D_counts_before = dict(writer.counts)
+                    # Store the jobs or nodes
+                    if L_updates_to_do:
+                        assert collection is not None
+                        writer.write(L_updates_to_do)
+
+                    # Update the users associating their account
+                    # (these operations should never create new users)
+                    if L_users_updates:
+                        users_writer.write(L_users_updates)
+
+                if entity != "jobs":
+                    break
+                nb_conflicts = count_job_write_conflicts(
+                    D_batch_summary, unchanged_jobs, D_counts_before, writer.counts
+                )
+                if not nb_conflicts:
+                    L_job_events += L_attempt_job_events
+                    break
+
+                # Some jobs have been written meanwhile by another ingestion. The events
+                # of the jobs written by this attempt are kept, then the batch is compared
+                # again to the database: the jobs stored from newer reports are now stale,
+                # and the other ones are written again.
+                stats.count("job_conflicts", nb_conflicts)
+                with stats.stage("diff"):
+                    L_job_events += filter_applied_job_events(
+                        L_attempt_job_events,
+                        LD_clockwork_entities,
+                        cluster_name,
+                        collection,
+                        stats=stats,
+                    )
+                if nb_attempts > max_conflict_retries:
+                    logging.warning(
+                        f"Dropped {nb_conflicts} conflicting writes of the jobs of {cluster_name} "
+                        f"after {nb_attempts} attempts."
+                    )
+                    stats.count("job_conflicts_dropped", nb_conflicts)
+                    break
+
+            # The changes of the summary of the cluster follow the written jobs
+            if entity == "jobs":
+                count_job_events(L_job_events, D_jobs_stats_delta)
+                for D_job in L_data_for_dump_file:
+                    job_update = D_job["cw"].get("last_slurm_update")
+                    if job_update is not None and (
+                        latest_job_update is None or job_update > latest_job_update
+                    ):
+                        latest_job_update = job_update
+
+            # Append the changes of state of the jobs, once the jobs are stored
+            if L_job_events and want_commit_to_db and job_events_collection is not None:
+                with stats.stage("write"):
+                    stamp_job_events(L_job_events)
+                    job_events_writer.write(
+                        [InsertOne(D_event) for D_event in L_job_events]
+                    )
+                stats.count("job_events", len(L_job_events))
+
+            # Dump the JSON data in the given output file, if requested
+            if dump_writer is not None:
+                with stats.stage("dump"):
+                    dump_writer.write_all(L_data_for_dump_file)
+
+    # Refresh the summary of the cluster, once all its jobs or nodes are committed
+    if want_commit_to_db and nb_entities and cluster_stats_collection is not None:
+        with stats.stage("cluster_stats"):
+            if entity == "jobs":
+                update_jobs_stats_from_events(
+                    cluster_stats_collection,
+                    collection,
+                    cluster_name,
+                    D_jobs_stats_delta,
+                    latest_job_update,
+                    stats=stats,
+                )
+            else:
+                update_cluster_stats(
+                    cluster_stats_collection, entity, collection, cluster_name
+                )
+                # One aggregation and one update
+                stats.count("mongo_round_trips", 2)
+
+    stats.count(entity, nb_entities)
+    stats.count("operations", writer.nb_operations)
+    for bulk_writer in [writer, users_writer, job_events_writer]:
+        stats.count(
+            "mongo_round_trips",
+            len(bulk_writer.chunk_latencies) + bulk_writer.nb_retries,
+        )
+    for (k, v) in D_summary.items():
+        stats.count(f"{entity}_{k}", v)
+
+    print(
+        f"{entity}: {D_summary['inserted']} inserted, {D_summary['changed']} changed "
+        f"and {D_summary['untouched']} untouched"
+        + (f" (unchanged_jobs={unchanged_jobs})." if entity == "jobs" else ".")
+    )
+    if nb_entities:
+        print(
+            f"{entity}: {100 * (D_summary['inserted'] + D_summary['changed']) / nb_entities:.1f}% "
+            f"of the {nb_entities} {entity} of the report have been written."
+        )
+
+    if entity == "jobs":
+        D_cache_stats = get_user_account_cache().get_stats()
+        print(
+            f"users: {D_cache_stats['hits']} usernames resolved from the cache and "
+            f"{D_cache_stats['misses']} from the database ({D_cache_stats['queries']} queries) since the process started."
         )
 
-    # Commit new elements and changes to the database, if requested
     if want_commit_to_db:
-        # Store the jobs or nodes
-        if L_updates_to_do:
-            assert collection is not None
-            print(f"{entity}: collection.bulk_write(L_updates_to_do)")
-            result = collection.bulk_write(L_updates_to_do)
-            pprint_bulk_result(result)
-        else:
+        if not nb_entities:
             print(
                 f"Empty list found for updates to {entity} collection."
                 "This is unexpected and might be the sign of a problem."
             )
+        else:
+            print(writer.get_summary())
+            if users_writer.nb_operations:
+                print(users_writer.get_summary())
 
-        # Update the users associating their account
-        if L_users_updates:
-            print("users_collection.bulk_write(L_user_updates, upsert=False)")
-            result = users_collection.bulk_write(
-                L_users_updates,
-                upsert=False,  # this should never create new users.
-            )
-            pprint_bulk_result(result)
-
-        # Display the time taken for this import
-        mongo_update_duration = time.time() - timestamp_start
-        print(
-            f"Bulk write for {len(L_updates_to_do)} {entity} entries in mongodb took {mongo_update_duration} seconds."
+    # Display the time taken by each stage of this import
+    print(
+        f"Ingestion of the {entity} of {cluster_name} took {time.time() - timestamp_start:.3f} seconds: "
+        + ", ".join(
+            f"{stage} {duration:.3f}s"
+            for (stage, duration) in stats.stage_durations.items()
         )
+        + "."
+    )
 
-    # Dump the JSON data in a given output file, if requested
     if dump_file:
-        with open(dump_file, "w") as f:
-            json.dump(L_data_for_dump_file, f, indent=4)
         print(f"Wrote {entity} to dump_file {dump_file}.")
 
+    return stats
+
+
+def main_read_jobs_since_high_water_mark(
+    jobs_collection,
+    users_collection,
+    high_water_marks_collection,
+    cluster_name,
+    report_file_path,
+    sacct_overlap=DEFAULT_SACCT_OVERLAP,
+    sacct_max_window=DEFAULT_SACCT_MAX_WINDOW,
+    now=None,
+    want_commit_to_db=True,
+    report_archive=None,
+    dump_file="",
+    dump_format="json",
+    dump_compression="none",
+    stats=None,
+    **kwargs,
+):
+    """
+    Retrieve the jobs of a cluster from the end of the last committed window
+    (its high-water mark) until now, and store them as main_read_report_and_update_collection
+    would do.
+
+    The time elapsed since the high-water mark is split into windows of at most
+    sacct_max_window seconds. For each window, a sacct report is generated, then
+    committed, then the high-water mark is moved to the end of the window. Thus,
+    a late or skipped run does not lose the jobs transitions, and the sacct calls
+    cover the actual activity instead of a fixed window. If a report can not be
+    parsed entirely, the error is raised and the high-water mark is not moved, so
+    that the window is retrieved again by the next run.
+
+    Parameters:
+        jobs_collection                 Collection of the jobs in the database
+        users_collection                Collection of the users in the database
+        high_water_marks_collection     Collection storing the high-water mark of each cluster
+        cluster_name                    Name of the cluster we are working on
+        report_file_path                Path of the report generated for each window
+        sacct_overlap                   Number of seconds by which the first window overlaps the high-water mark
+        sacct_max_window                Maximum number of seconds covered by a single sacct call
+        now                             Timestamp of the end of the last window. Default is the current time
+        want_commit_to_db               Boolean indicating whether or not the jobs are stored in the database.
+                                        If False, the high-water mark is not moved. Default is True
+        report_archive                  ReportArchive in which the report of each window is stored. Default is None
+        dump_file                       Path to the file in which the jobs of all the windows are dumped. Default is "",
+                                        which means nothing is stored in an output file
+        dump_format                     "json" (default) or "jsonl", as for main_read_report_and_update_collection
+        dump_compression                "none" (default), "gzip" or "zstd", as for main_read_report_and_update_collection
+        stats                           IngestStats in which the time spent in each stage is added
+        **kwargs                        Other parameters of main_read_report_and_update_collection
+
+    Returns:
+        The IngestStats of the ingestion
+    """
+    if stats is None:
+        stats = IngestStats()
+    if now is None:
+        now = time.time()
+
+    L_windows = compute_sacct_windows(
+        get_high_water_mark(high_water_marks_collection, cluster_name),
+        now,
+        overlap=sacct_overlap,
+        max_window=sacct_max_window,
+    )
+    print(
+        f"Retrieving the jobs of {cluster_name} through {len(L_windows)} sacct windows."
+    )
+
+    parser = JobParser(cluster_name)
+    # The dump file is shared by all the windows
+    with (
+        get_dump_writer(
+            dump_file, dump_format=dump_format, compression=dump_compression
+        )
+        if dump_file
+        else contextlib.nullcontext()
+    ) as dump_writer:
+        for (start_time, end_time) in L_windows:
+            # The report describes the jobs at least as recently as this time
+            source_timestamp = time.time()
+            with stats.stage("fetch"):
+                parser.generate_report(
+                    report_file_path, start_time=start_time, end_time=end_time
+                )
+            if parser.transfer_stats is not None:
+                stats.count("bytes_received", parser.transfer_stats["bytes_received"])
+            if report_archive is not None:
+                with stats.stage("archive"):
+                    # The report is archived under the timestamp its jobs are stored with,
+                    # so that a replay orders the writes as this ingestion did
+                    report_archive.store(
+                        report_file_path,
+                        cluster_name,
+                        "jobs",
+                        timestamp=source_timestamp,
+                    )
+            main_read_report_and_update_collection(
+                "jobs",
+                jobs_collection,
+                users_collection,
+                cluster_name,
+                report_file_path,
+                from_file=True,
+                want_commit_to_db=want_commit_to_db,
+                source_timestamp=source_timestamp,
+                raise_parse_errors=True,
+                dump_writer=dump_writer,
+                stats=stats,
+                **kwargs,
+            )
+            # The window has been committed
+            if want_commit_to_db:
+                set_high_water_mark(high_water_marks_collection, cluster_name, end_time)
+            stats.count("sacct_windows")
+
+    if dump_file:
+        print(f"Wrote jobs to dump_file {dump_file}.")
+
+    return stats
+
+
+def iter_batches(iterable, batch_size):
+    """
+    Yield lists of at most batch_size consecutive elements of an iterable.
+    """
+    iterator = iter(iterable)
+    while L_batch := list(itertools.islice(iterator, batch_size)):
+        yield L_batch
+
+
+def find_stored_jobs(
+    jobs_collection, cluster_name, job_ids, batch_size=1000, stats=None
+):
+    """
+    Retrieve the jobs of a cluster already stored in the database, among the given job IDs.
+
+    The jobs are retrieved through batched "$in" queries using the "job_id_and_cluster_name"
+    index, and only the fields required to match and update them are projected. Thus,
+    the cost of this lookup depends on the number of jobs in the report instead of
+    the number of jobs in the collection.
+
+    Parameters:
+        jobs_collection     Collection of the jobs in the database
+        cluster_name        Name of the cluster on which we are working
+        job_ids             Iterable over the IDs of the jobs to retrieve
+        batch_size          Maximum number of job IDs per query
+        stats               IngestStats counting the queries as "mongo_round_trips". Default is None
+
+    Returns:
+        A dictionary associating the IDs of the stored jobs to their projected documents
+    """
+    L_job_ids = list(job_ids)
+    DD_stored_jobs = {}
+    for i in range(0, len(L_job_ids), batch_size):
+        for D_job in jobs_collection.find(
+            {
+                "slurm.job_id": {"$in": L_job_ids[i : i + batch_size]},
+                "slurm.cluster_name": cluster_name,
+            },
+            STORED_JOB_PROJECTION,
+        ):
+            DD_stored_jobs[D_job["slurm"]["job_id"]] = D_job
+        if stats is not None:
+            stats.count("mongo_round_trips")
+    return DD_stored_jobs
+
+
+# Fields of the stored jobs required to compute their updates
+STORED_JOB_PROJECTION = {
+    "_id": 1,
+    "slurm.job_id": 1,
+    "slurm.job_state": 1,
+    "cw.slurm_digest": 1,
+    "cw.source_timestamp": 1,
+    "cw.mila_email_username": 1,
+    "user": 1,
+}
+
 
 def get_jobs_updates_and_insertions(
-    I_clockwork_jobs, cluster_name, jobs_collection, users_collection
+    I_clockwork_jobs,
+    cluster_name,
+    jobs_collection,
+    users_collection,
+    unchanged_jobs="touch",
+    resolve_users=True,
+    source_timestamp=None,
+    stats=None,
 ):
     """
-    Retrieve lists of database operations (InsertOne, ReplaceOne and UpdateOne, from pymongo) summarizing the updates
+    Retrieve lists of database operations (UpdateOne and UpdateMany, from pymongo) summarizing the updates
     to be done on jobs and users in the database, and data to store in the dump file.
 
+    Each job carries the digest of its "slurm" component in the field "cw.slurm_digest". A job whose
+    digest (and associated Mila user) did not change since its last update is not rewritten: according
+    to unchanged_jobs, only its "last_slurm_update" timestamps are updated, or it is skipped entirely.
+
+    An event is produced for each new job, and for each stored job whose state changed (see job_events_helper).
+
+    When a source_timestamp is given, each written job carries it in the field "cw.source_timestamp",
+    and the writes are conditional on it, so that concurrent ingestions never replace a job by an
+    older version of it:
+        - the new jobs are upserted with "$setOnInsert", thus a job inserted meanwhile is left as is
+          (when both upserts race, the unique index "job_id_and_cluster_name" rejects one of them);
+        - the stored jobs are only updated if their source timestamp is not newer than ours;
+        - the stored jobs retrieved from a newer report are "stale": they are neither written nor touched.
+    An operation which does not apply is a conflict, detected through count_job_write_conflicts.
+
     Parameters:
         I_clockwork_jobs    Iterator on Clockwork jobs we want to insert or update in the database
         cluster_name        Name of the cluster on which we are working
         jobs_collection     Collection of the jobs in the database
         users_collection    Collection of the users in the database
+        unchanged_jobs      "touch" (default) to update the timestamps of the unchanged jobs through a single UpdateMany,
+                            or "skip" to leave them untouched
+        resolve_users       If True (default), the jobs are associated to their Mila users. Otherwise,
+                            they are expected to be already associated (see resolve_user_accounts)
+        source_timestamp    Time at which the report has been retrieved from the cluster. Default is None,
+                            which means the writes are not conditional
+        stats               IngestStats counting the queries as "mongo_round_trips". Default is None
 
     Returns:
-        A 3-tuple containing (in this order) the following elements:
-            - A list of the database operations (InsertOne and ReplaceOne, from pymongo) summarizing the
+        A 5-tuple containing (in this order) the following elements:
+            - A list of the database operations (UpdateOne and UpdateMany, from pymongo) summarizing the
               updates to be done into the database for the jobs
             - A list of the database operations (UpdateOne, from pymongo) summarizing the updates to be
               done into the database for the users
             - A list of the elements to store in the dump file
+            - A dictionary counting the jobs which are "inserted", "changed", "untouched" and "stale"
+            - A list of the events describing the changes of state of the jobs
     """
 
     L_updates_to_do = []  # Initialize the list of elements to update
     L_data_for_dump_file = (
         []
     )  # Initialize the list of elements to store into the dump file
-
-    ## Retrieve MongoDB entities ##
-
-    # Retrieve the entities already stored in MongoDB for this cluster
-    LD_currently_in_mongodb = list(
-        jobs_collection.find({"slurm.cluster_name": cluster_name})
-    )
-
-    # Index these entities by id in order to have a O(1) lookup
-    # when matching entities stored in MongoDB and in the sacct file
-    DD_currently_in_mongodb = dict(
-        (D_entity["slurm"]["job_id"], D_entity) for D_entity in LD_currently_in_mongodb
+    L_untouched_ids = []  # MongoDB IDs of the jobs whose Slurm data did not change
+    L_job_events = []  # Changes of state of the jobs
+
+    # Condition of the writes on the stored jobs: their source timestamp (if any)
+    # should not be newer than the one of the report
+    D_source_condition = (
+        {}
+        if source_timestamp is None
+        else {"cw.source_timestamp": {"$not": {"$gt": source_timestamp}}}
     )
 
     ## Retrieve sacct entities ##
 
-    # Apply the function lookup_user_account to each element, which are then gathered in a list
+    # Gather the jobs in a list and associate them to their Mila users
     # (We previously added a filter in order to keep only the Mila related jobs, but this is now
     # done while retrieving these jobs)
-    LD_sacct = list(
-        map(
-            lookup_user_account(users_collection),
-            I_clockwork_jobs,
-        )
-    )
+    LD_sacct = list(I_clockwork_jobs)
+    if resolve_users:
+        resolve_user_accounts(LD_sacct, users_collection)
 
     # Index the jobs by ID
     DD_sacct = dict((D_job["slurm"]["job_id"], D_job) for D_job in LD_sacct)
 
+    ## Retrieve MongoDB entities ##
+
+    # Retrieve the entities already stored in MongoDB among the ones of the report,
+    # indexed by id in order to have a O(1) lookup when matching entities stored
+    # in MongoDB and in the sacct file
+    DD_currently_in_mongodb = find_stored_jobs(
+        jobs_collection, cluster_name, DD_sacct.keys(), stats=stats
+    )
+
     ## Identify the elements to insert and the ones to updates ##
 
     # Identify the element to insert (ie the new element, which have not been stored
@@ -309,10 +880,11 @@ def get_jobs_updates_and_insertions(
 
     # Make some check on data consistency:
     # The way we partitioned those job_id, they cannot be in two of those sets.
-    # Note that many job_id for old jobs are not going to be found in any of those sets
-    # because they simply do not require exceptional handling by sacct.
     assert S_ids_to_insert.isdisjoint(S_ids_to_update)
 
+    # add these fields all the time, whenever you touch an entry
+    now = time.time()
+
     # -- Insertion --
     for job_id in S_ids_to_insert:
         D_job_sc = DD_sacct[job_id]
@@ -320,109 +892,329 @@ def get_jobs_updates_and_insertions(
         # This can lead to strange interactions with the operations that
         # we want to do with sacct. Might as well keep it clean here.
         D_job_new = copy.copy(D_job_sc)
-        # add this field all the time, whenever you touch an entry
-        now = time.time()
         D_job_new["cw"]["last_slurm_update"] = now
         D_job_new["cw"]["last_slurm_update_by_sacct"] = now
+        D_job_new["cw"]["slurm_digest"] = get_slurm_digest(D_job_new["slurm"])
+        if source_timestamp is not None:
+            D_job_new["cw"]["source_timestamp"] = source_timestamp
         # No need to the empty user dict because it's done earlier
         # by `slurm_job_to_clockwork_job`.
 
-        # Save the operation to do in the database
-        L_updates_to_do.append(InsertOne(D_job_new))
+        # Save the operation to do in the database. The job is only inserted
+        # if it has not been inserted meanwhile by another ingestion
+        L_updates_to_do.append(
+            UpdateOne(
+                {"slurm.job_id": job_id, "slurm.cluster_name": cluster_name},
+                {"$setOnInsert": D_job_new},
+                upsert=True,
+            )
+        )
+        L_job_events.append(get_job_event(D_job_new, None, now))
         # Save the data to store in the dump file (just omit the "_id" part of the job)
         L_data_for_dump_file.append(
             {k: D_job_new[k] for k in D_job_new.keys() if k != "_id"}
         )
 
     # -- Update --
+    nb_changed = 0
+    nb_stale = 0
     for job_id in S_ids_to_update:
         # Retrieve the two versions of the job
         D_job_db = DD_currently_in_mongodb[
             job_id
-        ]  # The job as it is currently stored in the database
+        ]  # The projection of the job as it is currently stored in the database
         D_job_sacct = DD_sacct[
             job_id
         ]  # The data of the job parsed from the sacct report
 
-        # Check if their clusters match
-        assert D_job_db["slurm"]["cluster_name"] == cluster_name
+        # Check if the cluster of the report matches
         assert D_job_sacct["slurm"]["cluster_name"] == cluster_name
 
-        # Note that D_job_db has a "_id" which is useful for an update,
-        # and it also contains a "user" dict which might have values in it,
-        # which is a thing that D_job_sc wouldn't have.
+        # Skip the job if it has been stored from a newer report
+        stored_source_timestamp = D_job_db.get("cw", {}).get("source_timestamp")
+        if (
+            source_timestamp is not None
+            and stored_source_timestamp is not None
+            and stored_source_timestamp > source_timestamp
+        ):
+            nb_stale += 1
+            continue
+
+        # The job is unchanged if neither its Slurm data nor its associated
+        # Mila user changed since its last update
+        D_cw_db = D_job_db.get("cw", {})
+        D_cw_sacct = D_job_sacct["cw"]
+        D_cw_sacct["slurm_digest"] = get_slurm_digest(D_job_sacct["slurm"])
+        is_unchanged = (
+            D_cw_db.get("slurm_digest") == D_cw_sacct["slurm_digest"]
+            and D_cw_db.get("mila_email_username") == D_cw_sacct["mila_email_username"]
+        )
 
-        D_job_new = {}
-        for k in ["cw", "slurm", "user"]:
-            D_job_new[k] = D_job_db.get(k, {}) | D_job_sacct.get(k, {})
-        # Add these field each time an entry is updated
-        now = time.time()
-        D_job_new["cw"]["last_slurm_update"] = now
-        D_job_new["cw"]["last_slurm_update_by_sacct"] = now
+        if not is_unchanged or unchanged_jobs == "touch":
+            # Add these field each time an entry is updated
+            D_cw_sacct["last_slurm_update"] = now
+            D_cw_sacct["last_slurm_update_by_sacct"] = now
+            if source_timestamp is not None:
+                D_cw_sacct["source_timestamp"] = source_timestamp
+
+        if not is_unchanged:
+            nb_changed += 1
+            old_state = D_job_db["slurm"].get("job_state")
+            if old_state != D_job_sacct["slurm"].get("job_state"):
+                L_job_events.append(get_job_event(D_job_sacct, old_state, now))
+            # Only the fields coming from the report are set, so that the fields
+            # of the stored "slurm" and "cw" components which are not part of the
+            # report are kept, and the "user" component is left unchanged.
+            D_set = {f"slurm.{k}": v for (k, v) in D_job_sacct["slurm"].items()}
+            D_set.update({f"cw.{k}": v for (k, v) in D_cw_sacct.items()})
+            L_updates_to_do.append(
+                UpdateOne(
+                    {"_id": D_job_db["_id"], **D_source_condition},
+                    {"$set": D_set},
+                    upsert=False,
+                )
+            )
+        elif unchanged_jobs == "touch":
+            L_untouched_ids.append(D_job_db["_id"])
 
-        L_updates_to_do.append(
-            ReplaceOne({"_id": D_job_db["_id"]}, D_job_new, upsert=False)
+        # Save the data to store in the dump file
+        L_data_for_dump_file.append(
+            {
+                "slurm": D_job_sacct["slurm"],
+                "cw": D_cw_sacct,
+                "user": D_job_db.get("user", {}),
+            }
         )
 
-        # Save the data to store in the dump file (just omit the "_id" part of the job)
-        L_data_for_dump_file.append(
-            {k: D_job_new[k] for k in D_job_new.keys() if k != "_id"}
+    # -- Touch --
+    # The unchanged jobs only get their timestamps updated, all at once
+    if L_untouched_ids:
+        D_touch = {
+            "cw.last_slurm_update": now,
+            "cw.last_slurm_update_by_sacct": now,
+        }
+        if source_timestamp is not None:
+            D_touch["cw.source_timestamp"] = source_timestamp
+        L_updates_to_do.append(
+            UpdateMany(
+                {"_id": {"$in": L_untouched_ids}, **D_source_condition},
+                {"$set": D_touch},
+            )
         )
 
+    D_summary = {
+        "inserted": len(S_ids_to_insert),
+        "changed": nb_changed,
+        "untouched": len(S_ids_to_update) - nb_changed - nb_stale,
+        "stale": nb_stale,
+    }
+
     # -- Account association -- #
     # L_users_updates = associate_account(LD_sacct)
 
-    # return (L_updates_to_do, L_users_updates, L_data_for_dump_file)
-    return (L_updates_to_do, [], L_data_for_dump_file)
+    # return (L_updates_to_do, L_users_updates, L_data_for_dump_file, D_summary, L_job_events)
+    return (L_updates_to_do, [], L_data_for_dump_file, D_summary, L_job_events)
+
+
+def count_job_write_conflicts(
+    D_summary, unchanged_jobs, D_counts_before, D_counts_after
+):
+    """
+    Count the operations returned by get_jobs_updates_and_insertions which did not apply,
+    because the jobs have been written meanwhile by another ingestion.
+
+    Each of these operations sets the "last_slurm_update" of the job to a new time, thus
+    it modifies one job, or upserts it, when it applies.
+
+    Parameters:
+        D_summary           Summary of the jobs returned by get_jobs_updates_and_insertions
+        unchanged_jobs      "touch" or "skip", as given to get_jobs_updates_and_insertions
+        D_counts_before     Counts of the results of the BulkWriter before writing the operations
+        D_counts_after      Counts of the results of the BulkWriter after writing the operations
+
+    Returns:
+        The number of jobs which have not been written
+    """
+    nb_expected = D_summary["inserted"] + D_summary["changed"]
+    if unchanged_jobs == "touch":
+        nb_expected += D_summary["untouched"]
+    nb_applied = (D_counts_after["nModified"] - D_counts_before["nModified"]) + (
+        D_counts_after["nUpserted"] - D_counts_before["nUpserted"]
+    )
+    return max(nb_expected - nb_applied, 0)
+
+
+def filter_applied_job_events(
+    L_job_events, LD_clockwork_jobs, cluster_name, jobs_collection, stats=None
+):
+    """
+    Keep the events of the jobs which are stored as they have been written, that is
+    with the digest computed by get_jobs_updates_and_insertions.
+
+    Parameters:
+        L_job_events        Events returned by get_jobs_updates_and_insertions
+        LD_clockwork_jobs   Jobs given to get_jobs_updates_and_insertions
+        cluster_name        Name of the cluster on which we are working
+        jobs_collection     Collection of the jobs in the database
+        stats               IngestStats counting the queries as "mongo_round_trips". Default is None
+
+    Returns:
+        The list of the events whose job has been written
+    """
+    if not L_job_events:
+        return []
+    D_written_digests = {
+        D_job["slurm"]["job_id"]: D_job["cw"].get("slurm_digest")
+        for D_job in LD_clockwork_jobs
+    }
+    DD_stored_jobs = find_stored_jobs(
+        jobs_collection,
+        cluster_name,
+        [D_event["job_id"] for D_event in L_job_events],
+        stats=stats,
+    )
+    return [
+        D_event
+        for D_event in L_job_events
+        if D_event["job_id"] in DD_stored_jobs
+        and DD_stored_jobs[D_event["job_id"]].get("cw", {}).get("slurm_digest")
+        == D_written_digests[D_event["job_id"]]
+    ]
+
+
+def find_stored_nodes(nodes_collection, cluster_name, names, stats=None):
+    """
+    Retrieve the nodes of a cluster already stored in the database, among the given names.
+
+    The nodes are retrieved through a single "$in" query using the "name_and_cluster_name"
+    index, and only the fields required to match and update them are projected.
+
+    Parameters:
+        nodes_collection    Collection of the nodes in the database
+        cluster_name        Name of the cluster on which we are working
+        names               Iterable over the names of the nodes to retrieve
+        stats               IngestStats counting the query as "mongo_round_trips". Default is None
+
+    Returns:
+        A dictionary associating the names of the stored nodes to their projected documents
+    """
+    if stats is not None:
+        stats.count("mongo_round_trips")
+    return {
+        D_node["slurm"]["name"]: D_node
+        for D_node in nodes_collection.find(
+            {"slurm.name": {"$in": list(names)}, "slurm.cluster_name": cluster_name},
+            STORED_NODE_PROJECTION,
+        )
+    }
+
+
+# Fields of the stored nodes required to compute their updates
+STORED_NODE_PROJECTION = {
+    "_id": 1,
+    "slurm.name": 1,
+    "cw.slurm_digest": 1,
+}
 
 
-def get_nodes_updates(I_clockwork_nodes):
+def get_nodes_updates(I_clockwork_nodes, cluster_name, nodes_collection, stats=None):
     """
-    Retrieve a list of database operations (UpdateOne, from pymongo) summarizing
+    Retrieve a list of database operations (UpdateOne and UpdateMany, from pymongo) summarizing
     the updates to be done on nodes in the database, and data to store in the dump file.
 
+    As for the jobs, each node carries the digest of its "slurm" component in the field
+    "cw.slurm_digest". Only the new nodes and the nodes whose digest changed are written;
+    the other ones only get their "last_slurm_update" timestamps updated, all at once.
+
     Parameters:
         I_clockwork_nodes   Iterator on Clockwork nodes we want to insert or update in the database
+        cluster_name        Name of the cluster on which we are working
+        nodes_collection    Collection of the nodes in the database
+        stats               IngestStats counting the queries as "mongo_round_trips". Default is None
 
     Returns:
-        A 2-tuple containing (in this order) the following elements:
-            - A list of the database operations (UpdateOne, from pymongo) summarizing the
+        A 3-tuple containing (in this order) the following elements:
+            - A list of the database operations (UpdateOne and UpdateMany, from pymongo) summarizing the
               updates to be done into the database for the nodes
             - A list of elements to store in the dump file
+            - A dictionary counting the nodes which are "inserted", "changed" and "untouched"
     """
 
     L_updates_to_do = []  # Initialize the list of elements to update
     L_data_for_dump_file = (
         []
     )  # Initialize the list of elements to store into the dump file
+    L_untouched_ids = []  # MongoDB IDs of the nodes whose Slurm data did not change
+    D_summary = {"inserted": 0, "changed": 0, "untouched": 0}
+
+    LD_nodes = list(I_clockwork_nodes)
+    DD_currently_in_mongodb = find_stored_nodes(
+        nodes_collection,
+        cluster_name,
+        [D_node["slurm"]["name"] for D_node in LD_nodes],
+        stats=stats,
+    )
 
-    for D_node in I_clockwork_nodes:
+    # Add these field each time an entry is updated
+    now = time.time()
 
-        # Add these field each time an entry is updated
-        now = time.time()
+    for D_node in LD_nodes:
+        # Check if the cluster of the report matches
+        assert D_node["slurm"]["cluster_name"] == cluster_name
+
+        D_node["cw"]["slurm_digest"] = get_slurm_digest(D_node["slurm"])
         D_node["cw"]["last_slurm_update"] = now
         D_node["cw"]["last_slurm_update_by_sacct"] = now
 
         L_data_for_dump_file.append(D_node)
 
+        D_node_db = DD_currently_in_mongodb.get(D_node["slurm"]["name"])
+        if D_node_db is None:
+            D_summary["inserted"] += 1
+            L_updates_to_do.append(
+                UpdateOne(
+                    # rule to match if already present in collection
+                    {
+                        "slurm.name": D_node["slurm"]["name"],
+                        "slurm.cluster_name": cluster_name,
+                    },
+                    # the data that we write in the collection
+                    {"$set": {"slurm": D_node["slurm"], "cw": D_node["cw"]}},
+                    # create if missing (for instance if it has been inserted
+                    # concurrently since it was looked up), update if present
+                    upsert=True,
+                )
+            )
+        elif (
+            D_node_db.get("cw", {}).get("slurm_digest") != D_node["cw"]["slurm_digest"]
+        ):
+            D_summary["changed"] += 1
+            # The stored fields of "cw" which are not computed from the report are kept
+            D_set = {"slurm": D_node["slurm"]}
+            D_set.update({f"cw.{k}": v for (k, v) in D_node["cw"].items()})
+            L_updates_to_do.append(
+                UpdateOne({"_id": D_node_db["_id"]}, {"$set": D_set}, upsert=False)
+            )
+        else:
+            D_summary["untouched"] += 1
+            L_untouched_ids.append(D_node_db["_id"])
+
+    # -- Touch --
+    # The unchanged nodes only get their timestamps updated, all at once
+    if L_untouched_ids:
         L_updates_to_do.append(
-            UpdateOne(
-                # rule to match if already present in collection
-                {
-                    "slurm.name": D_node["slurm"]["name"],
-                    "slurm.cluster_name": D_node["slurm"]["cluster_name"],
-                },
-                # the data that we write in the collection
+            UpdateMany(
+                {"_id": {"$in": L_untouched_ids}},
                 {
-                    "$set": {"slurm": D_node["slurm"]},
-                    "$setOnInsert": {"cw": D_node["cw"]},
+                    "$set": {
+                        "cw.last_slurm_update": now,
+                        "cw.last_slurm_update_by_sacct": now,
+                    }
                 },
-                # create if missing, update if present
-                upsert=True,
             )
         )
 
-    return (L_updates_to_do, L_data_for_dump_file)
+    return (L_updates_to_do, L_data_for_dump_file, D_summary)
 
 
 """
@@ -526,9 +1318,9 @@ def main_read_users_and_update_collection(
         )
 
     if L_updates_to_do:
-        print("result = users_collection.bulk_write(L_updates_to_do)")
-        result = users_collection.bulk_write(L_updates_to_do)
-        pprint_bulk_result(result)
+        writer = BulkWriter(users_collection)
+        writer.write(L_updates_to_do)
+        print(writer.get_summary())
     mongo_update_duration = time.time() - timestamp_start
     print(
         f"Bulk write for {len(L_updates_to_do)} user entries in mongodb took {mongo_update_duration} seconds."
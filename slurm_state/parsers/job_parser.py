@@ -1,31 +1,82 @@
-# These functions are translators used in order to handle the values
-# we could encounter while parsing a job dictionary retrieved from a
-# sacct command.
-from slurm_state.helpers.parser_helper import (
-    copy,
-    copy_and_stringify,
-    extract_tres_data,
-    join_subitems,
-    rename,
-    rename_subitems,
-    rename_and_stringify_subitems,
-    translate_with_value_modification,
-    zero_to_null,
-)
-
 from slurm_state.parsers.slurm_parser import SlurmParser
 
 # Common imports
-import json, re
+from datetime import datetime
+import re
+
+
+# Translation of the fields of a job dictionary retrieved from a sacct
+# command, for Slurm 22 and 23. The format of these field specs is
+# described in slurm_state/helpers/translation_plan_helper.py
+JOB_FIELD_SPECS_V22_AND_23 = (
+    ("account", "copy"),
+    (
+        "array",
+        "rename_and_stringify_subitems",
+        (("job_id", "array_job_id"), ("task_id", "array_task_id")),
+    ),
+    ("cluster", "rename", "cluster_name"),
+    ("exit_code", "join_subitems", ":", "exit_code"),
+    ("job_id", "copy_and_stringify"),
+    ("name", "copy"),
+    ("nodes", "copy"),
+    ("partition", "copy"),
+    ("state", "rename_subitems", (("current", "job_state"),)),
+    (
+        "time",
+        "zero_to_null_and_rename_subitems",
+        (
+            ("limit", "time_limit"),
+            ("submission", "submit_time"),
+            ("start", "start_time"),
+            ("end", "end_time"),
+        ),
+    ),
+    ("tres", "extract_tres_data"),
+    ("user", "rename", "username"),
+    ("working_directory", "copy"),
+)
 
 
 class JobParser(SlurmParser):
     """ """
 
-    def __init__(self, cluster_name, slurm_version=None):
-        super().__init__("jobs", "sacct", cluster_name, slurm_version=slurm_version)
-
-    def generate_report(self, file_name):
+    def __init__(
+        self,
+        cluster_name,
+        slurm_version=None,
+        streaming=True,
+        compiled_translation=True,
+    ):
+        super().__init__(
+            "jobs",
+            "sacct",
+            cluster_name,
+            slurm_version=slurm_version,
+            streaming=streaming,
+            compiled_translation=compiled_translation,
+        )
+
+    def format_sacct_time(self, timestamp):
+        """
+        Format a timestamp as expected by the -S and -E options of sacct,
+        which are interpreted in the timezone of the cluster.
+        """
+        return datetime.fromtimestamp(timestamp, tz=self.cluster["timezone"]).strftime(
+            "%Y-%m-%dT%H:%M:%S"
+        )
+
+    def generate_report(self, file_name, start_time=None, end_time=None):
+        """
+        Launch a sacct command in order to retrieve the jobs of the cluster.
+
+        Parameters:
+            file_name   The path of the report file to write
+            start_time  Timestamp of the beginning of the window in which the jobs are retrieved.
+                        Default is None, which means the last 600 seconds are retrieved
+            end_time    Timestamp of the end of the window in which the jobs are retrieved.
+                        Default is None, which means "now"
+        """
 
         # Retrieve the allocations associated to the cluster
         allocations = self.cluster["allocations"]
@@ -43,15 +94,17 @@ class JobParser(SlurmParser):
             # -X means "Only show statistics relevant to the job allocation itself, not taking steps into consideration."
             # --associations is used in order to limit the fetched jobs to the ones related to Mila and/or professors who
             #                may use Clockwork
+            start = (
+                "now-600" if start_time is None else self.format_sacct_time(start_time)
+            )
+            end = "now" if end_time is None else self.format_sacct_time(end_time)
             if allocations == "*":
                 # We do not provide --associations information because the default for this parameter
                 # is "all associations"
-                remote_command = (
-                    f"{self.slurm_command_path} -S now-600 -E now -X --allusers --json"
-                )
+                remote_command = f"{self.slurm_command_path} -S {start} -E {end} -X --allusers --json"
             else:
                 accounts_list = ",".join(allocations)
-                remote_command = f"{self.slurm_command_path} -S now-600 -E now -X --accounts={accounts_list} --allusers --json"
+                remote_command = f"{self.slurm_command_path} -S {start} -E {end} -X --accounts={accounts_list} --allusers --json"
             print(f"remote_command is\n{remote_command}")
 
         return super().generate_report(remote_command, file_name)
@@ -68,52 +121,8 @@ class JobParser(SlurmParser):
             )
 
     def parser_v22_and_23(self, f):
-        JOB_FIELD_MAP = {
-            "account": copy,
-            "array": rename_and_stringify_subitems(
-                {"job_id": "array_job_id", "task_id": "array_task_id"}
-            ),
-            "cluster": rename("cluster_name"),
-            "exit_code": join_subitems(":", "exit_code"),
-            "job_id": copy_and_stringify,
-            "name": copy,
-            "nodes": copy,
-            "partition": copy,
-            "state": rename_subitems({"current": "job_state"}),
-            "time": translate_with_value_modification(
-                zero_to_null,
-                rename_subitems,
-                subitem_dict={
-                    "limit": "time_limit",
-                    "submission": "submit_time",
-                    "start": "start_time",
-                    "end": "end_time",
-                },
-            ),
-            "tres": extract_tres_data,
-            "user": rename("username"),
-            "working_directory": copy,
-        }
-
-        # Load the JSON file generated using the Slurm command
-        # (At this point, slurm_data is a hierarchical structure of dictionaries and lists)
-        slurm_data = json.load(f)
-
-        slurm_entities = slurm_data[self.entity]
-
-        for slurm_entity in slurm_entities:
-            res_entity = (
-                dict()
-            )  # Initialize the dictionary which will store the newly formatted Slurm data
-
-            for k, v in slurm_entity.items():
-                # We will use a handler mapping to translate this
-                translator = JOB_FIELD_MAP.get(k, None)
-
-                if translator is not None:
-                    # Translate using the translator retrieved from the fields map
-                    translator(k, v, res_entity)
-
-                # If no translator has been provided: ignore the field
+        translate = self.get_translator(JOB_FIELD_SPECS_V22_AND_23)
 
-            yield res_entity
+        for slurm_entity in self.iter_slurm_entities(f):
+            # Format the Slurm data
+            yield translate(slurm_entity)
@@ -1,23 +1,51 @@
 from slurm_state.parsers.slurm_parser import SlurmParser
 
-# These functions are translators used in order to handle the values
-# we could encounter while parsing a node dictionary retrieved from a
-# sinfo command.
-from slurm_state.helpers.parser_helper import (
-    copy,
-    copy_with_none_as_empty_string,
-    rename,
-)
-
 # Common imports
-import json, re
+import re
+
+
+# Translation of the fields of a node dictionary retrieved from a sinfo
+# command, for Slurm 22. The format of these field specs is described in
+# slurm_state/helpers/translation_plan_helper.py
+NODE_FIELD_SPECS_V22 = (
+    ("architecture", "rename", "arch"),
+    ("comment", "copy"),
+    ("cores", "copy"),
+    ("cpus", "copy"),
+    ("last_busy", "copy"),
+    ("features", "copy"),
+    ("gres", "copy_with_none_as_empty_string"),
+    ("gres_used", "copy"),
+    ("name", "copy"),
+    ("address", "rename", "addr"),
+    ("state", "copy"),
+    ("state_flags", "copy"),
+    ("real_memory", "rename", "memory"),
+    ("reason", "copy"),
+    ("reason_changed_at", "copy"),
+    ("tres", "copy"),
+    ("tres_used", "copy"),
+)
 
 
 class NodeParser(SlurmParser):
     """ """
 
-    def __init__(self, cluster_name, slurm_version=None):
-        super().__init__("nodes", "sinfo", cluster_name, slurm_version=slurm_version)
+    def __init__(
+        self,
+        cluster_name,
+        slurm_version=None,
+        streaming=True,
+        compiled_translation=True,
+    ):
+        super().__init__(
+            "nodes",
+            "sinfo",
+            cluster_name,
+            slurm_version=slurm_version,
+            streaming=streaming,
+            compiled_translation=compiled_translation,
+        )
 
     def generate_report(self, file_name):
         # The command to be launched through SSH is "sinfo --json"
@@ -35,45 +63,8 @@ class NodeParser(SlurmParser):
             )
 
     def parser_v22(self, f):
-        NODE_FIELD_MAP = {
-            "architecture": rename("arch"),
-            "comment": copy,
-            "cores": copy,
-            "cpus": copy,
-            "last_busy": copy,
-            "features": copy,
-            "gres": copy_with_none_as_empty_string,
-            "gres_used": copy,
-            "name": copy,
-            "address": rename("addr"),
-            "state": copy,
-            "state_flags": copy,
-            "real_memory": rename("memory"),
-            "reason": copy,
-            "reason_changed_at": copy,
-            "tres": copy,
-            "tres_used": copy,
-        }
-
-        # Load the JSON file generated using the Slurm command
-        # (At this point, slurm_data is a hierarchical structure of dictionaries and lists)
-        slurm_data = json.load(f)
-
-        slurm_entities = slurm_data[self.entity]
-
-        for slurm_entity in slurm_entities:
-            res_entity = (
-                dict()
-            )  # Initialize the dictionary which will store the newly formatted Slurm data
-
-            for k, v in slurm_entity.items():
-                # We will use a handler mapping to translate this
-                translator = NODE_FIELD_MAP.get(k, None)
-
-                if translator is not None:
-                    # Translate using the translator retrieved from the fields map
-                    translator(k, v, res_entity)
-
-                # If no translator has been provided: ignore the field
+        translate = self.get_translator(NODE_FIELD_SPECS_V22)
 
-            yield res_entity
+        for slurm_entity in self.iter_slurm_entities(f):
+            # Format the Slurm data
+            yield translate(slurm_entity)
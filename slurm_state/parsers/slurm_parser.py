@@ -1,9 +1,18 @@
 # Imports to retrieve the values related to Slurm command
-from slurm_state.helpers.ssh_helper import launch_slurm_command, open_connection
+from slurm_state.helpers.ssh_helper import (
+    launch_slurm_command,
+    open_connection,
+    stream_slurm_command_to_file,
+)
 from slurm_state.helpers.clusters_helper import get_all_clusters
+from slurm_state.helpers.json_stream_helper import iter_json_array_items
+from slurm_state.helpers.translation_plan_helper import (
+    compile_translation_plan,
+    get_reference_translator,
+)
 
 # Common imports
-import os, re
+import json, os, re
 
 
 class SlurmParser:
@@ -11,14 +20,32 @@ class SlurmParser:
     A parser for Slurm entities
     """
 
-    def __init__(self, entity, slurm_command, cluster_name, slurm_version=None):
+    def __init__(
+        self,
+        entity,
+        slurm_command,
+        cluster_name,
+        slurm_version=None,
+        streaming=True,
+        compiled_translation=True,
+    ):
         self.entity = entity
         assert entity in ["jobs", "nodes"]
 
+        # If True, the entities are read one by one from the report file.
+        # Otherwise, the whole report is loaded in memory before being parsed.
+        self.streaming = streaming
+
+        # If True, the entities are translated through a compiled translation plan.
+        # Otherwise, the translators of parser_helper are applied to each field.
+        self.compiled_translation = compiled_translation
+
         self.cluster = get_all_clusters()[cluster_name]
         self.cluster["name"] = cluster_name
 
         self.slurm_command = slurm_command
+        # Statistics of the transfer of the last generated report (see generate_report)
+        self.transfer_stats = None
         # Retrieve the path to the Slurm command we want to launch on the cluster
         # It is stored in the cluster data under the key "sacct_path" for the sacct command
         # and "sinfo_path" for the sinfo command
@@ -61,14 +88,45 @@ class SlurmParser:
                 f'The version "{response[0]}" has not been recognized as a Slurm version.'
             )
 
+    def iter_slurm_entities(self, f):
+        """
+        Iterate over the raw Slurm entities (jobs or nodes) of a report.
+
+        Parameters:
+            f   The report file, opened in text mode
+        """
+        if self.streaming:
+            # Only one entity is held in memory at a time
+            return iter_json_array_items(f, self.entity)
+        else:
+            # Load the JSON file generated using the Slurm command
+            # (At this point, slurm_data is a hierarchical structure of dictionaries and lists)
+            slurm_data = json.load(f)
+            return iter(slurm_data[self.entity])
+
+    def get_translator(self, field_specs):
+        """
+        Return the function translating a raw Slurm entity according to the
+        field specs (see translation_plan_helper).
+        """
+        if self.compiled_translation:
+            return compile_translation_plan(field_specs)
+        else:
+            return get_reference_translator(field_specs)
+
     def launch_slurm_command(self, remote_command):
-        """ """
+        """
+        Launch a short Slurm command (such as the version probe) and return the
+        lines of its output. It fails if the cluster does not answer within the
+        report timeout of the cluster.
+        """
         return launch_slurm_command(
             remote_command,
             self.cluster["remote_hostname"],
             self.cluster["remote_user"],
             self.cluster["ssh_key_filename"],
             self.cluster["ssh_port"],
+            timeout=self.cluster["report_timeout"],
         )
 
     def generate_report(self, remote_command, file_name):
@@ -81,13 +139,15 @@ class SlurmParser:
             remote_command      The command used to retrieve the data from Slurm
             file_name           The path of the report file to write
         """
-        # Launch the requested command in order to retrieve Slurm information
-        stdout = self.launch_slurm_command(remote_command)
-
-        # Create directories if needed
-        os.makedirs(os.path.dirname(file_name), exist_ok=True)
-
-        # Write the command output to a file
-        with open(file_name, "w") as outfile:
-            for line in stdout:
-                outfile.write(line)
+        # Launch the requested command in order to retrieve Slurm information,
+        # and write its output to the file as it arrives
+        self.transfer_stats = stream_slurm_command_to_file(
+            remote_command,
+            file_name,
+            self.cluster["remote_hostname"],
+            self.cluster["remote_user"],
+            self.cluster["ssh_key_filename"],
+            self.cluster["ssh_port"],
+            compression=self.cluster["report_compression"],
+            timeout=self.cluster["report_timeout"],
+        )
@@ -15,8 +15,36 @@ connect to it through a simple connection string given as command-line argument.
 
 import os
 import argparse
+from slurm_state.helpers.bulk_write_helper import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_WORKERS,
+)
+from slurm_state.helpers.dump_file_helper import DUMP_COMPRESSIONS, DUMP_FORMATS
+from slurm_state.helpers.report_archive_helper import ReportArchive
+from slurm_state.helpers.ingest_metrics_helper import (
+    DEFAULT_INGEST_RUNS_TTL,
+    IngestMetricsExporter,
+    create_ingest_runs_indexes,
+)
+from slurm_state.helpers.cluster_stats_helper import create_cluster_stats_indexes
+from slurm_state.helpers.jobs_indexes_helper import (
+    create_jobs_identifying_index,
+    create_jobs_sorting_indexes,
+)
+from slurm_state.helpers.job_events_helper import (
+    DEFAULT_JOB_EVENTS_TTL,
+    create_job_events_indexes,
+)
+from slurm_state.helpers.high_water_mark_helper import (
+    DEFAULT_SACCT_MAX_WINDOW,
+    DEFAULT_SACCT_OVERLAP,
+)
 from slurm_state.mongo_client import get_mongo_client
-from slurm_state.mongo_update import main_read_report_and_update_collection
+from slurm_state.mongo_update import (
+    DEFAULT_BATCH_SIZE,
+    main_read_jobs_since_high_water_mark,
+    main_read_report_and_update_collection,
+)
 
 
 def main(argv):
@@ -42,6 +70,13 @@ def main(argv):
         help="Whether or not the jobs are retrieved from a file instead of a sacct command.",
     )
 
+    parser.add_argument(
+        "--jobs_source_timestamp",
+        type=float,
+        default=None,
+        help="Time at which the existing jobs file has been retrieved from the cluster. An older report does not overwrite the jobs stored from a more recent one. Default is the modification time of the file, or the current time if the file is generated.",
+    )
+
     parser.add_argument(
         "--slurm_nodes_file",
         required=False,
@@ -76,6 +111,99 @@ def main(argv):
         "--mongodb_collection", default="clockwork", help="Collection to populate."
     )
 
+    parser.add_argument(
+        "--unchanged_jobs",
+        choices=["touch", "skip"],
+        default="touch",
+        help="How to handle the jobs whose Slurm data did not change since the last update: "
+        '"touch" only updates their last_slurm_update timestamps, "skip" leaves them untouched.',
+    )
+
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of jobs or nodes read from the report, compared to the database and written at once.",
+    )
+
+    parser.add_argument(
+        "--write_chunk_size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Maximum number of database operations sent in a single unordered bulk_write.",
+    )
+
+    parser.add_argument(
+        "--write_workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Number of chunks of database operations sent concurrently.",
+    )
+
+    parser.add_argument(
+        "--dump_format",
+        choices=DUMP_FORMATS,
+        default="json",
+        help='Format of the files given by --cw_jobs_file and --cw_nodes_file: "json" writes an indented JSON list, '
+        '"jsonl" writes one element per line, as the elements are processed.',
+    )
+
+    parser.add_argument(
+        "--dump_compression",
+        choices=DUMP_COMPRESSIONS,
+        default="none",
+        help='Compression of the files given by --cw_jobs_file and --cw_nodes_file. Only available with "--dump_format jsonl".',
+    )
+
+    parser.add_argument(
+        "--sacct_overlap",
+        type=int,
+        default=DEFAULT_SACCT_OVERLAP,
+        help="When the jobs are retrieved through sacct and stored in db, number of seconds by which "
+        "the sacct window overlaps the end of the last committed window of the cluster.",
+    )
+
+    parser.add_argument(
+        "--sacct_max_window",
+        type=int,
+        default=DEFAULT_SACCT_MAX_WINDOW,
+        help="When the jobs are retrieved through sacct and stored in db, maximum number of seconds "
+        "covered by a single sacct call. Longer gaps are retrieved through several calls.",
+    )
+
+    parser.add_argument(
+        "--report_archive_folder",
+        help="If provided, each retrieved sacct or sinfo report is kept in this folder, compressed and partitioned "
+        "by cluster, entity and day, so that it can be replayed by slurm_state/replay_reports.py.",
+    )
+
+    parser.add_argument(
+        "--report_archive_compression",
+        choices=DUMP_COMPRESSIONS,
+        default="gzip",
+        help="Compression of the archived reports.",
+    )
+
+    parser.add_argument(
+        "--metrics_textfile",
+        help="If provided, the durations of the stages and the counters of the ingestions are written "
+        "in the Prometheus text format, in a file named from this path and suffixed by the cluster "
+        "name and the entity (for instance clockwork_ingest.mila.jobs.prom for clockwork_ingest.prom).",
+    )
+
+    parser.add_argument(
+        "--job_events_ttl",
+        type=int,
+        default=DEFAULT_JOB_EVENTS_TTL,
+        help="Number of seconds during which the changes of state of the jobs are kept in the job_events collection.",
+    )
+    parser.add_argument(
+        "--ingest_runs_ttl",
+        type=int,
+        default=DEFAULT_INGEST_RUNS_TTL,
+        help="Number of seconds during which the measures of the ingestions are kept in the ingest_runs collection.",
+    )
+
     # Retrieve the args
     args = parser.parse_args(argv[1:])
     collection_name = args.mongodb_collection
@@ -91,22 +219,88 @@ def main(argv):
     # https://stackoverflow.com/questions/33541290/how-can-i-create-an-index-with-pymongo
     # Apparently "ensure_index" is deprecated, and we should always call "create_index".
     if args.store_in_db:
-        jobs_collection.create_index(
-            [("slurm.job_id", 1), ("slurm.cluster_name", 1)],
-            name="job_id_and_cluster_name",
+        create_jobs_identifying_index(jobs_collection)
+        create_jobs_sorting_indexes(jobs_collection)
+        create_job_events_indexes(
+            client[collection_name]["job_events"], ttl=args.job_events_ttl
+        )
+        create_cluster_stats_indexes(
+            client[collection_name]["cluster_stats"], jobs_collection
         )
 
-    main_read_report_and_update_collection(
-        "jobs",
-        jobs_collection,
-        client[collection_name]["users"],
-        args.cluster_name,
-        args.slurm_jobs_file,
-        from_file=args.from_existing_jobs_file,
-        want_commit_to_db=args.store_in_db,
-        dump_file=args.cw_jobs_file,
+    # The summary of the cluster is refreshed after each commit of its jobs or nodes
+    cluster_stats_collection = (
+        client[collection_name]["cluster_stats"] if args.store_in_db else None
     )
 
+    report_archive = (
+        ReportArchive(
+            args.report_archive_folder, compression=args.report_archive_compression
+        )
+        if args.report_archive_folder
+        else None
+    )
+
+    # The measures of each ingestion are stored in the database along the jobs and nodes
+    if args.store_in_db:
+        create_ingest_runs_indexes(
+            client[collection_name]["ingest_runs"], ttl=args.ingest_runs_ttl
+        )
+    metrics_exporter = IngestMetricsExporter(
+        textfile_path=args.metrics_textfile,
+        ingest_runs_collection=(
+            client[collection_name]["ingest_runs"] if args.store_in_db else None
+        ),
+    )
+
+    D_jobs_options = {
+        "dump_file": args.cw_jobs_file,
+        "dump_format": args.dump_format,
+        "dump_compression": args.dump_compression,
+        "unchanged_jobs": args.unchanged_jobs,
+        "batch_size": args.batch_size,
+        "write_chunk_size": args.write_chunk_size,
+        "write_workers": args.write_workers,
+        "report_archive": report_archive,
+        "job_events_collection": (
+            client[collection_name]["job_events"] if args.store_in_db else None
+        ),
+        "cluster_stats_collection": cluster_stats_collection,
+    }
+    with metrics_exporter.measure(args.cluster_name, "jobs") as stats:
+        if args.store_in_db and not args.from_existing_jobs_file:
+            # The jobs are retrieved from the end of the last committed window
+            high_water_marks_collection = client[collection_name][
+                "ingest_high_water_marks"
+            ]
+            high_water_marks_collection.create_index(
+                [("cluster_name", 1)], name="cluster_name", unique=True
+            )
+            main_read_jobs_since_high_water_mark(
+                jobs_collection,
+                client[collection_name]["users"],
+                high_water_marks_collection,
+                args.cluster_name,
+                args.slurm_jobs_file,
+                sacct_overlap=args.sacct_overlap,
+                sacct_max_window=args.sacct_max_window,
+                stats=stats,
+                **D_jobs_options,
+            )
+        else:
+            main_read_report_and_update_collection(
+                "jobs",
+                jobs_collection,
+                client[collection_name]["users"],
+                args.cluster_name,
+                args.slurm_jobs_file,
+                from_file=args.from_existing_jobs_file,
+                want_commit_to_db=args.store_in_db,
+                source_timestamp=args.jobs_source_timestamp,
+                stats=stats,
+                **D_jobs_options,
+            )
+
     #
     #   Parse the nodes
     #
@@ -117,17 +311,34 @@ def main(argv):
             [("slurm.name", 1), ("slurm.cluster_name", 1)],
             name="name_and_cluster_name",
         )
+        nodes_collection.create_index(
+            [("slurm.cluster_name", 1), ("cw.resources.gpu_free", 1)],
+            name="cluster_name_and_gpu_free",
+        )
+        nodes_collection.create_index(
+            [("slurm.cluster_name", 1), ("cw.resources.cpu_free", 1)],
+            name="cluster_name_and_cpu_free",
+        )
 
-    main_read_report_and_update_collection(
-        "nodes",
-        nodes_collection,
-        None,
-        args.cluster_name,
-        args.slurm_nodes_file,
-        from_file=args.from_existing_nodes_file,
-        want_commit_to_db=args.store_in_db,
-        dump_file=args.cw_nodes_file,
-    )
+    with metrics_exporter.measure(args.cluster_name, "nodes") as stats:
+        main_read_report_and_update_collection(
+            "nodes",
+            nodes_collection,
+            None,
+            args.cluster_name,
+            args.slurm_nodes_file,
+            from_file=args.from_existing_nodes_file,
+            want_commit_to_db=args.store_in_db,
+            dump_file=args.cw_nodes_file,
+            dump_format=args.dump_format,
+            dump_compression=args.dump_compression,
+            batch_size=args.batch_size,
+            write_chunk_size=args.write_chunk_size,
+            write_workers=args.write_workers,
+            report_archive=report_archive,
+            cluster_stats_collection=cluster_stats_collection,
+            stats=stats,
+        )
 
 
 if __name__ == "__main__":
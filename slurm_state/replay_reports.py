@@ -0,0 +1,292 @@
+"""
+Replay the archived sacct and sinfo reports (see the --report_archive_folder
+option of read_report_commit_to_db.py and ingest_daemon.py) through the
+ingestion pipeline, for instance to rebuild the history of the jobs after a
+change of the parsers, without querying the clusters again.
+
+The version of Slurm used to parse each report is the one given by
+--slurm_version, or else the one configured for the cluster, or else the
+release stored in the "meta" object of the report. The clusters are thus
+never contacted to retrieve it.
+
+The reports of each cluster are replayed in the order in which they have been
+retrieved, while the clusters are replayed in parallel. The database is given
+by --mongodb_collection, so that a scratch database can be used to validate
+a new parser against real reports.
+
+Example:
+    python3 -m slurm_state.replay_reports --report_archive_folder /tmp/report_archive \\
+        --start 2024-01-01 --end 2024-02-01 --mongodb_collection clockwork_replay
+"""
+
+import argparse
+import concurrent.futures
+import logging
+import time
+from datetime import datetime
+
+from slurm_state.helpers.clusters_helper import get_all_clusters
+from slurm_state.helpers.ingest_stats_helper import IngestStats
+from slurm_state.helpers.jobs_indexes_helper import (
+    create_jobs_identifying_index,
+    create_jobs_sorting_indexes,
+)
+from slurm_state.helpers.report_archive_helper import ReportArchive
+from slurm_state.mongo_client import get_mongo_client
+from slurm_state.mongo_update import (
+    DEFAULT_BATCH_SIZE,
+    get_report_slurm_version,
+    main_read_report_and_update_collection,
+)
+
+# Default number of clusters replayed at the same time
+DEFAULT_MAX_WORKERS = 4
+
+
+def get_replay_slurm_version(cluster_name, report_path, slurm_version=None):
+    """
+    Determine the version of Slurm used to parse an archived report, without
+    contacting the cluster.
+
+    Parameters:
+        cluster_name    Name of the cluster which produced the report
+        report_path     Path of the archived report
+        slurm_version   Version requested for the replay, if any
+
+    Returns:
+        The requested version, or the version configured for the cluster, or
+        the release stored in the report
+
+    Raises:
+        ValueError if none of them is available
+    """
+    if slurm_version is None:
+        slurm_version = get_all_clusters()[cluster_name].get("slurm_version")
+    if slurm_version is None:
+        slurm_version = get_report_slurm_version(report_path)
+    if slurm_version is None:
+        raise ValueError(
+            f"The Slurm version of the report {report_path} is unknown: it should be given with --slurm_version."
+        )
+    return slurm_version
+
+
+def replay_cluster_reports(
+    db,
+    report_archive,
+    cluster_name,
+    entities,
+    start_time=None,
+    end_time=None,
+    slurm_version=None,
+    **kwargs,
+):
+    """
+    Replay the archived reports of a cluster, in the order in which they have been retrieved.
+
+    Parameters:
+        db              Database in which the jobs and nodes are stored
+        report_archive  ReportArchive containing the reports
+        cluster_name    Name of the cluster whose reports are replayed
+        entities        List of the entities ("jobs" and/or "nodes") to replay
+        start_time      If not None, only the reports retrieved at or after this timestamp are replayed
+        end_time        If not None, only the reports retrieved before this timestamp are replayed
+        slurm_version   Version of Slurm used to parse the reports. Default is None (see
+                        get_replay_slurm_version)
+        **kwargs        Other parameters of main_read_report_and_update_collection
+
+    Returns:
+        The IngestStats of the replay, counting the replayed "reports"
+    """
+    stats = IngestStats()
+    L_reports = sorted(
+        (timestamp, entity, path)
+        for entity in entities
+        for (timestamp, path) in report_archive.list_reports(
+            cluster_name, entity, start_time=start_time, end_time=end_time
+        )
+    )
+    logging.info(f"Replaying {len(L_reports)} reports of {cluster_name}.")
+
+    for (timestamp, entity, path) in L_reports:
+        main_read_report_and_update_collection(
+            entity,
+            db[entity],
+            db["users"] if entity == "jobs" else None,
+            cluster_name,
+            path,
+            from_file=True,
+            # The jobs are ordered by the time at which the report has been retrieved
+            source_timestamp=timestamp,
+            slurm_version=get_replay_slurm_version(
+                cluster_name, path, slurm_version=slurm_version
+            ),
+            stats=stats,
+            **kwargs,
+        )
+        stats.count("reports")
+    return stats
+
+
+def replay_reports(
+    db,
+    report_archive,
+    cluster_names,
+    entities,
+    start_time=None,
+    end_time=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    **kwargs,
+):
+    """
+    Replay the archived reports of several clusters in parallel.
+
+    Parameters:
+        db              Database in which the jobs and nodes are stored
+        report_archive  ReportArchive containing the reports
+        cluster_names   Names of the clusters whose reports are replayed
+        entities        List of the entities ("jobs" and/or "nodes") to replay
+        start_time      If not None, only the reports retrieved at or after this timestamp are replayed
+        end_time        If not None, only the reports retrieved before this timestamp are replayed
+        max_workers     Maximum number of clusters replayed at the same time
+        **kwargs        Other parameters of main_read_report_and_update_collection
+
+    Returns:
+        A dictionary associating the name of each cluster to the IngestStats of its replay
+
+    Raises:
+        The first error raised while replaying the reports of a cluster, once all
+        the clusters have been replayed
+    """
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="replay"
+    ) as executor:
+        D_futures = {
+            cluster_name: executor.submit(
+                replay_cluster_reports,
+                db,
+                report_archive,
+                cluster_name,
+                entities,
+                start_time=start_time,
+                end_time=end_time,
+                **kwargs,
+            )
+            for cluster_name in cluster_names
+        }
+    return {
+        cluster_name: future.result() for (cluster_name, future) in D_futures.items()
+    }
+
+
+def parse_time(value):
+    """
+    Convert a command-line time, given as a timestamp or in the ISO format
+    (such as "2024-01-31" or "2024-01-31T12:00:00", in local time), into a timestamp.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog=argv[0],
+        description="Replay the archived Slurm reports into the database.",
+    )
+    parser.add_argument(
+        "--report_archive_folder",
+        required=True,
+        help="Folder in which the reports have been archived.",
+    )
+    parser.add_argument(
+        "--clusters",
+        nargs="+",
+        help="Names of the clusters to replay. By default, all the archived clusters are replayed.",
+    )
+    parser.add_argument(
+        "--entities",
+        nargs="+",
+        choices=["jobs", "nodes"],
+        default=["jobs", "nodes"],
+        help="Entities to replay.",
+    )
+    parser.add_argument(
+        "--start",
+        type=parse_time,
+        help="Only replay the reports retrieved at or after this time (timestamp or ISO format).",
+    )
+    parser.add_argument(
+        "--end",
+        type=parse_time,
+        help="Only replay the reports retrieved before this time (timestamp or ISO format).",
+    )
+    parser.add_argument(
+        "--mongodb_collection",
+        default="clockwork",
+        help="Collection to populate. A scratch one can be used to validate the parsers.",
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of clusters replayed at the same time.",
+    )
+    parser.add_argument(
+        "--slurm_version",
+        help="Version of Slurm used to parse the reports. By default, the version configured for "
+        "each cluster is used, or else the release stored in each report.",
+    )
+    parser.add_argument(
+        "--unchanged_jobs",
+        choices=["touch", "skip"],
+        default="touch",
+        help="How to handle the jobs whose Slurm data did not change since the last update.",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of jobs or nodes read from the report, compared to the database and written at once.",
+    )
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(threadName)s %(message)s"
+    )
+
+    report_archive = ReportArchive(args.report_archive_folder)
+    L_cluster_names = args.clusters or report_archive.get_cluster_names()
+    assert L_cluster_names, "No cluster to replay."
+
+    db = get_mongo_client()[args.mongodb_collection]
+    create_jobs_identifying_index(db["jobs"])
+    create_jobs_sorting_indexes(db["jobs"])
+    db["nodes"].create_index(
+        [("slurm.name", 1), ("slurm.cluster_name", 1)],
+        name="name_and_cluster_name",
+    )
+
+    timestamp_start = time.time()
+    D_stats = replay_reports(
+        db,
+        report_archive,
+        L_cluster_names,
+        args.entities,
+        start_time=args.start,
+        end_time=args.end,
+        max_workers=args.max_workers,
+        slurm_version=args.slurm_version,
+        unchanged_jobs=args.unchanged_jobs,
+        batch_size=args.batch_size,
+    )
+    for (cluster_name, stats) in D_stats.items():
+        logging.info(f"{cluster_name}: {stats.to_dict()}")
+    logging.info(f"Replay took {time.time() - timestamp_start:.1f} seconds.")
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(sys.argv)
@@ -6,7 +6,7 @@ import json, os
 
 # Imports related to sacct call
 # https://docs.paramiko.org/en/stable/api/client.html
-from slurm_state.helpers.ssh_helper import open_connection
+from slurm_state.helpers.ssh_helper import DEFAULT_COMMAND_TIMEOUT, open_connection
 from slurm_state.helpers.clusters_helper import get_all_clusters
 
 # These functions are translators used in order to handle the values
@@ -423,7 +423,9 @@ def generate_job_report(
 
         if ssh_client:
             # those three variables are file-like, not strings
-            ssh_stdin, ssh_stdout, ssh_stderr = ssh_client.exec_command(remote_cmd)
+            ssh_stdin, ssh_stdout, ssh_stderr = ssh_client.exec_command(
+                remote_cmd, timeout=DEFAULT_COMMAND_TIMEOUT
+            )
 
             # We should find a better option to retrieve stderr
             """
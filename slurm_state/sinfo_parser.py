@@ -6,7 +6,7 @@ to nodes in the format used by Clockwork.
 import json, os
 
 # Imports to retrieve the values related to sinfo call
-from slurm_state.helpers.ssh_helper import open_connection
+from slurm_state.helpers.ssh_helper import DEFAULT_COMMAND_TIMEOUT, open_connection
 from slurm_state.helpers.clusters_helper import get_all_clusters
 
 # These functions are translators used in order to handle the values
@@ -220,7 +220,9 @@ def generate_node_report(
 
     if ssh_client:
         # those three variables are file-like, not strings
-        ssh_stdin, ssh_stdout, ssh_stderr = ssh_client.exec_command(remote_cmd)
+        ssh_stdin, ssh_stdout, ssh_stderr = ssh_client.exec_command(
+            remote_cmd, timeout=DEFAULT_COMMAND_TIMEOUT
+        )
 
         # We should find a better option to retrieve stderr
         """
@@ -0,0 +1,142 @@
+"""
+Tests for slurm_state.helpers.bulk_write_helper
+"""
+
+import threading
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from slurm_state.helpers.bulk_write_helper import BulkWriter
+
+import pytest
+
+
+class FakeResult:
+    def __init__(self, bulk_api_result):
+        self.bulk_api_result = bulk_api_result
+
+
+class FakeCollection:
+    """
+    Collection recording the operations it receives. The errors to raise
+    can be given, as functions returning an exception (or None) from the
+    operations of a bulk_write.
+    """
+
+    name = "fake"
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def bulk_write(self, operations, ordered=True):
+        assert not ordered
+        with self.lock:
+            self.calls.append(list(operations))
+            error = self.errors.pop(0)(operations) if self.errors else None
+        if error is not None:
+            raise error
+        return FakeResult({"nInserted": len(operations)})
+
+
+def test_bulk_writer_chunks():
+    """
+    Test that the operations are sent by chunks, all of them being written.
+    """
+    collection = FakeCollection()
+    writer = BulkWriter(collection, chunk_size=3, max_workers=2)
+    L_operations = [InsertOne({"i": i}) for i in range(10)]
+    writer.write(L_operations)
+    writer.write(L_operations[:2])
+
+    assert sorted(len(call) for call in collection.calls) == [1, 2, 3, 3, 3]
+    assert writer.counts["nInserted"] == 12
+    assert writer.nb_operations == 12
+    assert len(writer.chunk_latencies) == 5
+    assert "12 operations written in 5 chunks" in writer.get_summary()
+
+
+def test_bulk_writer_retries_transient_errors():
+    """
+    Test that only the operations which failed with a retryable error are retried.
+    """
+
+    def partial_failure(operations):
+        return BulkWriteError(
+            {
+                "nInserted": 2,
+                "writeErrors": [
+                    {"index": 1, "code": 189, "errmsg": "PrimarySteppedDown"}
+                ],
+            }
+        )
+
+    collection = FakeCollection(
+        errors=[lambda operations: AutoReconnect("reconnect"), partial_failure]
+    )
+    writer = BulkWriter(collection, chunk_size=10, backoff=0)
+    L_operations = [InsertOne({"i": i}) for i in range(3)]
+    writer.write(L_operations)
+
+    # The whole chunk, the whole chunk again, then the failed operation only
+    assert collection.calls == [L_operations, L_operations, [L_operations[1]]]
+    assert writer.counts["nInserted"] == 3
+    assert writer.nb_retries == 2
+
+
+def test_bulk_writer_raises_other_errors():
+    """
+    Test that a non retryable error is raised once the other chunks are written,
+    and that the retries are bounded.
+    """
+
+    def validation_failure(operations):
+        return BulkWriteError(
+            {
+                "nInserted": 0,
+                "writeErrors": [
+                    {"index": 0, "code": 121, "errmsg": "DocumentValidationFailure"}
+                ],
+            }
+        )
+
+    collection = FakeCollection(errors=[validation_failure])
+    writer = BulkWriter(collection, chunk_size=1, max_workers=1)
+    with pytest.raises(BulkWriteError):
+        writer.write([UpdateOne({"i": i}, {"$set": {"i": i}}) for i in range(3)])
+    assert len(collection.calls) == 3
+    assert writer.counts["nInserted"] == 2
+
+    collection = FakeCollection(
+        errors=[lambda operations: AutoReconnect("reconnect")] * 10
+    )
+    writer = BulkWriter(collection, max_retries=2, backoff=0)
+    with pytest.raises(AutoReconnect):
+        writer.write([InsertOne({"i": 0})])
+    assert len(collection.calls) == 3
+
+
+def test_bulk_writer_counts_write_conflicts():
+    """
+    Test that the duplicate key errors are counted as write conflicts,
+    neither raised nor retried.
+    """
+
+    def duplicate_key(operations):
+        return BulkWriteError(
+            {
+                "nUpserted": 1,
+                "writeErrors": [{"index": 1, "code": 11000, "errmsg": "E11000"}],
+            }
+        )
+
+    collection = FakeCollection(errors=[duplicate_key])
+    writer = BulkWriter(collection, chunk_size=10, backoff=0)
+    writer.write(
+        [UpdateOne({"i": i}, {"$setOnInsert": {"i": i}}, upsert=True) for i in range(2)]
+    )
+    assert len(collection.calls) == 1
+    assert writer.counts["nUpserted"] == 1
+    assert (writer.nb_conflicts, writer.nb_retries) == (1, 0)
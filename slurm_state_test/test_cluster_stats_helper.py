@@ -0,0 +1,154 @@
+"""
+Tests for slurm_state.helpers.cluster_stats_helper
+"""
+
+from slurm_state.config import get_config
+from slurm_state.helpers import cluster_stats_helper
+from slurm_state.helpers.cluster_stats_helper import (
+    compute_jobs_stats,
+    create_cluster_stats_indexes,
+    get_cluster_stats,
+    update_jobs_stats_from_events,
+)
+from slurm_state.mongo_client import get_mongo_client
+from slurm_state.mongo_update import main_read_report_and_update_collection
+
+
+def test_cluster_stats(monkeypatch):
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    for collection_name in ["test_jobs", "test_nodes", "test_cluster_stats"]:
+        db.drop_collection(collection_name)
+    create_cluster_stats_indexes(db.test_cluster_stats, db.test_jobs)
+
+    # Count the summaries of the jobs computed from all the jobs of the cluster
+    L_full_computations = []
+
+    def counted_compute_jobs_stats(jobs_collection, cluster_name):
+        L_full_computations.append(cluster_name)
+        return compute_jobs_stats(jobs_collection, cluster_name)
+
+    monkeypatch.setattr(
+        cluster_stats_helper, "compute_jobs_stats", counted_compute_jobs_stats
+    )
+
+    def read_report(entity, collection, cluster_name, report_path):
+        return main_read_report_and_update_collection(
+            entity,
+            collection,
+            db.test_users if entity == "jobs" else None,
+            cluster_name,
+            report_path,
+            from_file=True,
+            cluster_stats_collection=db.test_cluster_stats,
+        )
+
+    try:
+        # The summary is refreshed after each commit
+        stats = read_report(
+            "jobs", db.test_jobs, "cedar", "slurm_state_test/files/sacct_1"
+        )
+        assert "cluster_stats" in stats.stage_durations
+        D_jobs_stats = get_cluster_stats(db.test_cluster_stats, "cedar")["jobs"]
+        assert D_jobs_stats["nb_jobs"] == 2
+        assert D_jobs_stats["nb_jobs_by_state"] == {"NODE_FAIL": 1, "REQUEUED": 1}
+
+        assert L_full_computations == ["cedar"]
+
+        # The next commits update the summary from the changes of the written jobs
+        read_report("jobs", db.test_jobs, "cedar", "slurm_state_test/files/sacct_2")
+        assert L_full_computations == ["cedar"]
+        D_jobs_stats = get_cluster_stats(db.test_cluster_stats, "cedar")["jobs"]
+        assert D_jobs_stats["nb_jobs"] == 3
+        assert {
+            state: nb_jobs
+            for (state, nb_jobs) in D_jobs_stats["nb_jobs_by_state"].items()
+            if nb_jobs
+        } == {"NODE_FAIL": 1, "REQUEUED": 2}
+        L_job_dates = [
+            D_job["cw"]["last_slurm_update"] for D_job in db.test_jobs.find()
+        ]
+        assert D_jobs_stats["job_dates"] == {
+            "min": min(L_job_dates),
+            "max": max(L_job_dates),
+        }
+
+        # The summary of the nodes of another cluster is stored in its own document
+        read_report("nodes", db.test_nodes, "mila", "slurm_state_test/files/sinfo_2")
+        D_cluster_stats = get_cluster_stats(db.test_cluster_stats, "mila")
+        assert "jobs" not in D_cluster_stats
+        assert get_cluster_stats(db.test_cluster_stats, "cedar")["jobs"] == (
+            D_jobs_stats
+        )
+        D_nodes_stats = D_cluster_stats["nodes"]
+        LD_nodes = list(db.test_nodes.find())
+        assert D_nodes_stats["nb_nodes"] == len(LD_nodes) == 2
+        assert sum(D_nodes_stats["nb_nodes_by_state"].values()) == 2
+        assert D_nodes_stats["gpu_total"] == sum(
+            D_node["cw"]["resources"]["gpu_total"] for D_node in LD_nodes
+        )
+        assert D_nodes_stats["gpu_free"] == (
+            D_nodes_stats["gpu_total"] - D_nodes_stats["gpu_used"]
+        )
+
+        assert db.test_cluster_stats.count_documents({}) == 2
+        assert get_cluster_stats(db.test_cluster_stats, "graham") is None
+    finally:
+        for collection_name in ["test_jobs", "test_nodes", "test_cluster_stats"]:
+            db.drop_collection(collection_name)
+
+
+def test_update_jobs_stats_full_refresh():
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    for collection_name in ["test_jobs", "test_cluster_stats"]:
+        db.drop_collection(collection_name)
+
+    try:
+        db.test_jobs.insert_many(
+            [
+                {
+                    "slurm": {"cluster_name": "mila", "job_state": "RUNNING"},
+                    "cw": {"last_slurm_update": 100.0},
+                },
+                {
+                    "slurm": {"cluster_name": "mila", "job_state": "PENDING"},
+                    "cw": {"last_slurm_update": 200.0},
+                },
+            ]
+        )
+
+        def update(D_jobs_stats_delta, latest_job_update, now):
+            update_jobs_stats_from_events(
+                db.test_cluster_stats,
+                db.test_jobs,
+                "mila",
+                D_jobs_stats_delta,
+                latest_job_update,
+                now=now,
+                full_refresh_interval=1000,
+            )
+            return get_cluster_stats(db.test_cluster_stats, "mila")["jobs"]
+
+        # The summary is computed from the jobs the first time
+        D_jobs_stats = update({}, 200.0, now=300.0)
+        assert D_jobs_stats["nb_jobs_by_state"] == {"RUNNING": 1, "PENDING": 1}
+        assert D_jobs_stats["last_full_refresh"] == 300.0
+
+        # Then the changes are applied, even if they drift from the jobs
+        D_jobs_stats = update(
+            {"nb_jobs": 1, "nb_jobs_by_state": {"PENDING": -1, "RUNNING": 2}},
+            400.0,
+            now=500.0,
+        )
+        assert D_jobs_stats["nb_jobs"] == 3
+        assert D_jobs_stats["nb_jobs_by_state"] == {"RUNNING": 3, "PENDING": 0}
+        assert D_jobs_stats["job_dates"] == {"min": 100.0, "max": 400.0}
+        assert D_jobs_stats["last_full_refresh"] == 300.0
+
+        # Until the summary is recomputed
+        D_jobs_stats = update({}, None, now=1300.0)
+        assert D_jobs_stats["nb_jobs"] == 2
+        assert D_jobs_stats["nb_jobs_by_state"] == {"RUNNING": 1, "PENDING": 1}
+        assert D_jobs_stats["last_full_refresh"] == 1300.0
+    finally:
+        for collection_name in ["test_jobs", "test_cluster_stats"]:
+            db.drop_collection(collection_name)
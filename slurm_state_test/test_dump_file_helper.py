@@ -0,0 +1,85 @@
+"""
+Tests for slurm_state.helpers.dump_file_helper
+"""
+
+import json
+
+import pytest
+
+from slurm_state.helpers.dump_file_helper import (
+    JSONListWriter,
+    get_dump_file_compression,
+    get_dump_writer,
+    iter_dump_file,
+)
+
+ELEMENTS = [
+    {"slurm": {"job_id": "1", "nodes": ["a", "b"]}, "cw": {}, "user": {}},
+    {"a": 1},
+    {"b": {"c": [1, 2, {"d": None}]}},
+    {"e": "multi\nline"},
+]
+
+
+@pytest.mark.parametrize(
+    "elements",
+    [
+        [],
+        [{"slurm": {"job_id": "1", "nodes": ["a", "b"]}, "cw": {}, "user": {}}],
+        [{"a": 1}, {"b": {"c": [1, 2, {"d": None}]}}, {"e": "multi\nline"}],
+    ],
+)
+def test_json_list_writer(tmp_path, elements):
+    """
+    Check that the elements written one by one produce the same file
+    as json.dump with an indentation of 4.
+    """
+    with JSONListWriter(tmp_path / "dump.json") as writer:
+        writer.write_all(elements)
+    with open(tmp_path / "expected.json", "w") as f:
+        json.dump(elements, f, indent=4)
+
+    assert (tmp_path / "dump.json").read_text() == (
+        tmp_path / "expected.json"
+    ).read_text()
+    assert writer.nb_elements == len(elements)
+
+
+@pytest.mark.parametrize(
+    "dump_format,compression",
+    [
+        ("json", "none"),
+        ("jsonl", "none"),
+        ("jsonl", "gzip"),
+        ("jsonl", "zstd"),
+    ],
+)
+@pytest.mark.parametrize("elements", [[], ELEMENTS])
+def test_iter_dump_file(tmp_path, dump_format, compression, elements):
+    """
+    Check that the elements written in any format are read back lazily.
+    """
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+
+    dump_file = tmp_path / "dump"
+    with get_dump_writer(
+        dump_file, dump_format=dump_format, compression=compression
+    ) as writer:
+        writer.write_all(elements)
+
+    assert writer.nb_elements == len(elements)
+    assert get_dump_file_compression(dump_file) == compression
+    assert list(iter_dump_file(dump_file)) == elements
+
+
+def test_jsonl_dump_file_content(tmp_path):
+    """
+    Check that each element is written on its own line, without indentation.
+    """
+    with get_dump_writer(tmp_path / "dump.jsonl", dump_format="jsonl") as writer:
+        writer.write_all(ELEMENTS)
+
+    L_lines = (tmp_path / "dump.jsonl").read_text().splitlines()
+    assert [json.loads(line) for line in L_lines] == ELEMENTS
+    assert L_lines[1] == '{"a":1}'
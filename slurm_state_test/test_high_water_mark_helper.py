@@ -0,0 +1,140 @@
+from slurm_state.helpers.high_water_mark_helper import *
+from slurm_state.mongo_client import get_mongo_client
+from slurm_state.mongo_update import main_read_jobs_since_high_water_mark
+from slurm_state.config import get_config
+from slurm_state.helpers.dump_file_helper import iter_dump_file
+from slurm_state.helpers.report_archive_helper import ReportArchive
+from slurm_state.parsers.job_parser import JobParser
+
+import pytest
+import shutil
+
+
+def test_compute_sacct_windows_without_high_water_mark():
+    assert compute_sacct_windows(None, 10000, default_window=600) == [(9400, 10000)]
+
+
+def test_compute_sacct_windows_with_overlap():
+    assert compute_sacct_windows(9700, 10000, overlap=60) == [(9640, 10000)]
+
+
+def test_compute_sacct_windows_split():
+    assert compute_sacct_windows(1000, 10000, overlap=0, max_window=4000) == [
+        (1000, 5000),
+        (5000, 9000),
+        (9000, 10000),
+    ]
+
+
+def test_compute_sacct_windows_high_water_mark_in_the_future():
+    assert compute_sacct_windows(20000, 10000, overlap=60) == [(9940, 10000)]
+
+
+def test_high_water_mark_never_goes_backward():
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    db.drop_collection("test_high_water_marks")
+
+    assert get_high_water_mark(db.test_high_water_marks, "cedar") is None
+    set_high_water_mark(db.test_high_water_marks, "cedar", 2000)
+    set_high_water_mark(db.test_high_water_marks, "cedar", 1000)
+    assert get_high_water_mark(db.test_high_water_marks, "cedar") == 2000
+    assert get_high_water_mark(db.test_high_water_marks, "mila") is None
+
+    db.drop_collection("test_high_water_marks")
+
+
+def test_format_sacct_time():
+    # The test configuration defines cedar in the timezone America/Vancouver
+    assert JobParser("cedar").format_sacct_time(1700000000) == "2023-11-14T14:13:20"
+
+
+def test_main_read_jobs_since_high_water_mark(monkeypatch, tmp_path):
+    L_windows = []
+
+    def generate_report(self, file_name, start_time=None, end_time=None):
+        L_windows.append((start_time, end_time))
+        shutil.copyfile("slurm_state_test/files/sacct_1", file_name)
+
+    monkeypatch.setattr(JobParser, "generate_report", generate_report)
+
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    db.drop_collection("test_jobs")
+    db.drop_collection("test_high_water_marks")
+    report_file_path = str(tmp_path / "sacct_windows")
+
+    try:
+        set_high_water_mark(db.test_high_water_marks, "cedar", 1000)
+        stats = main_read_jobs_since_high_water_mark(
+            db.test_jobs,
+            db.test_users,
+            db.test_high_water_marks,
+            "cedar",
+            report_file_path,
+            sacct_overlap=100,
+            sacct_max_window=3000,
+            now=5000,
+            report_archive=ReportArchive(tmp_path / "archive"),
+            dump_file=str(tmp_path / "jobs.jsonl"),
+            dump_format="jsonl",
+        )
+
+        assert L_windows == [(900, 3900), (3900, 5000)]
+        assert stats.counters["sacct_windows"] == 2
+        # The report of each window has been archived, under the timestamp
+        # its jobs have been stored with
+        L_timestamps = [
+            timestamp
+            for (timestamp, _) in ReportArchive(tmp_path / "archive").list_reports(
+                "cedar", "jobs"
+            )
+        ]
+        assert len(L_timestamps) == 2
+        for D_job in db.test_jobs.find():
+            assert abs(D_job["cw"]["source_timestamp"] - L_timestamps[-1]) < 1e-3
+        assert get_high_water_mark(db.test_high_water_marks, "cedar") == 5000
+        # The same jobs have been retrieved in both windows
+        assert db.test_jobs.count_documents({}) == 2
+        # The jobs of both windows have been dumped
+        assert sorted(
+            D_job["slurm"]["job_id"]
+            for D_job in iter_dump_file(str(tmp_path / "jobs.jsonl"))
+        ) == ["10", "10", "20", "20"]
+    finally:
+        db.drop_collection("test_jobs")
+        db.drop_collection("test_high_water_marks")
+
+
+def test_main_read_jobs_since_high_water_mark_truncated_report(monkeypatch, tmp_path):
+    def generate_report(self, file_name, start_time=None, end_time=None):
+        # The transfer of the report has been interrupted
+        with open("slurm_state_test/files/sacct_1", "r") as f_in, open(
+            file_name, "w"
+        ) as f_out:
+            content = f_in.read()
+            f_out.write(content[: len(content) // 2])
+
+    monkeypatch.setattr(JobParser, "generate_report", generate_report)
+
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    db.drop_collection("test_jobs")
+    db.drop_collection("test_high_water_marks")
+
+    try:
+        set_high_water_mark(db.test_high_water_marks, "cedar", 1000)
+        with pytest.raises(Exception):
+            main_read_jobs_since_high_water_mark(
+                db.test_jobs,
+                db.test_users,
+                db.test_high_water_marks,
+                "cedar",
+                str(tmp_path / "sacct_windows"),
+                sacct_overlap=100,
+                sacct_max_window=3000,
+                now=5000,
+            )
+
+        # The window will be retrieved again by the next run
+        assert get_high_water_mark(db.test_high_water_marks, "cedar") == 1000
+    finally:
+        db.drop_collection("test_jobs")
+        db.drop_collection("test_high_water_marks")
@@ -0,0 +1,153 @@
+"""
+Tests for slurm_state.ingest_daemon
+"""
+
+import threading
+
+from slurm_state.config import get_config
+from slurm_state.helpers.clusters_helper import get_all_clusters
+from slurm_state.ingest_daemon import IngestScheduler, IngestTask, get_ingest_tasks
+from slurm_state.mongo_client import get_mongo_client
+
+import pytest
+
+
+@pytest.fixture
+def status_collection():
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+    db.drop_collection("test_ingest_status")
+    yield db.test_ingest_status
+    db.drop_collection("test_ingest_status")
+
+
+def test_get_ingest_tasks():
+    """
+    Test that a task is created for the jobs and the nodes of each requested cluster.
+    """
+    L_tasks = get_ingest_tasks(get_all_clusters(), ["mila", "beluga"])
+    assert sorted((task.cluster_name, task.entity) for task in L_tasks) == [
+        ("beluga", "jobs"),
+        ("beluga", "nodes"),
+        ("mila", "jobs"),
+        ("mila", "nodes"),
+    ]
+    assert all(task.interval == 300 for task in L_tasks)
+
+
+def test_ingest_scheduler(status_collection):
+    """
+    Test that the tasks run on their own interval, that a hanging task
+    neither runs twice nor blocks the other ones, that it is abandoned after
+    the timeout, and that the outcomes of the ingestions are stored.
+    """
+    now = [0]
+    release_hanging_task = threading.Event()
+    L_calls = []
+
+    def ingest(cluster_name, entity):
+        L_calls.append((cluster_name, entity))
+        if cluster_name == "hanging":
+            release_hanging_task.wait()
+        if cluster_name == "failing":
+            raise ValueError("sacct failed")
+
+    L_tasks = [
+        IngestTask("mila", "jobs", 10),
+        IngestTask("failing", "jobs", 10),
+        IngestTask("hanging", "nodes", 10),
+    ]
+    scheduler = IngestScheduler(
+        L_tasks,
+        ingest,
+        status_collection=status_collection,
+        max_workers=3,
+        timeout=15,
+        clock=lambda: now[0],
+    )
+
+    def wait_for_tasks(*cluster_names):
+        for task in L_tasks:
+            if task.cluster_name in cluster_names:
+                task.future.result()
+
+    assert scheduler.tick() == 10
+    wait_for_tasks("mila", "failing")
+    assert sorted(L_calls) == [
+        ("failing", "jobs"),
+        ("hanging", "nodes"),
+        ("mila", "jobs"),
+    ]
+
+    # Nothing is due before the interval
+    now[0] = 5
+    assert scheduler.tick() == 5
+    assert len(L_calls) == 3
+
+    # The hanging task is not run again before the timeout
+    now[0] = 12
+    scheduler.tick()
+    wait_for_tasks("mila", "failing")
+    assert len(L_calls) == 5
+    assert L_tasks[2].nb_abandoned_runs == 0
+
+    # The hanging task is abandoned after the timeout, and run again
+    now[0] = 22
+    scheduler.tick()
+    wait_for_tasks("mila", "failing")
+    assert len(L_calls) == 8
+    assert L_tasks[2].nb_abandoned_runs == 1
+    assert (
+        status_collection.find_one({"cluster_name": "hanging"})["last_error"]
+        == "TimeoutError: the ingestion did not end within 15 seconds"
+    )
+
+    release_hanging_task.set()
+    scheduler.wait()
+
+    D_status = {D["cluster_name"]: D for D in status_collection.find({}, {"_id": 0})}
+    assert D_status["mila"]["nb_runs"] == 3
+    assert D_status["mila"]["last_error"] is None
+    assert "last_success" in D_status["mila"]
+    assert D_status["failing"]["nb_failures"] == 3
+    assert D_status["failing"]["last_error"] == "ValueError: sacct failed"
+    assert "last_success" not in D_status["failing"]
+    # The outcome of the abandoned run is ignored
+    assert D_status["hanging"]["nb_runs"] == 2
+    assert D_status["hanging"]["nb_failures"] == 1
+    assert D_status["hanging"]["last_error"] is None
+
+
+def test_ingest_scheduler_releases_abandoned_workers():
+    """
+    Test that a hanging task occupying all the workers does not stop the other
+    tasks once it has been abandoned.
+    """
+    now = [0]
+    release_hanging_task = threading.Event()
+    L_calls = []
+
+    def ingest(cluster_name, entity):
+        L_calls.append(cluster_name)
+        if cluster_name == "hanging":
+            release_hanging_task.wait()
+
+    L_tasks = [IngestTask("hanging", "jobs", 10), IngestTask("mila", "jobs", 10)]
+    scheduler = IngestScheduler(
+        L_tasks, ingest, max_workers=1, timeout=15, clock=lambda: now[0]
+    )
+    try:
+        scheduler.tick()
+        now[0] = 10
+        scheduler.tick()
+        assert L_calls == ["hanging"]
+
+        # The worker of the hanging task is released for the task waiting the longest
+        now[0] = 20
+        scheduler.tick()
+        L_tasks[1].future.result()
+        assert L_calls == ["hanging", "mila"]
+        assert L_tasks[0].future is None
+    finally:
+        release_hanging_task.set()
+        scheduler.wait()
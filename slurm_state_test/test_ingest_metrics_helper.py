@@ -0,0 +1,89 @@
+"""
+Tests for slurm_state.helpers.ingest_metrics_helper
+"""
+
+from datetime import timezone
+
+import pytest
+
+from slurm_state.config import get_config
+from slurm_state.helpers.ingest_metrics_helper import (
+    IngestMetricsExporter,
+    create_ingest_runs_indexes,
+)
+from slurm_state.mongo_client import get_mongo_client
+from slurm_state.mongo_update import main_read_report_and_update_collection
+
+
+def test_measure_ingestion(tmp_path):
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    db.drop_collection("test_ingest_runs")
+    db.drop_collection("test_nodes")
+    create_ingest_runs_indexes(db.test_ingest_runs, ttl=3600)
+    textfile_path = tmp_path / "clockwork_ingest.prom"
+    metrics_exporter = IngestMetricsExporter(
+        textfile_path=str(textfile_path), ingest_runs_collection=db.test_ingest_runs
+    )
+
+    try:
+        with metrics_exporter.measure("mila", "nodes") as stats:
+            main_read_report_and_update_collection(
+                "nodes",
+                db.test_nodes,
+                None,
+                "mila",
+                "slurm_state_test/files/sinfo_1",
+                from_file=True,
+                stats=stats,
+            )
+        with pytest.raises(ValueError):
+            with metrics_exporter.measure("cedar", "jobs"):
+                raise ValueError("Failed ingestion")
+
+        D_run = db.test_ingest_runs.find_one({"cluster_name": "mila"})
+        assert D_run["entity"] == "nodes"
+        assert D_run["error"] is None
+        assert D_run["counters"]["nodes"] == 2
+        assert set(D_run["stage_durations"]) == {"parse", "convert", "diff", "write"}
+        # The runs are removed by the TTL index once their date is too old. The
+        # dates are stored by MongoDB in UTC, with a precision of a millisecond
+        assert (
+            abs(D_run["date"].replace(tzinfo=timezone.utc).timestamp() - D_run["start"])
+            < 1e-3
+        )
+        assert (
+            db.test_ingest_runs.index_information()["date_ttl"]["expireAfterSeconds"]
+            == 3600
+        )
+        assert (
+            db.test_ingest_runs.find_one({"cluster_name": "cedar"})["error"]
+            == "Failed ingestion"
+        )
+
+        # Each cluster and entity has its own textfile
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            "clockwork_ingest.cedar.jobs.prom",
+            "clockwork_ingest.mila.nodes.prom",
+        ]
+        L_lines = (
+            (tmp_path / "clockwork_ingest.mila.nodes.prom").read_text().splitlines()
+        )
+        assert "# TYPE clockwork_ingest_last_run_nodes gauge" in L_lines
+        assert 'clockwork_ingest_last_run_nodes{cluster="mila",entity="nodes"} 2' in (
+            L_lines
+        )
+        assert 'clockwork_ingest_last_run_success{cluster="mila",entity="nodes"} 1' in (
+            L_lines
+        )
+        assert 'clockwork_ingest_last_run_success{cluster="cedar",entity="jobs"} 0' in (
+            (tmp_path / "clockwork_ingest.cedar.jobs.prom").read_text().splitlines()
+        )
+        assert any(
+            line.startswith(
+                'clockwork_ingest_stage_duration_seconds{cluster="mila",entity="nodes",stage="parse"} '
+            )
+            for line in L_lines
+        )
+    finally:
+        db.drop_collection("test_ingest_runs")
+        db.drop_collection("test_nodes")
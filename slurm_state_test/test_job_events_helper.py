@@ -0,0 +1,127 @@
+"""
+Tests for slurm_state.helpers.job_events_helper
+"""
+
+from datetime import timezone
+
+from slurm_state.config import get_config
+from slurm_state.helpers.job_events_helper import (
+    create_job_events_indexes,
+    find_job_events_since,
+    get_job_event,
+    stamp_job_events,
+)
+from slurm_state.mongo_client import get_mongo_client
+from slurm_state.mongo_update import main_read_report_and_update_collection
+
+
+def test_job_events():
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    db.drop_collection("test_jobs")
+    db.drop_collection("test_job_events")
+    create_job_events_indexes(db.test_job_events, ttl=3600)
+
+    def read_jobs(report_path):
+        main_read_report_and_update_collection(
+            "jobs",
+            db.test_jobs,
+            db.test_users,
+            "cedar",
+            report_path,
+            from_file=True,
+            job_events_collection=db.test_job_events,
+        )
+
+    def get_transitions(since=0):
+        return [
+            (D_event["job_id"], D_event["old_state"], D_event["new_state"])
+            for D_event in find_job_events_since(db.test_job_events, since, overlap=0)
+        ]
+
+    try:
+        # The new jobs produce an event
+        read_jobs("slurm_state_test/files/sacct_1")
+        assert sorted(get_transitions()) == [
+            ("10", None, "NODE_FAIL"),
+            ("20", None, "REQUEUED"),
+        ]
+        timestamp = max(D_event["timestamp"] for D_event in db.test_job_events.find())
+
+        # The job 10 changes (its end time) without changing its state
+        read_jobs("slurm_state_test/files/sacct_2")
+        assert get_transitions(timestamp) == [("30", None, "REQUEUED")]
+        timestamp = max(D_event["timestamp"] for D_event in db.test_job_events.find())
+
+        # The job 10 is stored as if it came from a previous report with another state
+        db.test_jobs.update_one(
+            {"slurm.job_id": "10"},
+            {"$set": {"slurm.job_state": "RUNNING", "cw.slurm_digest": "previous"}},
+        )
+        read_jobs("slurm_state_test/files/sacct_2")
+        L_events = list(find_job_events_since(db.test_job_events, timestamp, overlap=0))
+        assert [
+            (D_event["job_id"], D_event["old_state"], D_event["new_state"])
+            for D_event in L_events
+        ] == [("10", "RUNNING", "NODE_FAIL")]
+        assert L_events[0]["cluster_name"] == "cedar"
+        # The dates are stored by MongoDB in UTC, with a precision of a millisecond
+        assert (
+            abs(
+                L_events[0]["date"].replace(tzinfo=timezone.utc).timestamp()
+                - L_events[0]["timestamp"]
+            )
+            < 1e-3
+        )
+
+        assert [
+            D_event["job_id"]
+            for D_event in find_job_events_since(
+                db.test_job_events, 0, cluster_names=["mila"]
+            )
+        ] == []
+    finally:
+        db.drop_collection("test_jobs")
+        db.drop_collection("test_job_events")
+
+
+def test_find_job_events_since_overlap():
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    db.drop_collection("test_job_events")
+
+    def insert_event(job_id, timestamp):
+        D_event = get_job_event(
+            {
+                "slurm": {
+                    "cluster_name": "mila",
+                    "job_id": job_id,
+                    "job_state": "RUNNING",
+                },
+                "cw": {},
+            },
+            "PENDING",
+            0,
+        )
+        stamp_job_events([D_event], timestamp=timestamp)
+        db.test_job_events.insert_one(D_event)
+
+    try:
+        insert_event("1", 1000.0)
+        L_seen_ids = [
+            D_event["_id"] for D_event in find_job_events_since(db.test_job_events, 0)
+        ]
+        last_seen_timestamp = 1000.0
+
+        # An event stamped before the last seen one is inserted late
+        # by a concurrent ingestion
+        insert_event("2", 990.0)
+        insert_event("3", 1010.0)
+        L_new_job_ids = [
+            D_event["job_id"]
+            for D_event in find_job_events_since(
+                db.test_job_events, last_seen_timestamp, overlap=60
+            )
+            if D_event["_id"] not in L_seen_ids
+        ]
+        assert L_new_job_ids == ["2", "3"]
+    finally:
+        db.drop_collection("test_job_events")
@@ -0,0 +1,61 @@
+"""
+Tests for slurm_state.helpers.jobs_indexes_helper
+"""
+
+from slurm_state.config import get_config
+from slurm_state.helpers.jobs_indexes_helper import (
+    JOBS_SORTING_FIELDS,
+    create_jobs_identifying_index,
+    create_jobs_sorting_indexes,
+    get_all_jobs_sortings,
+)
+from slurm_state.mongo_client import get_mongo_client
+
+
+def test_create_jobs_sorting_indexes():
+    db = get_mongo_client()[get_config("mongo.database_name")]
+    db.drop_collection("test_jobs")
+    try:
+        # The index created by the previous versions is not unique
+        db.test_jobs.create_index(
+            [("slurm.job_id", 1), ("slurm.cluster_name", 1)],
+            name="job_id_and_cluster_name",
+        )
+        create_jobs_identifying_index(db.test_jobs)
+        create_jobs_identifying_index(db.test_jobs)
+        assert db.test_jobs.index_information()["job_id_and_cluster_name"]["unique"]
+        # The indexes can be created again when the ingestion restarts
+        create_jobs_sorting_indexes(db.test_jobs)
+        create_jobs_sorting_indexes(db.test_jobs)
+
+        D_indexes = {
+            name: D_index["key"]
+            for (name, D_index) in db.test_jobs.index_information().items()
+        }
+        # Only the default sorting is indexed, besides the identifying index
+        # and the index of the "_id"
+        assert sorted(D_indexes) == [
+            "_id_",
+            "job_id_and_cluster_name",
+            "sort_submit_time_desc",
+        ]
+        assert D_indexes["sort_submit_time_desc"] == [
+            ("slurm.submit_time", -1),
+            ("slurm.job_id", 1),
+            ("slurm.cluster_name", 1),
+        ]
+
+        create_jobs_sorting_indexes(db.test_jobs, get_all_jobs_sortings())
+        D_indexes = {
+            name: D_index["key"]
+            for (name, D_index) in db.test_jobs.index_information().items()
+        }
+        # One index per direction of each sortable field, besides the job ID
+        # sorted in ascending order, and the index of the "_id"
+        assert len(D_indexes) == 2 * len(JOBS_SORTING_FIELDS) + 1
+        assert D_indexes["sort_cluster_name_asc"] == [
+            ("slurm.cluster_name", 1),
+            ("slurm.job_id", 1),
+        ]
+    finally:
+        db.drop_collection("test_jobs")
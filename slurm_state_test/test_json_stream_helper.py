@@ -0,0 +1,143 @@
+"""
+Tests for slurm_state.helpers.json_stream_helper
+"""
+
+import io
+import json
+
+import pytest
+
+from slurm_state.helpers.json_stream_helper import (
+    iter_json_array_items,
+    read_json_object_value,
+)
+from slurm_state.parsers.job_parser import JobParser
+from slurm_state.parsers.node_parser import NodeParser
+
+
+def test_iter_json_array_items_top_level_array():
+    """
+    Test the iteration over a JSON document which is an array.
+    """
+    data = [{"a": 1}, [1, 2, {"b": "]"}], "c", 1234567, None, True]
+    f = io.StringIO(json.dumps(data))
+    assert list(iter_json_array_items(f)) == data
+
+    # Empty arrays
+    assert list(iter_json_array_items(io.StringIO(" [ ] "))) == []
+
+
+def test_iter_json_array_items_with_key():
+    """
+    Test the iteration over an array contained in a JSON object, with
+    chunks small enough to split the values.
+    """
+    data = {
+        "meta": {"plugin": {"name": "Slurm OpenAPI DB v0.0.37"}, "list": [1, 2]},
+        "errors": [],
+        "size": 123456789,
+        "jobs": [{"job_id": i, "name": f"job {{{i}}}"} for i in range(50)],
+        "after": "ignored",
+    }
+    for indent in [None, 4]:
+        for chunk_size in [1, 3, 7, 64, 1 << 16]:
+            f = io.StringIO(json.dumps(data, indent=indent))
+            assert (
+                list(iter_json_array_items(f, "jobs", chunk_size=chunk_size))
+                == data["jobs"]
+            )
+
+
+def test_iter_json_array_items_split_numbers():
+    """
+    Test that the numbers split between two chunks are decoded entirely.
+    """
+    data = '{"version": 23.02, "jobs": [1.25, 300e2, {"a": 1}]}'
+    for chunk_size in [1, 2, 3, 5, 6, 10, 15, 19]:
+        f = io.StringIO(data)
+        assert list(iter_json_array_items(f, "jobs", chunk_size=chunk_size)) == [
+            1.25,
+            300e2,
+            {"a": 1},
+        ]
+
+
+def test_read_json_object_value():
+    """
+    Test that the value of a key is read without reading the following content.
+    """
+    data = '{"meta": {"Slurm": {"release": "23.02.6"}}, "jobs": [1, 2'
+    for chunk_size in [1, 3, 1 << 16]:
+        assert read_json_object_value(
+            io.StringIO(data), "meta", chunk_size=chunk_size
+        ) == {"Slurm": {"release": "23.02.6"}}
+    with pytest.raises(KeyError):
+        read_json_object_value(io.StringIO('{"jobs": []}'), "meta")
+
+
+class CountingStringIO(io.StringIO):
+    """
+    StringIO counting the calls to read.
+    """
+
+    nb_reads = 0
+
+    def read(self, size=-1):
+        self.nb_reads += 1
+        return super().read(size)
+
+
+def test_iter_json_array_items_large_element():
+    """
+    Test that an element much larger than the chunks is read through a
+    logarithmic number of reads, instead of one read per chunk.
+    """
+    D_large = {"name": "x" * 100000, "values": list(range(10000))}
+    f = CountingStringIO(json.dumps({"jobs": [D_large, {"job_id": 1}]}))
+    assert list(iter_json_array_items(f, "jobs", chunk_size=16)) == [
+        D_large,
+        {"job_id": 1},
+    ]
+    assert f.nb_reads < 30
+
+
+def test_iter_json_array_items_errors():
+    """
+    Test the errors raised on missing keys or malformed documents.
+    """
+    with pytest.raises(KeyError):
+        list(iter_json_array_items(io.StringIO('{"nodes": []}'), "jobs"))
+    with pytest.raises(KeyError):
+        list(iter_json_array_items(io.StringIO("{}"), "jobs"))
+    with pytest.raises(ValueError):
+        list(iter_json_array_items(io.StringIO('{"jobs": {}}'), "jobs"))
+    with pytest.raises(ValueError):
+        list(iter_json_array_items(io.StringIO('{"jobs": [{"a": 1}'), "jobs"))
+
+
+@pytest.mark.parametrize(
+    "parser_class,cluster_name,slurm_version,report_path",
+    [
+        (JobParser, "cedar", "23.02.6", "slurm_state_test/files/sacct_1"),
+        (JobParser, "cedar", "23.02.6", "slurm_state_test/files/sacct_2"),
+        (NodeParser, "mila", "22.05.9", "slurm_state_test/files/sinfo_1"),
+        (NodeParser, "mila", "22.05.9", "slurm_state_test/files/sinfo_2"),
+    ],
+)
+def test_streaming_parser_matches_json_load(
+    parser_class, cluster_name, slurm_version, report_path
+):
+    """
+    Check that the streaming mode of the parsers produces the same entities
+    as loading the whole report with json.load.
+    """
+    L_results = []
+    for streaming in [False, True]:
+        parser = parser_class(
+            cluster_name, slurm_version=slurm_version, streaming=streaming
+        )
+        with open(report_path, "r") as f:
+            L_results.append(list(parser.parser(f)))
+
+    assert L_results[0]
+    assert L_results[0] == L_results[1]
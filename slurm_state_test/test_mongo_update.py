@@ -6,8 +6,14 @@ from slurm_state.config import get_config
 from slurm_state.parsers.job_parser import JobParser
 from slurm_state.parsers.node_parser import NodeParser
 
+from slurm_state.helpers.jobs_indexes_helper import create_jobs_identifying_index
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
 # Common imports
 from datetime import datetime
+import json
+import os
 import pytest
 
 
@@ -166,7 +172,24 @@ def test_slurm_node_to_clockwork_node():
     # Check a minimalist node
     node = {"name": "testnode"}
     cw_node = slurm_node_to_clockwork_node(node)
-    assert cw_node == {"slurm": {"name": "testnode"}, "cw": {"gpu": {}}}
+    assert cw_node == {
+        "slurm": {"name": "testnode"},
+        "cw": {
+            "gpu": {},
+            "resources": {
+                "cpu_total": 0,
+                "cpu_used": 0,
+                "mem_mb_total": 0,
+                "mem_mb_used": 0,
+                "gpu_total": 0,
+                "gpu_used": 0,
+                "gpu_by_type": {},
+                "cpu_free": 0,
+                "mem_mb_free": 0,
+                "gpu_free": 0,
+            },
+        },
+    }
 
     # Check a complete node
     node = {
@@ -203,7 +226,19 @@ def test_slurm_node_to_clockwork_node():
                 "name": "rtx8000",
                 "number": 8,
                 "associated_sockets": "0-1",
-            }
+            },
+            "resources": {
+                "cpu_total": 0,
+                "cpu_used": 0,
+                "mem_mb_total": 386619,
+                "mem_mb_used": 0,
+                "gpu_total": 8,
+                "gpu_used": 0,
+                "gpu_by_type": {"rtx8000": {"total": 8, "used": 0}},
+                "cpu_free": 0,
+                "mem_mb_free": 386619,
+                "gpu_free": 8,
+            },
         },
     }
 
@@ -217,7 +252,21 @@ def test_slurm_node_to_clockwork_node():
             "features": "x86_64,volta,32gb",
             "gres": "gpu:v100:4",
         },
-        "cw": {"gpu": {"cw_name": "v100l", "name": "v100", "number": 4}},
+        "cw": {
+            "gpu": {"cw_name": "v100l", "name": "v100", "number": 4},
+            "resources": {
+                "cpu_total": 0,
+                "cpu_used": 0,
+                "mem_mb_total": 0,
+                "mem_mb_used": 0,
+                "gpu_total": 4,
+                "gpu_used": 0,
+                "gpu_by_type": {"v100": {"total": 4, "used": 0}},
+                "cpu_free": 0,
+                "mem_mb_free": 0,
+                "gpu_free": 4,
+            },
+        },
     }
 
 
@@ -252,6 +301,426 @@ def test_main_read_jobs_and_update_collection():
     db.drop_collection("test_jobs")
 
 
+def test_main_read_jobs_by_batches(tmp_path):
+    """
+    Check that processing the report by batches produces the same
+    database content and dump file as processing it at once.
+    """
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+
+    L_dumps = []
+    for batch_size in [1, 2000]:
+        db.drop_collection("test_jobs")
+        dump_file = str(tmp_path / f"dump_{batch_size}.json")
+        for report_path in [
+            "slurm_state_test/files/sacct_1",
+            "slurm_state_test/files/sacct_2",
+        ]:
+            stats = main_read_report_and_update_collection(
+                "jobs",
+                db.test_jobs,
+                db.test_users,
+                "cedar",
+                report_path,
+                from_file=True,
+                dump_file=dump_file,
+                batch_size=batch_size,
+            )
+        assert db.test_jobs.count_documents({}) == 3
+
+        # The stats are the ones of the second report: one changed job, one new job
+        assert stats.counters["jobs"] == 2
+        assert stats.counters["jobs_inserted"] == 1
+        assert stats.counters["jobs_changed"] == 1
+        assert stats.counters["report_bytes"] == os.path.getsize(report_path)
+        # At least one query to retrieve the stored jobs and one bulk write per batch
+        assert stats.counters["mongo_round_trips"] >= 2 * (2 if batch_size == 1 else 1)
+        assert set(stats.stage_durations) == {
+            "parse",
+            "convert",
+            "resolve_users",
+            "diff",
+            "write",
+            "dump",
+        }
+
+        with open(dump_file, "r") as f:
+            L_dumps.append(
+                sorted(
+                    [D_job["slurm"] for D_job in json.load(f)],
+                    key=lambda D_job: D_job["job_id"],
+                )
+            )
+
+    assert [D_job["job_id"] for D_job in L_dumps[0]] == ["10", "30"]
+    assert L_dumps[0] == L_dumps[1]
+
+    db.drop_collection("test_jobs")
+
+
+def test_get_slurm_digest():
+    """
+    Test that the digest of the Slurm data does not depend on the keys order,
+    but changes with the values.
+    """
+    job = {"job_id": "10", "job_state": "RUNNING", "cluster_name": "cedar"}
+    same_job = {"cluster_name": "cedar", "job_state": "RUNNING", "job_id": "10"}
+    assert get_slurm_digest(job) == get_slurm_digest(same_job)
+    assert get_slurm_digest(job) != get_slurm_digest(job | {"job_state": "COMPLETED"})
+
+
+@pytest.mark.parametrize("unchanged_jobs", ["touch", "skip"])
+def test_main_read_jobs_unchanged_jobs(unchanged_jobs):
+    """
+    Check that reading twice the same report does not rewrite the jobs,
+    and only updates their timestamps in the "touch" mode.
+    """
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+
+    db.drop_collection("test_jobs")
+
+    def read_sacct_1():
+        main_read_report_and_update_collection(
+            "jobs",
+            db.test_jobs,
+            db.test_users,
+            "cedar",
+            "slurm_state_test/files/sacct_1",
+            from_file=True,
+            unchanged_jobs=unchanged_jobs,
+        )
+
+    read_sacct_1()
+    LD_first_jobs = list(db.test_jobs.find({}).sort("slurm.job_id"))
+    read_sacct_1()
+    LD_second_jobs = list(db.test_jobs.find({}).sort("slurm.job_id"))
+    assert len(LD_second_jobs) == 2
+    for D_first_job, D_second_job in zip(LD_first_jobs, LD_second_jobs):
+        assert D_first_job["slurm"] == D_second_job["slurm"]
+        assert D_first_job["cw"]["slurm_digest"] == D_second_job["cw"]["slurm_digest"]
+        if unchanged_jobs == "touch":
+            assert (
+                D_first_job["cw"]["last_slurm_update"]
+                < D_second_job["cw"]["last_slurm_update"]
+            )
+        else:
+            assert D_first_job == D_second_job
+
+    db.drop_collection("test_jobs")
+
+
+def test_main_read_jobs_keeps_stored_fields():
+    """
+    Check that updating a changed job keeps its "user" component, as well as
+    the stored fields which are not part of the report.
+    """
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+
+    db.drop_collection("test_jobs")
+
+    main_read_report_and_update_collection(
+        "jobs",
+        db.test_jobs,
+        db.test_users,
+        "cedar",
+        "slurm_state_test/files/sacct_1",
+        from_file=True,
+    )
+    db.test_jobs.update_one(
+        {"slurm.job_id": "10"},
+        {"$set": {"user": {"note": "hello"}, "slurm.extra_field": "kept"}},
+    )
+
+    # The job 10 has a new end time in sacct_2
+    main_read_report_and_update_collection(
+        "jobs",
+        db.test_jobs,
+        db.test_users,
+        "cedar",
+        "slurm_state_test/files/sacct_2",
+        from_file=True,
+    )
+
+    D_job = db.test_jobs.find_one({"slurm.job_id": "10"})
+    assert D_job["slurm"]["end_time"] == 1680244103
+    assert D_job["slurm"]["extra_field"] == "kept"
+    assert D_job["user"] == {"note": "hello"}
+    assert D_job["cw"]["slurm_digest"] == get_slurm_digest(
+        {k: v for (k, v) in D_job["slurm"].items() if k != "extra_field"}
+    )
+
+    # Only the jobs of the report are retrieved, with the projected fields
+    DD_stored_jobs = find_stored_jobs(db.test_jobs, "cedar", ["10", "30", "40"])
+    assert sorted(DD_stored_jobs.keys()) == ["10", "30"]
+    assert set(DD_stored_jobs["10"].keys()) == {"_id", "slurm", "cw", "user"}
+    assert DD_stored_jobs["10"]["slurm"] == {"job_id": "10", "job_state": "NODE_FAIL"}
+
+    db.drop_collection("test_jobs")
+
+
+def test_main_read_jobs_stale_report():
+    """
+    Check that a report older than the one from which a job has been stored
+    does not replace it.
+    """
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+
+    db.drop_collection("test_jobs")
+
+    def read_jobs(report_path, source_timestamp):
+        return main_read_report_and_update_collection(
+            "jobs",
+            db.test_jobs,
+            db.test_users,
+            "cedar",
+            report_path,
+            from_file=True,
+            source_timestamp=source_timestamp,
+        ).counters
+
+    # The job 10 has a new end time in sacct_2, which is retrieved after sacct_1
+    read_jobs("slurm_state_test/files/sacct_2", 200)
+    D_counters = read_jobs("slurm_state_test/files/sacct_1", 100)
+    assert (D_counters["jobs_inserted"], D_counters["jobs_stale"]) == (1, 1)
+
+    D_job = db.test_jobs.find_one({"slurm.job_id": "10"})
+    assert D_job["slurm"]["end_time"] == 1680244103
+    assert D_job["cw"]["source_timestamp"] == 200
+    assert db.test_jobs.find_one({"slurm.job_id": "20"})["cw"]["source_timestamp"] == (
+        100
+    )
+
+    db.drop_collection("test_jobs")
+
+
+def test_main_read_jobs_stale_report_file(tmp_path):
+    """
+    Check that an existing report file is ordered by its modification time:
+    an old file does not replace the jobs stored from a more recent report.
+    """
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+
+    db.drop_collection("test_jobs")
+
+    old_report_path = str(tmp_path / "old_sacct")
+    with open("slurm_state_test/files/sacct_1", "r") as f_in, open(
+        old_report_path, "w"
+    ) as f_out:
+        f_out.write(f_in.read())
+    os.utime(old_report_path, (100, 100))
+
+    main_read_report_and_update_collection(
+        "jobs",
+        db.test_jobs,
+        db.test_users,
+        "cedar",
+        "slurm_state_test/files/sacct_2",
+        from_file=True,
+        source_timestamp=200,
+    )
+    D_counters = main_read_report_and_update_collection(
+        "jobs",
+        db.test_jobs,
+        db.test_users,
+        "cedar",
+        old_report_path,
+        from_file=True,
+    ).counters
+    assert D_counters["jobs_stale"] == 1
+
+    D_job = db.test_jobs.find_one({"slurm.job_id": "10"})
+    assert D_job["slurm"]["end_time"] == 1680244103
+    assert D_job["cw"]["source_timestamp"] == 200
+
+    db.drop_collection("test_jobs")
+
+
+class ConcurrentlyWrittenCollection:
+    """
+    Collection on which another ingestion writes a newer version of a job,
+    just before the first bulk_write of the tested ingestion.
+    """
+
+    def __init__(self, collection, job_id, D_set):
+        self.collection = collection
+        self.job_id = job_id
+        self.D_set = D_set
+        self.nb_bulk_writes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, operations, **kwargs):
+        if not self.nb_bulk_writes:
+            self.collection.update_one(
+                {"slurm.job_id": self.job_id}, {"$set": self.D_set}
+            )
+        self.nb_bulk_writes += 1
+        return self.collection.bulk_write(operations, **kwargs)
+
+
+def test_main_read_jobs_write_conflict():
+    """
+    Check that a job written by another ingestion from a newer report, between
+    the comparison and the write of a batch, is detected and not replaced.
+    """
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+
+    db.drop_collection("test_jobs")
+    db.drop_collection("test_job_events")
+
+    main_read_report_and_update_collection(
+        "jobs",
+        db.test_jobs,
+        db.test_users,
+        "cedar",
+        "slurm_state_test/files/sacct_1",
+        from_file=True,
+        source_timestamp=100,
+    )
+
+    # The job 10 changes in sacct_2, but a newer version of it is written meanwhile
+    jobs_collection = ConcurrentlyWrittenCollection(
+        db.test_jobs,
+        "10",
+        {
+            "slurm.job_state": "COMPLETED",
+            "cw.slurm_digest": "newer",
+            "cw.source_timestamp": 300,
+        },
+    )
+    D_counters = main_read_report_and_update_collection(
+        "jobs",
+        jobs_collection,
+        db.test_users,
+        "cedar",
+        "slurm_state_test/files/sacct_2",
+        from_file=True,
+        source_timestamp=200,
+        job_events_collection=db.test_job_events,
+    ).counters
+
+    # The conflict is detected, then the job is found stale
+    assert D_counters["job_conflicts"] == 1
+    assert "job_conflicts_dropped" not in D_counters
+    assert jobs_collection.nb_bulk_writes == 2
+    D_job = db.test_jobs.find_one({"slurm.job_id": "10"})
+    assert D_job["slurm"]["job_state"] == "COMPLETED"
+    assert D_job["cw"]["source_timestamp"] == 300
+    # The job 30 is inserted, and only its event is stored
+    assert db.test_jobs.count_documents({"slurm.job_id": "30"}) == 1
+    assert [D_event["job_id"] for D_event in db.test_job_events.find()] == ["30"]
+
+    db.drop_collection("test_jobs")
+    db.drop_collection("test_job_events")
+
+
+class RacingCollection:
+    """
+    Collection on which another ingestion inserts the same new jobs as the tested
+    ingestion, during its first bulk_write. Both upserts of these jobs miss their
+    filter, and the unique index "job_id_and_cluster_name" rejects the insertions
+    of the tested ingestion, as MongoDB reports it with duplicate key errors.
+    """
+
+    def __init__(self, collection, other_ingestion):
+        self.collection = collection
+        self.other_ingestion = other_ingestion
+        self.nb_bulk_writes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def bulk_write(self, operations, **kwargs):
+        self.nb_bulk_writes += 1
+        if self.nb_bulk_writes > 1:
+            return self.collection.bulk_write(operations, **kwargs)
+
+        L_new = [
+            op._upsert and not self.collection.count_documents(op._filter)
+            for op in operations
+        ]
+        self.other_ingestion()
+        L_lost = [
+            index
+            for (index, op) in enumerate(operations)
+            if L_new[index] and self.collection.count_documents(op._filter)
+        ]
+        D_result = self.collection.bulk_write(
+            [op for (index, op) in enumerate(operations) if index not in L_lost],
+            **kwargs,
+        ).bulk_api_result
+        if L_lost:
+            D_result["writeErrors"] = [
+                {"index": index, "code": 11000, "errmsg": "E11000 duplicate key"}
+                for index in L_lost
+            ]
+            raise BulkWriteError(D_result)
+        return FakeResult(D_result)
+
+
+class FakeResult:
+    def __init__(self, bulk_api_result):
+        self.bulk_api_result = bulk_api_result
+
+
+def test_main_read_jobs_racing_insertions():
+    """
+    Check that two ingestions racing to insert the same new job store it once,
+    the losing insertion going through the retries of the write conflicts.
+    """
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+
+    db.drop_collection("test_jobs")
+    db.drop_collection("test_job_events")
+    create_jobs_identifying_index(db.test_jobs)
+
+    def read_jobs(jobs_collection, report_path, source_timestamp):
+        return main_read_report_and_update_collection(
+            "jobs",
+            jobs_collection,
+            db.test_users,
+            "cedar",
+            report_path,
+            from_file=True,
+            source_timestamp=source_timestamp,
+            job_events_collection=db.test_job_events,
+        ).counters
+
+    # The job 10 is new in both reports, and the newer one is inserted first
+    jobs_collection = RacingCollection(
+        db.test_jobs,
+        lambda: read_jobs(db.test_jobs, "slurm_state_test/files/sacct_2", 200),
+    )
+    D_counters = read_jobs(jobs_collection, "slurm_state_test/files/sacct_1", 100)
+
+    # The conflict is detected, then the job is found stale
+    assert D_counters["job_conflicts"] == 1
+    assert "job_conflicts_dropped" not in D_counters
+    assert jobs_collection.nb_bulk_writes == 2
+    assert db.test_jobs.count_documents({"slurm.job_id": "10"}) == 1
+    D_job = db.test_jobs.find_one({"slurm.job_id": "10"})
+    assert D_job["slurm"]["end_time"] == 1680244103
+    assert D_job["cw"]["source_timestamp"] == 200
+    # The job 10 has a single insertion event
+    assert db.test_job_events.count_documents({"job_id": "10"}) == 1
+
+    with pytest.raises(DuplicateKeyError):
+        db.test_jobs.insert_one(
+            {"slurm": {"job_id": "10", "cluster_name": "cedar"}, "cw": {}}
+        )
+
+    db.drop_collection("test_jobs")
+    db.drop_collection("test_job_events")
+
+
 def test_main_read_nodes_and_update_collection():
     client = get_mongo_client()
     db = client[get_config("mongo.database_name")]
@@ -281,3 +750,63 @@ def test_main_read_nodes_and_update_collection():
     assert db.test_nodes.count_documents({}) == 3
 
     db.drop_collection("test_nodes")
+
+
+def test_main_read_nodes_unchanged_nodes():
+    """
+    Check that reading twice the same report only updates the timestamps
+    of the nodes, and that the changed nodes are rewritten.
+    """
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+
+    db.drop_collection("test_nodes")
+
+    def read_nodes(report_path):
+        return main_read_report_and_update_collection(
+            "nodes",
+            db.test_nodes,
+            None,
+            "mila",
+            report_path,
+            from_file=True,
+        ).counters
+
+    D_counters = read_nodes("slurm_state_test/files/sinfo_1")
+    assert (D_counters["nodes_inserted"], D_counters["nodes_changed"]) == (2, 0)
+    D_node_before = db.test_nodes.find_one({"slurm.name": "test-node-1"})
+    assert D_node_before["cw"]["slurm_digest"] == get_slurm_digest(
+        D_node_before["slurm"]
+    )
+
+    D_counters = read_nodes("slurm_state_test/files/sinfo_1")
+    assert D_counters["nodes_untouched"] == 2
+    assert D_counters["nodes_inserted"] == D_counters["nodes_changed"] == 0
+    # A single operation touches all the unchanged nodes
+    assert D_counters["operations"] == 1
+    D_node_after = db.test_nodes.find_one({"slurm.name": "test-node-1"})
+    assert D_node_after["slurm"] == D_node_before["slurm"]
+    assert D_node_after["cw"]["last_slurm_update"] > (
+        D_node_before["cw"]["last_slurm_update"]
+    )
+
+    # The stored node is modified, as if it came from a previous report
+    D_previous_slurm = D_node_before["slurm"] | {"state": "idle"}
+    db.test_nodes.update_one(
+        {"slurm.name": "test-node-1"},
+        {
+            "$set": {
+                "slurm": D_previous_slurm,
+                "cw.slurm_digest": get_slurm_digest(D_previous_slurm),
+            }
+        },
+    )
+    D_counters = read_nodes("slurm_state_test/files/sinfo_1")
+    assert (D_counters["nodes_changed"], D_counters["nodes_untouched"]) == (1, 1)
+    assert (
+        db.test_nodes.find_one({"slurm.name": "test-node-1"})["slurm"]
+        == D_node_before["slurm"]
+    )
+    assert db.test_nodes.count_documents({}) == 2
+
+    db.drop_collection("test_nodes")
@@ -0,0 +1,162 @@
+"""
+Tests for slurm_state.helpers.report_archive_helper and slurm_state.replay_reports
+"""
+
+import json
+import os
+
+import pytest
+
+from slurm_state.config import get_config
+from slurm_state.helpers.report_archive_helper import ReportArchive
+from slurm_state.mongo_client import get_mongo_client
+from slurm_state.parsers.slurm_parser import SlurmParser
+from slurm_state.replay_reports import replay_reports
+
+# 2023-11-14T22:13:20 UTC
+TIMESTAMP = 1700000000
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_store_report(tmp_path, compression):
+    report_archive = ReportArchive(tmp_path, compression=compression)
+    archived_path = report_archive.store(
+        "slurm_state_test/files/sacct_1", "cedar", "jobs", timestamp=TIMESTAMP
+    )
+
+    assert os.path.relpath(archived_path, tmp_path) == os.path.join(
+        "cedar",
+        "jobs",
+        "2023-11-14",
+        "jobs_1700000000.000.json" + (".gz" if compression == "gzip" else ""),
+    )
+    assert os.listdir(os.path.dirname(archived_path)) == [
+        os.path.basename(archived_path)
+    ]
+    assert report_archive.list_reports("cedar", "jobs") == [(TIMESTAMP, archived_path)]
+
+
+def test_list_reports(tmp_path):
+    report_archive = ReportArchive(tmp_path)
+    # Reports spread over three days, stored out of order
+    L_timestamps = [TIMESTAMP + 86400, TIMESTAMP, TIMESTAMP + 2 * 86400, TIMESTAMP + 1]
+    for timestamp in L_timestamps:
+        report_archive.store(
+            "slurm_state_test/files/sinfo_1", "mila", "nodes", timestamp=timestamp
+        )
+
+    def list_timestamps(**kwargs):
+        return [
+            timestamp
+            for (timestamp, _) in report_archive.list_reports("mila", "nodes", **kwargs)
+        ]
+
+    assert list_timestamps() == sorted(L_timestamps)
+    assert list_timestamps(start_time=TIMESTAMP + 1, end_time=TIMESTAMP + 86400) == [
+        TIMESTAMP + 1
+    ]
+    assert list_timestamps(start_time=TIMESTAMP + 86400) == [
+        TIMESTAMP + 86400,
+        TIMESTAMP + 2 * 86400,
+    ]
+    assert report_archive.list_reports("mila", "jobs") == []
+    assert report_archive.list_reports("cedar", "nodes") == []
+    assert report_archive.get_cluster_names() == ["mila"]
+
+
+def test_replay_reports(tmp_path):
+    report_archive = ReportArchive(tmp_path)
+    for (report_path, cluster_name, entity, timestamp) in [
+        # The reports are replayed in the order of their timestamps
+        ("slurm_state_test/files/sacct_2", "cedar", "jobs", TIMESTAMP + 10),
+        ("slurm_state_test/files/sacct_1", "cedar", "jobs", TIMESTAMP),
+        ("slurm_state_test/files/sinfo_1", "mila", "nodes", TIMESTAMP),
+        ("slurm_state_test/files/sinfo_2", "mila", "nodes", TIMESTAMP + 10),
+    ]:
+        report_archive.store(report_path, cluster_name, entity, timestamp=timestamp)
+
+    # The replay writes in the "jobs" and "nodes" collections of a scratch database
+    client = get_mongo_client()
+    database_name = f"{get_config('mongo.database_name')}_replay"
+    client.drop_database(database_name)
+    db = client[database_name]
+
+    try:
+        D_stats = replay_reports(
+            db,
+            report_archive,
+            ["cedar", "mila"],
+            ["jobs", "nodes"],
+            max_workers=2,
+        )
+
+        assert D_stats["cedar"].counters["reports"] == 2
+        assert D_stats["mila"].counters["reports"] == 2
+        assert db.jobs.count_documents({}) == 3
+        assert db.nodes.count_documents({}) == 3
+        # The end time of the job 10 comes from the last report (sacct_2)
+        assert (
+            db.jobs.find_one({"slurm.job_id": "10"})["slurm"]["end_time"] == 1680244103
+        )
+
+        # Only the first report of each cluster is replayed again
+        D_stats = replay_reports(
+            db,
+            report_archive,
+            ["cedar", "mila"],
+            ["jobs", "nodes"],
+            end_time=TIMESTAMP + 10,
+        )
+        assert D_stats["cedar"].counters["reports"] == 1
+        assert D_stats["mila"].counters["reports"] == 1
+    finally:
+        client.drop_database(database_name)
+
+
+def test_replay_reports_slurm_version(tmp_path, monkeypatch):
+    """
+    Test that the Slurm version of a cluster which does not configure it is
+    retrieved from the replayed report, without contacting the cluster.
+    """
+
+    def get_slurm_version(parser):
+        raise AssertionError("The cluster should not be contacted.")
+
+    monkeypatch.setattr(SlurmParser, "get_slurm_version", get_slurm_version)
+
+    with open("slurm_state_test/files/sacct_1") as f:
+        D_report = json.load(f)
+    D_report["meta"]["Slurm"]["release"] = "23.02.6"
+    report_path = str(tmp_path / "sacct.json")
+    with open(report_path, "w") as f:
+        json.dump(D_report, f)
+    del D_report["meta"]
+    report_without_meta_path = str(tmp_path / "sacct_without_meta.json")
+    with open(report_without_meta_path, "w") as f:
+        json.dump(D_report, f)
+
+    report_archive = ReportArchive(tmp_path / "archive")
+    report_archive.store(report_path, "beluga", "jobs", timestamp=TIMESTAMP)
+
+    client = get_mongo_client()
+    database_name = f"{get_config('mongo.database_name')}_replay"
+    client.drop_database(database_name)
+    db = client[database_name]
+
+    try:
+        D_stats = replay_reports(db, report_archive, ["beluga"], ["jobs"])
+        assert D_stats["beluga"].counters["reports"] == 1
+        assert db.jobs.count_documents({"slurm.cluster_name": "beluga"}) == 2
+
+        # The version has to be given if the report does not present it
+        report_archive.store(
+            report_without_meta_path, "beluga", "jobs", timestamp=TIMESTAMP + 10
+        )
+        with pytest.raises(ValueError, match="--slurm_version"):
+            replay_reports(db, report_archive, ["beluga"], ["jobs"])
+        D_stats = replay_reports(
+            db, report_archive, ["beluga"], ["jobs"], slurm_version="23.02.6"
+        )
+        assert D_stats["beluga"].counters["reports"] == 2
+    finally:
+        client.drop_database(database_name)
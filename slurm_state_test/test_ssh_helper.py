@@ -0,0 +1,278 @@
+"""
+Tests for slurm_state.helpers.ssh_helper, against a local paramiko server.
+"""
+
+import gzip
+import shlex
+import socket
+import threading
+
+import paramiko
+
+from slurm_state.helpers.ssh_helper import (
+    SSHConnectionPool,
+    load_private_key,
+    stream_slurm_command_to_file,
+)
+
+import pytest
+
+
+class StubServer(paramiko.ServerInterface):
+    """
+    SSH server accepting any public key, and answering each command
+    with a line echoing it.
+
+    The commands piped through gzip get their answer compressed, the
+    command "false" fails, the command "sleep" never answers and the
+    command "noisy" writes more on its standard error than the SSH window
+    holds before answering.
+    """
+
+    def get_allowed_auths(self, username):
+        return "publickey"
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        def answer():
+            if command.startswith(b"bash -o pipefail -c "):
+                # Only the commands piped through gzip are wrapped
+                inner_command = shlex.split(command.decode())[-1].split(" |")[0]
+                inner_command = inner_command.encode()
+                channel.sendall(gzip.compress(b"ran " + inner_command + b"\n" * 1000))
+            elif command == b"sleep":
+                return
+            elif command == b"noisy":
+                channel.sendall_stderr(b"warning\n" * (1 << 19))
+                channel.sendall(b"ran noisy\n")
+            elif command != b"false":
+                channel.sendall(b"ran " + command + b"\n")
+            channel.send_exit_status(int(command == b"false"))
+            channel.close()
+
+        # Answer once the exec request has been acknowledged
+        threading.Timer(0.05, answer).start()
+        return True
+
+
+@pytest.fixture(scope="module")
+def ssh_server():
+    """
+    Run a SSH server on a local port. Yields its port and the list
+    of its transports, one per accepted connection.
+    """
+    host_key = paramiko.RSAKey.generate(1024)
+    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_socket.bind(("127.0.0.1", 0))
+    server_socket.listen(10)
+    L_transports = []
+
+    def serve():
+        while True:
+            try:
+                client_socket, _ = server_socket.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(client_socket)
+            transport.add_server_key(host_key)
+            transport.start_server(server=StubServer())
+            L_transports.append(transport)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield (server_socket.getsockname()[1], L_transports)
+    server_socket.close()
+    for transport in L_transports:
+        transport.close()
+
+
+@pytest.fixture(scope="module")
+def ssh_key_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("ssh") / "id_clockwork")
+    paramiko.RSAKey.generate(1024).write_private_key_file(path)
+    return path
+
+
+def run(pool, command, port, ssh_key_path):
+    (_, stdout, _) = pool.exec_command(
+        command, "127.0.0.1", "mila-automation", ssh_key_path, port=port
+    )
+    try:
+        return stdout.readlines()
+    finally:
+        pool.release(stdout.channel)
+
+
+def test_load_private_key(ssh_key_path):
+    """
+    Test that the parsed private keys are cached.
+    """
+    assert load_private_key(ssh_key_path) is load_private_key(ssh_key_path)
+
+
+def test_ssh_connection_pool(ssh_server, ssh_key_path):
+    """
+    Test that the connections are reused, reopened when dropped,
+    and closed when idle.
+    """
+    (port, L_transports) = ssh_server
+    now = [0]
+    pool = SSHConnectionPool(idle_timeout=60, clock=lambda: now[0])
+    nb_transports = len(L_transports)
+
+    # Several commands are sent through the same connection
+    assert run(pool, "sacct -V", port, ssh_key_path) == ["ran sacct -V\n"]
+    assert run(pool, "sacct --json", port, ssh_key_path) == ["ran sacct --json\n"]
+    assert pool.nb_connections_opened == 1
+    assert len(L_transports) == nb_transports + 1
+
+    # A dropped connection is transparently reopened
+    L_transports[-1].close()
+    pool.get_client(
+        "127.0.0.1", "mila-automation", ssh_key_path, port
+    ).get_transport().close()
+    assert run(pool, "sinfo -V", port, ssh_key_path) == ["ran sinfo -V\n"]
+    assert pool.nb_connections_opened == 2
+
+    # An idle connection is closed
+    client = pool.get_client("127.0.0.1", "mila-automation", ssh_key_path, port)
+    now[0] = 100
+    pool.evict_idle_connections()
+    assert client.get_transport() is None
+    assert run(pool, "sinfo --json", port, ssh_key_path) == ["ran sinfo --json\n"]
+    assert pool.nb_connections_opened == 3
+
+    pool.close_all()
+
+
+def test_ssh_connection_pool_keeps_busy_connections(ssh_server, ssh_key_path):
+    """
+    Test that a connection streaming the output of a command is not closed
+    as idle, and can be closed once the command has been released.
+    """
+    (port, _) = ssh_server
+    now = [0]
+    pool = SSHConnectionPool(idle_timeout=60, clock=lambda: now[0])
+
+    (_, stdout, _) = pool.exec_command(
+        "sleep", "127.0.0.1", "mila-automation", ssh_key_path, port=port
+    )
+    client = pool.get_client("127.0.0.1", "mila-automation", ssh_key_path, port)
+    now[0] = 100
+    pool.evict_idle_connections()
+    assert client.get_transport() is not None
+    assert not stdout.channel.closed
+
+    # The idle time is counted from the release of the command
+    pool.release(stdout.channel)
+    now[0] = 150
+    pool.evict_idle_connections()
+    assert client.get_transport() is not None
+    now[0] = 200
+    pool.evict_idle_connections()
+    assert client.get_transport() is None
+
+    pool.close_all()
+
+
+def test_ssh_connection_pool_command_timeout(ssh_server, ssh_key_path):
+    """
+    Test that a command which does not answer raises once its timeout is reached.
+    """
+    (port, _) = ssh_server
+    pool = SSHConnectionPool()
+    (_, stdout, _) = pool.exec_command(
+        "sleep", "127.0.0.1", "mila-automation", ssh_key_path, port=port, timeout=0.5
+    )
+    try:
+        with pytest.raises(socket.timeout):
+            stdout.readlines()
+    finally:
+        pool.release(stdout.channel)
+    pool.close_all()
+
+
+@pytest.mark.parametrize("compression", ["none", "gzip"])
+def test_stream_slurm_command_to_file(ssh_server, ssh_key_path, tmp_path, compression):
+    """
+    Test that the output of a command is written to a file, decompressed if needed.
+    """
+    (port, _) = ssh_server
+    pool = SSHConnectionPool()
+    file_name = str(tmp_path / "report" / "sacct.json")
+    D_stats = stream_slurm_command_to_file(
+        "sacct --json --name='a b'",
+        file_name,
+        "127.0.0.1",
+        "mila-automation",
+        ssh_key_path,
+        port=port,
+        compression=compression,
+        pool=pool,
+    )
+    with open(file_name) as f:
+        content = f.read()
+
+    if compression == "gzip":
+        assert content == "ran sacct --json --name='a b'" + "\n" * 1000
+        assert D_stats["bytes_received"] < D_stats["bytes_written"]
+    else:
+        assert content == "ran sacct --json --name='a b'\n"
+        assert D_stats["bytes_received"] == D_stats["bytes_written"]
+    assert D_stats["bytes_written"] == len(content)
+    pool.close_all()
+
+
+def test_stream_slurm_command_to_file_errors(ssh_server, ssh_key_path, tmp_path):
+    """
+    Test that a failed or late command does not leave a report behind.
+    """
+    (port, _) = ssh_server
+    pool = SSHConnectionPool()
+    file_name = str(tmp_path / "sacct.json")
+
+    with pytest.raises(Exception, match="exit status 1"):
+        stream_slurm_command_to_file(
+            "false", file_name, "127.0.0.1", "u", ssh_key_path, port=port, pool=pool
+        )
+    with pytest.raises(TimeoutError):
+        stream_slurm_command_to_file(
+            "sleep",
+            file_name,
+            "127.0.0.1",
+            "u",
+            ssh_key_path,
+            port=port,
+            timeout=0.5,
+            pool=pool,
+        )
+    assert list(tmp_path.iterdir()) == []
+    pool.close_all()
+
+
+def test_stream_slurm_command_to_file_drains_stderr(ssh_server, ssh_key_path, tmp_path):
+    """
+    Test that a command writing a lot on its standard error does not block the transfer.
+    """
+    (port, _) = ssh_server
+    pool = SSHConnectionPool()
+    file_name = str(tmp_path / "sacct.json")
+    stream_slurm_command_to_file(
+        "noisy",
+        file_name,
+        "127.0.0.1",
+        "u",
+        ssh_key_path,
+        port=port,
+        timeout=10,
+        pool=pool,
+    )
+    with open(file_name) as f:
+        assert f.read() == "ran noisy\n"
+    pool.close_all()
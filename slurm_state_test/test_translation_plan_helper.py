@@ -0,0 +1,83 @@
+"""
+Tests for slurm_state.helpers.translation_plan_helper: the compiled translation
+plans are compared to the translators of parser_helper, used as reference.
+"""
+
+import copy
+import json
+
+import pytest
+
+from slurm_state.helpers.translation_plan_helper import (
+    compile_translation_plan,
+    get_reference_translator,
+)
+from slurm_state.parsers.job_parser import JOB_FIELD_SPECS_V22_AND_23
+from slurm_state.parsers.node_parser import NODE_FIELD_SPECS_V22
+
+
+def assert_same_translations(field_specs, L_slurm_entities):
+    reference_translate = get_reference_translator(field_specs)
+    compiled_translate = compile_translation_plan(field_specs)
+    for slurm_entity in L_slurm_entities:
+        # The reference translators may modify their input
+        expected = reference_translate(copy.deepcopy(slurm_entity))
+        original_entity = copy.deepcopy(slurm_entity)
+        assert compiled_translate(slurm_entity) == expected
+        # The compiled plan does not modify its input
+        assert slurm_entity == original_entity
+
+
+@pytest.mark.parametrize(
+    "file_name,entity,field_specs",
+    [
+        ("sacct_1", "jobs", JOB_FIELD_SPECS_V22_AND_23),
+        ("sacct_2", "jobs", JOB_FIELD_SPECS_V22_AND_23),
+        ("sinfo_1", "nodes", NODE_FIELD_SPECS_V22),
+        ("sinfo_2", "nodes", NODE_FIELD_SPECS_V22),
+    ],
+)
+def test_compiled_translation_plan_on_reports(file_name, entity, field_specs):
+    with open(f"slurm_state_test/files/{file_name}") as f:
+        L_slurm_entities = json.load(f)[entity]
+    assert L_slurm_entities
+    assert_same_translations(field_specs, L_slurm_entities)
+
+
+def test_compiled_translation_plan_edge_cases():
+    """
+    Test the missing fields, the null values, the empty strings and the unknown TRES.
+    """
+    assert_same_translations(
+        JOB_FIELD_SPECS_V22_AND_23,
+        [
+            {},
+            {"job_id": 1, "unmapped": {"a": 0}},
+            {
+                "account": None,
+                "array": {"job_id": 0, "task_id": None},
+                "exit_code": {"status": "FAILED", "return_code": 2, "signal": 9},
+                "time": {"limit": 0, "submission": 1, "start": 0, "end": 0.0},
+                "tres": {
+                    "allocated": [],
+                    "requested": [
+                        {"type": "gres", "name": "shard", "count": 3},
+                        {"type": "energy", "name": None, "count": 7},
+                        {"type": "cpu", "name": None, "count": 2},
+                    ],
+                },
+            },
+        ],
+    )
+    assert_same_translations(
+        NODE_FIELD_SPECS_V22,
+        [{}, {"gres": ""}, {"gres": None, "architecture": "x86_64", "cpus": 0}],
+    )
+
+
+def test_compile_translation_plan_is_cached():
+    assert compile_translation_plan(
+        JOB_FIELD_SPECS_V22_AND_23
+    ) is compile_translation_plan(JOB_FIELD_SPECS_V22_AND_23)
+    with pytest.raises(ValueError):
+        compile_translation_plan((("account", "unknown_translator"),))
@@ -0,0 +1,76 @@
+"""
+Tests for slurm_state.helpers.tres_helper
+"""
+
+from slurm_state.helpers.tres_helper import get_cw_resources, parse_gres, parse_tres
+
+
+def test_parse_tres():
+    assert parse_tres(None) == {}
+    assert parse_tres("cpu=40,mem=386618M,billing=96,gres/gpu=8") == {
+        "cpu": 40,
+        "mem": 386618,
+        "billing": 96,
+        "gres/gpu": 8,
+    }
+    # The memory is converted to MB
+    assert parse_tres("cpu=26,mem=249G") == {"cpu": 26, "mem": 249 * 1024}
+    assert parse_tres("mem=1.5T,mem_per_cpu=?") == {"mem": 1.5 * 1024**2}
+
+
+def test_parse_gres():
+    assert parse_gres(None) == {}
+    assert parse_gres("(null)") == {}
+    assert parse_gres("gpu:1") == {"gpu": {None: 1}}
+    assert parse_gres("gpu:rtx8000:8(S:0-1)") == {"gpu": {"rtx8000": 8}}
+    assert parse_gres("gpu:rtx8000:2(IDX:0,3),gpu:v100:1(IDX:4),tpu:0") == {
+        "gpu": {"rtx8000": 2, "v100": 1},
+        "tpu": {None: 0},
+    }
+
+
+def test_get_cw_resources():
+    assert get_cw_resources(
+        {
+            "gres": "gpu:rtx8000:8(S:0-1)",
+            "gres_used": "gpu:rtx8000:3(IDX:0-2),tpu:0",
+            "tres": "cpu=40,mem=386618M,billing=96,gres/gpu=8",
+            "tres_used": "cpu=26,mem=249G,gres/gpu=3",
+        }
+    ) == {
+        "cpu_total": 40,
+        "cpu_used": 26,
+        "cpu_free": 14,
+        "mem_mb_total": 386618,
+        "mem_mb_used": 254976,
+        "mem_mb_free": 131642,
+        "gpu_total": 8,
+        "gpu_used": 3,
+        "gpu_free": 5,
+        "gpu_by_type": {"rtx8000": {"total": 8, "used": 3}},
+    }
+
+
+def test_get_cw_resources_without_gres():
+    # The TRES are used when the GRES do not describe the GPU,
+    # and the fields of the node when there are no TRES
+    assert get_cw_resources(
+        {
+            "cpus": 4,
+            "memory": 1800,
+            "gres": "",
+            "tres": "gres/gpu=2",
+            "tres_used": None,
+        }
+    ) == {
+        "cpu_total": 4,
+        "cpu_used": 0,
+        "cpu_free": 4,
+        "mem_mb_total": 1800,
+        "mem_mb_used": 0,
+        "mem_mb_free": 1800,
+        "gpu_total": 2,
+        "gpu_used": 0,
+        "gpu_free": 2,
+        "gpu_by_type": {},
+    }
@@ -0,0 +1,132 @@
+"""
+Tests for slurm_state.helpers.user_accounts_helper
+"""
+
+from slurm_state.helpers.user_accounts_helper import UserAccountCache
+from slurm_state.mongo_client import get_mongo_client
+from slurm_state.mongo_update import resolve_user_accounts, slurm_job_to_clockwork_job
+from slurm_state.config import get_config
+
+import concurrent.futures
+import pytest
+
+
+@pytest.fixture
+def users_collection():
+    client = get_mongo_client()
+    db = client[get_config("mongo.database_name")]
+    db.drop_collection("test_users")
+    db.test_users.insert_many(
+        [
+            {
+                "mila_email_username": "student00@mila.quebec",
+                "mila_cluster_username": "milauser00",
+                "cc_account_username": "ccuser00",
+            },
+            {
+                "mila_email_username": "student01@mila.quebec",
+                "mila_cluster_username": "milauser01",
+                "cc_account_username": "ccuser01",
+            },
+        ]
+    )
+    yield db.test_users
+    db.drop_collection("test_users")
+
+
+def test_user_account_cache(users_collection):
+    """
+    Test the resolution of the usernames through the cache, and its expiration.
+    """
+    now = [0]
+    cache = UserAccountCache(ttl=10, clock=lambda: now[0])
+
+    assert cache.resolve(
+        users_collection, "cc_account_username", ["ccuser00", "ccuser01", "unknown"]
+    ) == {
+        "ccuser00": "student00@mila.quebec",
+        "ccuser01": "student01@mila.quebec",
+        "unknown": None,
+    }
+    assert cache.get_stats()["misses"] == 3
+    assert cache.get_stats()["queries"] == 1
+
+    # The second resolution is done from the cache, including the unknown user
+    now[0] = 5
+    assert cache.resolve(
+        users_collection, "cc_account_username", ["ccuser00", "unknown"]
+    ) == {"ccuser00": "student00@mila.quebec", "unknown": None}
+    assert cache.get_stats()["hits"] == 2
+    assert cache.get_stats()["queries"] == 1
+
+    # Another account field is not mixed up with the first one
+    assert cache.resolve(users_collection, "mila_cluster_username", ["ccuser00"]) == {
+        "ccuser00": None
+    }
+    assert cache.get_stats()["queries"] == 2
+
+    # After the TTL, the mapping is retrieved again from the database
+    now[0] = 11
+    assert cache.resolve(users_collection, "cc_account_username", ["ccuser00"]) == {
+        "ccuser00": "student00@mila.quebec"
+    }
+    assert cache.get_stats()["queries"] == 3
+    # The expired entries have been evicted
+    assert cache.get_stats()["size"] == 2
+
+
+def test_resolve_user_accounts(users_collection):
+    """
+    Test the association of the jobs of several clusters to their users.
+    """
+    LD_jobs = [
+        slurm_job_to_clockwork_job(
+            {"job_id": job_id, "username": username, "cluster_name": cluster_name}
+        )
+        for (job_id, username, cluster_name) in [
+            ("1", "milauser00", "mila"),
+            ("2", "milauser00", "mila"),
+            ("3", "ccuser01", "cedar"),
+            ("4", "ccuser01", "mila"),
+        ]
+    ]
+    cache = UserAccountCache()
+    # One query per account field
+    assert resolve_user_accounts(LD_jobs, users_collection, cache=cache) == 2
+
+    assert [D_job["cw"]["mila_email_username"] for D_job in LD_jobs] == [
+        "student00@mila.quebec",
+        "student00@mila.quebec",
+        "student01@mila.quebec",
+        None,
+    ]
+    assert cache.get_stats()["queries"] == 2
+
+    # The usernames are now resolved from the cache
+    assert resolve_user_accounts(LD_jobs, users_collection, cache=cache) == 0
+
+
+def test_user_account_cache_concurrent_resolutions(users_collection):
+    """
+    Test that the cache can be shared by the threads ingesting several clusters.
+    """
+    now = [0]
+    cache = UserAccountCache(ttl=10, clock=lambda: now[0])
+
+    def resolve(i):
+        # The entries expire regularly, so that the evictions run concurrently
+        now[0] = i
+        return cache.resolve(
+            users_collection,
+            "cc_account_username",
+            ["ccuser00", "ccuser01", f"unknown{i % 7}"],
+        )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        LD_resolved = list(executor.map(resolve, range(400)))
+
+    for D_resolved in LD_resolved:
+        assert D_resolved["ccuser00"] == "student00@mila.quebec"
+        assert D_resolved["ccuser01"] == "student01@mila.quebec"
+    D_stats = cache.get_stats()
+    assert D_stats["hits"] + D_stats["misses"] == 3 * 400
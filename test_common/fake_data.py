@@ -59,13 +59,28 @@ def populate_fake_data(db_insertion_point, json_file=None, mutate=False):
     # dealing with large quantities of data, but it's part of the
     # set up for the database.
     db_insertion_point["jobs"].create_index(
-        [("slurm.job_id", 1), ("slurm.cluster_name", 1), ("cw.mila_email_username", 1)],
+        [("slurm.job_id", 1), ("slurm.cluster_name", 1)],
         name="job_id_and_cluster_name",
+        unique=True,
+    )
+    # Index supporting the default sorting of the paginated jobs
+    # (see slurm_state/helpers/jobs_indexes_helper.py)
+    db_insertion_point["jobs"].create_index(
+        [("slurm.submit_time", -1), ("slurm.job_id", 1), ("slurm.cluster_name", 1)],
+        name="sort_submit_time_desc",
     )
     db_insertion_point["nodes"].create_index(
         [("slurm.name", 1), ("slurm.cluster_name", 1)],
         name="name_and_cluster_name",
     )
+    db_insertion_point["nodes"].create_index(
+        [("slurm.cluster_name", 1), ("cw.resources.gpu_free", 1)],
+        name="cluster_name_and_gpu_free",
+    )
+    db_insertion_point["nodes"].create_index(
+        [("slurm.cluster_name", 1), ("cw.resources.cpu_free", 1)],
+        name="cluster_name_and_cpu_free",
+    )
     db_insertion_point["users"].create_index(
         [("mila_email_username", 1)], name="users_email_index"
     )